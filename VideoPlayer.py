@@ -30,9 +30,12 @@ import vlc
 from PyQt6.QtWidgets import (
     QDialog, QWidget, QVBoxLayout, QHBoxLayout, QPushButton, QSlider, QFrame, QApplication, QLabel
 )
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, pyqtSignal
 
 class VideoPlayer(QDialog):
+    # 창이 닫히고 재생 중이던 파일을 모두 놓은 뒤에 보낸다.
+    closed = pyqtSignal()
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("Helena's Video Player")
@@ -117,6 +120,28 @@ class VideoPlayer(QDialog):
         self.player.play()
         self.play_pause_button.setText("일시정지")
 
+    def play_stream(self, stream_info, resolve=None):
+        # 다운로드 없이 바로 재생: 로컬 HLS 프록시가 CDN 헤더를 대신 붙이고 조각을 미리 받아 캐시한다.
+        # resolve: 재생 도중 토큰이 만료되면 프록시가 새 스트림 정보를 얻을 때 부르는 함수
+        if not self.player: return
+        from hls_proxy import get_hls_proxy
+        url = get_hls_proxy().register(stream_info, resolve)
+        self.play_video(url)
+
+    def switch_to_file(self, path):
+        # 받으면서 보던 플레이리스트를 완성된 파일로 바꾼다. 보던 위치와 일시정지 상태는 그대로 유지한다.
+        if not self.player: return
+        position = self.player.get_time()
+        was_playing = self.player.is_playing()
+        print(f"[DEBUG] 완성된 파일로 전환: {path} ({position}ms)")
+        self.player.set_media(self.instance.media_new(path))
+        self.player.play()
+        if position > 0:
+            self.player.set_time(position)
+        if not was_playing:
+            self.player.set_pause(1)
+            self.play_pause_button.setText("재생")
+
     def toggle_play_pause(self):
         if not self.player: return
         if self.player.is_playing():
@@ -139,7 +164,9 @@ class VideoPlayer(QDialog):
         if self.player:
             self.stop_video()
             self.player.release()
+            self.player = None
         super().closeEvent(event)
+        self.closed.emit()
 
 if __name__ == '__main__':
     app = QApplication(sys.argv)
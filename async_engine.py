@@ -0,0 +1,483 @@
+import asyncio
+import atexit
+import os
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+
+# 비동기 엔진은 aiohttp 가 설치되어 있을 때만 쓸 수 있다. (없으면 UI/CLI 는 예전처럼 스레드 작업자를 쓴다)
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+import hls
+import http_client
+from scraper import CREATE_NO_WINDOW, DownloadCancelled, FfmpegProgress
+from segment_crypto import BLOCK_SIZE, SegmentDecryptor, segment_iv
+
+
+class AsyncTokenBucket:
+    # http_client.TokenBucket 의 코루틴판 (기다리는 동안 이벤트 루프를 막지 않는다)
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+def is_retryable(error):
+    # http_client.is_retryable 의 aiohttp 판
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status in http_client.RETRY_STATUSES
+    return isinstance(error, (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError))
+
+
+class AsyncHttp:
+    """aiohttp 세션 하나로 모든 요청을 보내는 비동기 HTTP 클라이언트. (엔진의 이벤트 루프 안에서만 쓴다)
+
+    http_client 와 같은 규칙을 따른다: 호스트별 동시 요청 수 / 토큰 버킷 제한(HOST_LIMITS), 기본 타임아웃,
+    5xx/429/타임아웃/연결 오류 재시도(지터 지수 백오프). 동시 요청 수 기본값은 스레드가 들지 않으므로 더 넉넉하다.
+    """
+
+    def __init__(self, max_connections=512, max_per_host=128):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self._session = None
+        self._hosts = {}
+
+    def _get_session(self):
+        if self._session is None:
+            connect_timeout, read_timeout = http_client.DEFAULT_TIMEOUT
+            self._session = aiohttp.ClientSession(
+                headers=http_client.DEFAULT_HEADERS,
+                connector=aiohttp.TCPConnector(limit=self.max_connections, limit_per_host=self.max_per_host),
+                timeout=aiohttp.ClientTimeout(total=None, connect=connect_timeout, sock_read=read_timeout),
+            )
+        return self._session
+
+    def _host(self, url):
+        # (동시 요청 세마포어, 토큰 버킷)
+        host = urlsplit(url).netloc
+        limits = self._hosts.get(host)
+        if limits is None:
+            config = http_client.HOST_LIMITS.get(host, {})
+            rate = config.get('rate', http_client.HOST_RATE)
+            limits = self._hosts[host] = (
+                asyncio.Semaphore(config.get('max_concurrent', self.max_per_host)),
+                AsyncTokenBucket(rate, config.get('burst', http_client.HOST_BURST)) if rate else None,
+            )
+        return limits
+
+    @asynccontextmanager
+    async def request(self, method, url, retries=http_client.MAX_RETRIES, on_retry=None, **kwargs):
+        # 응답을 async with 로 빌려준다. 본문을 다 읽을 때까지 호스트의 동시 요청 칸을 차지한다.
+        # 5xx/429 는 재시도하고, 마지막 시도의 응답은 그대로 넘긴다. (호출한 쪽에서 raise_for_status)
+        slots, bucket = self._host(url)
+        session = self._get_session()
+        for attempt in range(retries + 1):
+            async with slots:
+                if bucket is not None:
+                    await bucket.acquire()
+                try:
+                    response = await session.request(method, url, **kwargs)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    if attempt >= retries:
+                        raise
+                    error = e
+                else:
+                    if response.status not in http_client.RETRY_STATUSES or attempt >= retries:
+                        try:
+                            yield response
+                        finally:
+                            response.release()
+                        return
+                    error = f"HTTP {response.status}"
+                    response.release()
+            delay = http_client.backoff_delay(attempt)
+            print(f"[DEBUG] 요청 실패, {delay:.1f}초 뒤 다시 시도 ({attempt + 1}/{retries}): {error}")
+            if on_retry is not None:
+                on_retry(attempt, error)
+            await asyncio.sleep(delay)
+
+    async def get_bytes(self, url, **kwargs):
+        # (상태 코드, 응답 헤더, 본문 바이트)
+        async with self.request('GET', url, **kwargs) as response:
+            return response.status, response.headers, await response.read()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+@asynccontextmanager
+async def thread_slot(slots):
+    # 스레드 작업자와 함께 쓰는 threading.Semaphore 를 이벤트 루프를 막지 않고 얻는다. (nullcontext 면 그냥 통과)
+    if not hasattr(slots, 'acquire'):
+        yield
+        return
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(0.1)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+class AsyncEngine:
+    """이벤트 루프 하나를 전용 스레드에서 돌리며 검색, 상세 정보, 바이트 받기(이미지 등), 에피소드 다운로드를 코루틴으로 실행한다.
+
+    조각 수백 개를 동시에 받아도 OS 스레드는 늘지 않는다. (브라우저 해석과 HTML 파싱은 기본 스레드 풀,
+    복호화와 파일 쓰기/매니페스트 저장/작업 폴더 정리는 입출력 스레드 IO_WORKERS 개에서 실행하여 루프를 막지 않는다)
+    다른 스레드에서는 submit() 으로 코루틴을 넘기고 concurrent.futures.Future 로 결과를 받는다.
+    진행 상황은 넘겨준 AniLifeScraper 의 시그널로 알리므로, UI 에서는 qt_adapter 로 그대로 이어 쓸 수 있다.
+    """
+
+    # 에피소드 하나에서 동시에 받는 조각 수
+    SEGMENT_CONCURRENCY = 32
+    # 복호화와 디스크 쓰기를 맡는 입출력 스레드 수 (모든 에피소드가 함께 쓴다)
+    IO_WORKERS = 4
+    # 매니페스트는 조각 이만큼마다, 또는 이 초가 지날 때마다 한 번 저장한다.
+    MANIFEST_SAVE_SEGMENTS = 32
+    MANIFEST_SAVE_INTERVAL = 2.0
+
+    def __init__(self, segment_concurrency=None, max_connections=512, max_per_host=128):
+        if aiohttp is None:
+            raise RuntimeError("비동기 엔진을 쓰려면 aiohttp 가 필요합니다. (pip install aiohttp)")
+        self.segment_concurrency = max(1, segment_concurrency or self.SEGMENT_CONCURRENCY)
+        self.loop = asyncio.new_event_loop()
+        self.http = AsyncHttp(max_connections, max_per_host)
+        self._io_executor = ThreadPoolExecutor(max_workers=self.IO_WORKERS, thread_name_prefix='async-io')
+        self._keys = {}
+        self._key_locks = {}
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.loop.run_forever, name='async-engine', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is None:
+            return
+        try:
+            self.submit(self.http.close()).result(timeout=5)
+        except Exception as e:
+            print(f"[DEBUG] 비동기 엔진 종료 중 오류 무시: {e}")
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join(timeout=5)
+        self._thread = None
+        self._io_executor.shutdown(wait=False)
+
+    def submit(self, coro):
+        # 다른 스레드에서 코루틴을 넘긴다. 반환값: concurrent.futures.Future
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        # submit 후 결과를 기다린다. (CLI 등 동기 코드용)
+        return self.submit(coro).result()
+
+    def _io(self, func, *args):
+        # 디스크 입출력(복호화 포함)을 입출력 스레드에서 실행하고 결과를 기다린다.
+        return self.loop.run_in_executor(self._io_executor, func, *args)
+
+    # --- 검색 / 상세 정보 / 바이트 ---
+
+    async def _cached_fetch(self, scraper, cache_key, url, parse, params=None, empty=None):
+        # AniLifeScraper._cached_fetch 의 비동기판 (같은 응답 캐시를 함께 쓴다)
+        cache = scraper.response_cache
+        entry = cache.get(cache_key)
+        if entry and cache.is_fresh(entry):
+            return entry['data']
+        try:
+            async with self.http.request('GET', url, params=params, headers=cache.conditional_headers(entry)) as response:
+                if response.status == 304 and entry:
+                    # 캐시 파일 저장은 파일 전체를 다시 쓰므로 입출력 스레드에서 한다.
+                    await self._io(cache.touch, cache_key)
+                    return entry['data']
+                response.raise_for_status()
+                text = await response.text()
+                etag, last_modified = response.headers.get('ETag'), response.headers.get('Last-Modified')
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Error during request to {url}: {e}")
+            return entry['data'] if entry else empty
+        # HTML 파싱은 CPU 작업이므로 루프를 막지 않도록 스레드 풀에서 한다.
+        data = await asyncio.to_thread(parse, text)
+        if data:
+            await self._io(cache.put, cache_key, data, etag, last_modified)
+        return data
+
+    async def search(self, scraper, keyword):
+        return await self._cached_fetch(scraper, f"search:{keyword}", f"{scraper.BASE_URL}/search", scraper._parse_search_results,
+                                        params={'keyword': keyword}, empty=[])
+
+    async def get_anime_details(self, scraper, anime_id):
+        return await self._cached_fetch(scraper, f"detail:{anime_id}", f"{scraper.BASE_URL}/detail/id/{anime_id}",
+                                        scraper._parse_anime_details, empty={})
+
+    async def fetch_bytes(self, url, headers=None):
+        # 썸네일/포스터 등 작은 파일을 받는다. 실패하면 예외.
+        async with self.http.request('GET', url, headers=headers) as response:
+            response.raise_for_status()
+            return await response.read()
+
+    # --- 에피소드 다운로드 ---
+
+    async def _key(self, uri, headers):
+        # segment_crypto.KeyCache 의 코루틴판: 같은 키는 한 번만 받는다.
+        if uri in self._keys:
+            return self._keys[uri]
+        lock = self._key_locks.setdefault(uri, asyncio.Lock())
+        async with lock:
+            if uri not in self._keys:
+                key = await self.fetch_bytes(uri, headers)
+                if len(key) != BLOCK_SIZE:
+                    raise ValueError(f"AES-128 키 길이가 올바르지 않습니다 ({len(key)}바이트): {uri}")
+                self._keys[uri] = key
+        return self._keys[uri]
+
+    async def _fetch_segment_body(self, scraper, headers, segment):
+        # 조각 하나를 메모리로 받는다. (복호화와 파일 쓰기는 루프 밖 입출력 스레드에서 한다)
+        chunks = []
+        async with self.http.request('GET', segment.uri, headers=headers, retries=0) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(scraper.SEGMENT_CHUNK_SIZE):
+                if scraper.cancel_event is not None and scraper.cancel_event.is_set():
+                    raise DownloadCancelled()
+                chunks.append(chunk)
+        return chunks
+
+    @staticmethod
+    def _write_segment(chunks, key, iv, part_path, local_ts_path):
+        # 입출력 스레드에서 실행: 복호화 -> 임시 파일에 쓰기 -> 원자적으로 교체. 반환값: 바이트 수
+        decryptor = SegmentDecryptor(key, iv) if key else None
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(decryptor.update(chunk) if decryptor else chunk)
+                if decryptor:
+                    f.write(decryptor.finalize())
+            size = os.path.getsize(part_path)
+            os.replace(part_path, local_ts_path)
+            return size
+        except BaseException:
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            raise
+
+    async def _download_segment(self, scraper, headers, segment, local_ts_path):
+        # AniLifeScraper._download_segment 와 같은 규칙: 임시 파일에 받은 뒤 원자적으로 교체, 끊긴 응답은 백오프 후 다시 받기
+        span = scraper.tracer.span("segment", sequence=segment.sequence)
+        try:
+            key = iv = None
+            if segment.key:
+                if segment.key.method != 'AES-128':
+                    raise Exception(f"지원하지 않는 암호화 방식: {segment.key.method}")
+                # 키는 Range 를 붙이기 전의 CDN 헤더로 받는다.
+                key, iv = await self._key(segment.key.uri, headers), segment_iv(segment)
+            range_header = segment.range_header()
+            if range_header:
+                headers = dict(headers, Range=range_header)
+            attempt = 0
+            while True:
+                try:
+                    chunks = await self._fetch_segment_body(scraper, headers, segment)
+                    break
+                except Exception as e:
+                    if attempt >= http_client.MAX_RETRIES or not is_retryable(e):
+                        raise
+                    span.add_retry()
+                    await asyncio.sleep(http_client.backoff_delay(attempt))
+                    attempt += 1
+            size = await self._io(self._write_segment, chunks, key, iv, f"{local_ts_path}.async.part", local_ts_path)
+            span.add_bytes(size)
+            span.end()
+            return size
+        except BaseException as e:
+            # 취소(CancelledError)도 여기로 온다.
+            span.end(e)
+            raise
+
+    async def _download_segments(self, scraper, headers, segments, temp_dir):
+        # 매니페스트 형식은 스레드 판과 같으므로, 어느 쪽으로 받다 끊겨도 다른 쪽이 이어받을 수 있다.
+        total = len(segments)
+        manifest = await self._io(scraper._load_manifest, temp_dir, total)
+        verified = await self._io(scraper._verified_segments, temp_dir, manifest)
+        manifest['segments'] = {str(i): manifest['segments'][str(i)] for i in verified}
+        done = len(verified)
+        if done:
+            print(f"[DEBUG] 9-1단계: 이전에 받은 조각 {done}/{total}개를 재사용합니다.")
+            scraper.sub_progress_update.emit(done, total, "다운로드")
+
+        slots = asyncio.Semaphore(self.segment_concurrency)
+
+        async def fetch(i, segment):
+            async with slots:
+                return i, await self._download_segment(scraper, headers, segment, os.path.join(temp_dir, f"segment_{i:04d}.ts"))
+
+        async def save_manifest():
+            # 루프에서 계속 바뀌는 dict 이므로 복사본을 넘겨 입출력 스레드에서 쓴다.
+            await self._io(scraper._save_manifest, temp_dir, dict(manifest, segments=dict(manifest['segments'])))
+
+        started = time.monotonic()
+        received = 0
+        # 매니페스트는 조각마다가 아니라 MANIFEST_SAVE_SEGMENTS 개 또는 MANIFEST_SAVE_INTERVAL 초마다 한 번 저장한다.
+        unsaved = 0
+        saved_at = time.monotonic()
+        tasks = [asyncio.ensure_future(fetch(i, segment)) for i, segment in enumerate(segments) if i not in verified]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                i, size = await next_done
+                manifest['segments'][str(i)] = size
+                received += size
+                unsaved += 1
+                if unsaved >= self.MANIFEST_SAVE_SEGMENTS or time.monotonic() - saved_at >= self.MANIFEST_SAVE_INTERVAL:
+                    await save_manifest()
+                    unsaved = 0
+                    saved_at = time.monotonic()
+                done += 1
+                scraper.sub_progress_update.emit(done, total, "다운로드")
+        except BaseException:
+            # 남은 조각은 취소하고, 그 사이 끝난 조각까지 매니페스트에 남긴 뒤 예외를 그대로 올린다.
+            for task in tasks:
+                task.cancel()
+            for result in await asyncio.gather(*tasks, return_exceptions=True):
+                if isinstance(result, tuple):
+                    manifest['segments'][str(result[0])] = result[1]
+            await asyncio.shield(save_manifest())
+            raise
+        if unsaved:
+            await save_manifest()
+        scraper._record_throughput(received, started)
+
+    async def _mux(self, scraper, temp_dir, output_filepath, total_duration):
+        process = await asyncio.create_subprocess_exec(
+            *scraper._local_mux_command(output_filepath), cwd=temp_dir,
+            stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT, creationflags=CREATE_NO_WINDOW,
+        )
+        progress = FfmpegProgress(total_duration)
+        scraper.sub_progress_update.emit(0, progress.total, "영상 합치는 중...")
+        async for line in process.stdout:
+            status = progress.feed(line.decode('utf-8', errors='replace'))
+            if status:
+                scraper.sub_progress_update.emit(*status)
+        return await process.wait()
+
+    @staticmethod
+    def _prepare_work_dir(temp_dir, resume):
+        if not resume and os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir, exist_ok=True)
+
+    async def _download_episode(self, scraper, stream_info, provider_id, anime_id):
+        # AniLifeScraper._download_episode 의 비동기판 (조각을 모두 받은 뒤 병합하는 기본 모드만)
+        playlist = hls.parse_playlist(stream_info['m3u8_content_fixed'])
+        if playlist.is_master:
+            raise Exception("다운로드할 미디어 플레이리스트가 아님 (마스터 플레이리스트)")
+        segments = playlist.segments
+        temp_dir = scraper._work_dir(anime_id, provider_id)
+        await self._io(self._prepare_work_dir, temp_dir, scraper.resume)
+        output_filepath = await self._io(scraper._output_path, stream_info['video_data'], anime_id)
+
+        print(f"[DEBUG] 9단계: 총 {len(segments)}개의 비디오 조각 비동기 다운로드 시작 (동시 {self.segment_concurrency}개)...")
+        scraper.progress_update.emit(13, 15, "비디오 조각 다운로드 중...")
+        scraper.stage_changed.emit('downloading')
+        with scraper.tracer.span("segments", segments=len(segments), workers=self.segment_concurrency):
+            await self._download_segments(scraper, scraper._cdn_headers(stream_info), segments, temp_dir)
+
+        with scraper.tracer.span("playlist_write"):
+            await self._io(scraper._write_local_playlist, temp_dir, playlist)
+        scraper.progress_update.emit(14, 15, "로컬 플레이리스트 생성...")
+
+        scraper.progress_update.emit(15, 15, "영상 합치는 중 (FFMPEG)...")
+        scraper.stage_changed.emit('muxing')
+        with scraper.tracer.span("ffmpeg") as span:
+            returncode = await self._mux(scraper, temp_dir, output_filepath, playlist.duration)
+            span.set(returncode=returncode)
+        if returncode != 0:
+            raise Exception(f"FFMPEG 조립 실패 (종료 코드: {returncode})")
+        scraper.sub_progress_update.emit(1, 1, "영상 합치기 완료")
+        print(f"[DEBUG] 최종 성공: 영상이 '{output_filepath}'으로 저장되었습니다.")
+        with scraper.tracer.span("library_record"):
+            # 체크섬 계산이 루프를 막지 않도록 스레드에서 기록한다.
+            await asyncio.to_thread(scraper._record_library, provider_id, anime_id, stream_info['video_data'], output_filepath, playlist.duration)
+        with scraper.tracer.span("cleanup"):
+            await self._io(shutil.rmtree, temp_dir)
+        return os.path.abspath(output_filepath)
+
+    async def download_episode(self, scraper, provider_id, anime_id):
+        """AniLifeScraper.get_video_info 의 비동기판. 같은 시그널(progress_update, finished, error 등)을 보낸다.
+
+        브라우저 해석은 스레드 풀에서 실행하고(scraper.resolve_slots 적용), 전송은 scraper.transfer_slots 를 함께 지킨다.
+        progressive / pipelined 모드는 지원하지 않는다. 반환값: 결과 dict (실패하면 {})
+        """
+        print(f"--- [DEBUG] 비동기 다운로드 시작 (Provider ID: {provider_id}, Anime ID: {anime_id}) ---")
+        scraper.progress_update.emit(0, 15, f"작업 시작 (Provider: {provider_id})")
+        job_span = scraper._begin_trace('download', provider_id, anime_id)
+        try:
+            with scraper.tracer.span("library_lookup"):
+                result = await asyncio.to_thread(scraper._library_result, provider_id)
+            if result:
+                scraper._end_trace(job_span)
+                scraper.finished.emit(result)
+                return result
+            stream_info = await asyncio.to_thread(scraper._resolve_stream, provider_id, anime_id)
+            wait_span = scraper.tracer.span("transfer_wait")
+            async with thread_slot(scraper.transfer_slots):
+                wait_span.end()
+                try:
+                    download_path = await self._download_episode(scraper, stream_info, provider_id, anime_id)
+                except aiohttp.ClientResponseError as e:
+                    # 토큰이 만료되어 CDN이 403을 돌려주면, 캐시를 버리고 브라우저로 한 번 더 해석한 뒤 이어받는다.
+                    if not stream_info.get('from_cache') or e.status != 403:
+                        raise
+                    print("[DEBUG] CDN 403 응답: 캐시된 스트림 정보를 폐기하고 다시 해석합니다.")
+                    job_span.add_retry()
+                    scraper.stream_cache.invalidate(provider_id)
+                    stream_info = await asyncio.to_thread(scraper._resolve_stream, provider_id, anime_id)
+                    download_path = await self._download_episode(scraper, stream_info, provider_id, anime_id)
+            result = {'download_path': download_path}
+            job_span.add_bytes(await self._io(os.path.getsize, download_path))
+            scraper._end_trace(job_span)
+            scraper.finished.emit(result)
+            return result
+        except asyncio.CancelledError:
+            scraper._end_trace(job_span, DownloadCancelled())
+            raise
+        except Exception as e:
+            scraper._end_trace(job_span, e)
+            error_message = f"처리 중 오류 발생: {e}"
+            print(f"[DEBUG] {error_message}")
+            scraper.error.emit(error_message)
+            return {}
+
+
+_shared_engine = None
+_shared_engine_lock = threading.Lock()
+
+
+def get_async_engine():
+    # 프로세스 전체에서 공유하는 엔진 (처음 쓸 때 시작, 종료 시 정리). aiohttp 가 없으면 RuntimeError.
+    global _shared_engine
+    with _shared_engine_lock:
+        if _shared_engine is None:
+            _shared_engine = AsyncEngine().start()
+            atexit.register(_shared_engine.stop)
+        return _shared_engine
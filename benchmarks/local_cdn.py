@@ -0,0 +1,219 @@
+"""벤치마크용 로컬 CDN 대역 서버.
+
+temp_playlist.m3u8 과 같은 모양(기본 363개 x 4초)의 미디어 플레이리스트와 합성 .aaa 조각을 제공한다.
+응답마다 지연(latency), 연결당 대역폭(bandwidth), 오류율(error_rate)을 흉내낼 수 있다.
+tail_rate 비율의 조각 요청은 tail_ms 만큼 더 늦게 응답한다. (느린 엣지 서버 흉내)
+encrypt=True 이면 실제 플레이리스트처럼 #EXT-X-KEY(AES-128, IV 없음 -> 미디어 시퀀스 IV)로 조각을 암호화해서 준다.
+
+    python benchmarks/local_cdn.py --port 8765 --latency-ms 80 --bandwidth-mbps 20
+"""
+import argparse
+import os
+import random
+import shutil
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PLAYLIST_PATH = "/st/bench/1080/playlist.m3u8"
+SEGMENT_PREFIX = "/st/bench/1080/"
+KEY_PATH = "/key/enc.bin"
+
+
+class LocalCDN:
+    def __init__(self, segment_count=363, segment_duration=4, segment_bytes=1_250_000,
+                 latency_ms=0, bandwidth_mbps=0, error_rate=0.0, ts_dir=None, encrypt=False, host='127.0.0.1', port=0, seed=None,
+                 tail_rate=0.0, tail_ms=0):
+        self.segment_count = segment_count
+        self.segment_duration = segment_duration
+        self.segment_bytes = segment_bytes
+        self.latency = latency_ms / 1000
+        # 연결 하나당 대역폭 (0 이면 제한 없음)
+        self.bandwidth = bandwidth_mbps * 1_000_000 / 8
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_delay = tail_ms / 1000
+        # ts_dir 이 주어지면 합성 바이트 대신 실제 TS 조각(seg0000.ts ...)을 제공한다.
+        self.ts_dir = ts_dir
+        self.key = os.urandom(16) if encrypt else None
+        self.random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._payload = os.urandom(min(segment_bytes, 1024 * 1024))
+        self.bytes_served = 0
+        self.requests_served = 0
+        self.segments_served = 0
+        self.errors_served = 0
+        self._stats_lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def playlist_url(self):
+        return self.base_url + PLAYLIST_PATH
+
+    def playlist_text(self):
+        lines = [
+            "#EXTM3U",
+            "#EXT-X-VERSION:3",
+            f"#EXT-X-TARGETDURATION:{self.segment_duration + 2}",
+            "#EXT-X-MEDIA-SEQUENCE:0",
+            "#EXT-X-PLAYLIST-TYPE:VOD",
+        ]
+        if self.key:
+            lines.append(f'#EXT-X-KEY:METHOD=AES-128,URI="{self.base_url}{KEY_PATH}"')
+        for i in range(self.segment_count):
+            lines.append(f"#EXTINF:{self.segment_duration}")
+            lines.append(f"seg{i:04d}.aaa")
+        lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines)
+
+    def segment_body(self, index):
+        if self.ts_dir:
+            with open(os.path.join(self.ts_dir, f"seg{index:04d}.ts"), 'rb') as f:
+                body = f.read()
+        else:
+            repeat, remainder = divmod(self.segment_bytes, len(self._payload))
+            body = self._payload * repeat + self._payload[:remainder]
+        if self.key:
+            from segment_crypto import encrypt_segment
+            body = encrypt_segment(body, self.key, index.to_bytes(16, 'big'))
+        return body
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.bytes_served = 0
+            self.requests_served = 0
+            self.segments_served = 0
+            self.errors_served = 0
+
+    def _should_fail(self):
+        with self._random_lock:
+            return self.random.random() < self.error_rate
+
+    def _should_stall(self):
+        with self._random_lock:
+            return self.random.random() < self.tail_rate
+
+    def _handler_class(self):
+        cdn = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                view = memoryview(body)
+                chunk_size = 64 * 1024
+                for offset in range(0, len(body), chunk_size):
+                    chunk = view[offset:offset + chunk_size]
+                    started = time.monotonic()
+                    self.wfile.write(chunk)
+                    if cdn.bandwidth:
+                        # 연결당 대역폭 제한 흉내
+                        remaining = len(chunk) / cdn.bandwidth - (time.monotonic() - started)
+                        if remaining > 0:
+                            time.sleep(remaining)
+                with cdn._stats_lock:
+                    cdn.bytes_served += len(body)
+                    cdn.requests_served += 1
+
+            def do_GET(self):
+                if cdn.latency:
+                    time.sleep(cdn.latency)
+                path = self.path.split('?', 1)[0]
+                if path == PLAYLIST_PATH:
+                    self._send(200, cdn.playlist_text().encode('utf-8'), 'application/vnd.apple.mpegurl')
+                    return
+                if path == KEY_PATH and cdn.key:
+                    self._send(200, cdn.key, 'application/octet-stream')
+                    return
+                if path.startswith(SEGMENT_PREFIX + "seg") and path.endswith(".aaa"):
+                    try:
+                        index = int(path[len(SEGMENT_PREFIX) + 3:-4])
+                    except ValueError:
+                        index = -1
+                    if 0 <= index < cdn.segment_count:
+                        if cdn._should_fail():
+                            with cdn._stats_lock:
+                                cdn.errors_served += 1
+                            self._send(503, b"synthetic error", 'text/plain')
+                            return
+                        if cdn.tail_delay and cdn._should_stall():
+                            time.sleep(cdn.tail_delay)
+                        self._send(200, cdn.segment_body(index), 'video/mp2t')
+                        with cdn._stats_lock:
+                            cdn.segments_served += 1
+                        return
+                self._send(404, b"not found", 'text/plain')
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def generate_ts_segments(ffmpeg_path, out_dir, segment_count, segment_duration):
+    # 실제 FFMPEG로 병합 시간을 재고 싶을 때: 테스트 영상을 만들어 4초짜리 TS 조각으로 자른다. (한 번만 생성)
+    if os.path.exists(os.path.join(out_dir, f"seg{segment_count - 1:04d}.ts")):
+        return out_dir
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.makedirs(out_dir)
+    command = [
+        ffmpeg_path, '-loglevel', 'error',
+        '-f', 'lavfi', '-i', 'testsrc=size=640x360:rate=24',
+        '-f', 'lavfi', '-i', 'sine=frequency=440',
+        '-t', str(segment_count * segment_duration),
+        '-c:v', 'mpeg2video', '-g', str(24 * segment_duration), '-c:a', 'mp2',
+        '-f', 'segment', '-segment_time', str(segment_duration), '-segment_format', 'mpegts',
+        os.path.join(out_dir, 'seg%04d.ts'),
+    ]
+    subprocess.run(command, check=True)
+    return out_dir
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--segments', type=int, default=363)
+    parser.add_argument('--segment-kb', type=int, default=1220)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--bandwidth-mbps', type=float, default=0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="느리게 응답할 조각 요청 비율")
+    parser.add_argument('--tail-ms', type=float, default=0, help="느린 응답에 더할 지연")
+    parser.add_argument('--encrypt', action='store_true', help="AES-128 로 조각 암호화")
+    args = parser.parse_args()
+
+    cdn = LocalCDN(segment_count=args.segments, segment_bytes=args.segment_kb * 1024, latency_ms=args.latency_ms,
+                   bandwidth_mbps=args.bandwidth_mbps, error_rate=args.error_rate, encrypt=args.encrypt, port=args.port,
+                   tail_rate=args.tail_rate, tail_ms=args.tail_ms)
+    print(f"플레이리스트: {cdn.playlist_url}")
+    try:
+        cdn.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        cdn.server.server_close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""FFMPEG 가 없는 환경에서 쓰는 병합 단계 대역.
+
+scraper 가 FFMPEG 에 넘기는 것과 같은 인자(-i playlist_final.m3u8 / -i pipe:0 ... 출력 경로)를 받아,
+입력 조각들을 그대로 이어 붙여 출력 파일에 쓰고 -progress 형식의 진행률을 표준 출력으로 내보낸다.
+실제 먹싱 비용은 없으므로 순수하게 파이프라인(디스크 I/O, 파이프 전달)의 비용만 잰다.
+"""
+import sys
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def report(out_time, total_size, state):
+    sys.stdout.write(f"out_time_us={int(out_time * 1_000_000)}\ntotal_size={total_size}\nprogress={state}\n")
+    sys.stdout.flush()
+
+
+def main(argv):
+    source = argv[argv.index('-i') + 1]
+    output_path = argv[-1]
+    total_size = 0
+    out_time = 0.0
+    with open(output_path, 'wb') as out:
+        if source.startswith('pipe:'):
+            stdin = sys.stdin.buffer
+            while True:
+                chunk = stdin.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                total_size += len(chunk)
+                report(out_time, total_size, 'continue')
+        else:
+            with open(source, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f if line.strip()]
+            duration = 0.0
+            for line in lines:
+                if line.startswith('#EXTINF:'):
+                    duration = float(line[len('#EXTINF:'):].split(',')[0])
+                elif not line.startswith('#'):
+                    with open(line, 'rb') as segment:
+                        data = segment.read()
+                    out.write(data)
+                    total_size += len(data)
+                    out_time += duration
+                    report(out_time, total_size, 'continue')
+    report(out_time, total_size, 'end')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,50 @@
+"""HTML 파서 백엔드 벤치마크.
+
+저장소에 들어있는 test.html 을 백엔드마다 반복해서 파싱하고, 페이지당 파싱 시간과
+결과가 기본 백엔드(html.parser)와 똑같은지 출력한다.
+
+    python benchmarks/parser_bench.py [--repeat 50] [--html test.html]
+"""
+import argparse
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from html_parser import available_backends, get_html_parser
+
+
+def time_per_page(parse, html, repeat):
+    parse(html)  # 워밍업
+    started = time.perf_counter()
+    for _ in range(repeat):
+        parse(html)
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument('--html', default=os.path.join(ROOT_DIR, 'test.html'))
+    arg_parser.add_argument('--repeat', type=int, default=50)
+    args = arg_parser.parse_args()
+
+    with open(args.html, 'r', encoding='utf-8') as f:
+        html = f.read()
+
+    reference = get_html_parser('html.parser')
+    expected = (reference.parse_search_results(html), reference.parse_anime_details(html))
+
+    print(f"{os.path.basename(args.html)} ({len(html.encode('utf-8')) / 1024:.1f} KB), {args.repeat}회 반복")
+    print(f"{'backend':<12} {'details ms/page':>16} {'search ms/page':>15} {'same result':>12}")
+    for backend in available_backends():
+        parser = get_html_parser(backend)
+        details_ms = time_per_page(parser.parse_anime_details, html, args.repeat)
+        search_ms = time_per_page(parser.parse_search_results, html, args.repeat)
+        same = (parser.parse_search_results(html), parser.parse_anime_details(html)) == expected
+        print(f"{backend:<12} {details_ms:>16.2f} {search_ms:>15.2f} {str(same):>12}")
+
+
+if __name__ == '__main__':
+    main()
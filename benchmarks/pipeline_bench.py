@@ -0,0 +1,212 @@
+"""다운로드 파이프라인 오프라인 벤치마크.
+
+local_cdn.LocalCDN 을 띄워두고, 파이프라인 모드마다 AniLifeScraper._download_episode 를 별도 프로세스에서 실행해
+조각/초, MB/초, 최대 RSS, 임시 폴더 최대 사용량, mp4 완성까지 걸린 시간을 잰다. (브라우저 단계는 제외)
+
+    python benchmarks/pipeline_bench.py --latency-ms 80 --bandwidth-mbps 40
+    python benchmarks/pipeline_bench.py --modes parallel,pipelined --error-rate 0.01 --ffmpeg ffmpeg
+    python benchmarks/pipeline_bench.py --encrypt   # AES-128 조각 (프로세스 안에서 복호화)
+    python benchmarks/pipeline_bench.py --tail-rate 0.03 --tail-ms 3000   # 느린 엣지 응답 (헤지 요청 효과)
+    python benchmarks/pipeline_bench.py --modes parallel,store   # 조각 파일 대신 단일 저장소 파일
+
+--ffmpeg 를 주지 않으면 mux_standin.py(조각을 이어 붙이기만 하는 대역)로 병합 단계를 대신한다.
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+# 모드 이름 -> AniLifeScraper 생성 인자
+MODES = {
+    'sequential': {'segment_workers': 1},
+    'parallel': {},
+    'pipelined': {'pipelined': True},
+    'store': {'segment_store': True},
+}
+
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+def directory_size(path):
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, filename))
+            except OSError:
+                pass
+    return total
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 는 KB, macOS 는 바이트 단위
+    return peak / 1024 / 1024 if sys.platform == 'darwin' else peak / 1024
+
+
+def run_child(args):
+    # 자식 프로세스: 현재 폴더(임시 폴더)에서 한 가지 모드만 실행하고 결과를 JSON 한 줄로 출력한다.
+    import http_client
+    from scraper import AniLifeScraper
+
+    kwargs = dict(MODES[args.child])
+    if args.workers and 'segment_workers' not in kwargs:
+        kwargs['segment_workers'] = args.workers
+    scraper = AniLifeScraper(resume=False, **kwargs)
+    scraper.FFMPEG_PATH = args.ffmpeg
+
+    response = http_client.get(args.playlist_url, timeout=10)
+    response.raise_for_status()
+    m3u8_content = response.text
+    stream_info = {
+        'video_data': {'ani_name': 'Bench', 'ani_story': args.child},
+        'live_page_url': args.playlist_url,
+        'headers': {'User-Agent': http_client.DEFAULT_HEADERS['User-Agent'], 'Referer': args.playlist_url, 'Cookie': ''},
+        'm3u8_content': m3u8_content,
+        'm3u8_content_fixed': scraper._fix_playlist_urls(m3u8_content, args.playlist_url),
+    }
+
+    timings = {}
+    started = time.perf_counter()
+
+    def on_sub_progress(current, total, label):
+        if label.startswith("다운로드") and current == total and 'download' not in timings:
+            timings['download'] = time.perf_counter() - started
+    scraper.sub_progress_update.connect(on_sub_progress)
+
+    # 임시 폴더 사용량을 주기적으로 재서 최대값을 기록
+    temp_dir = scraper._work_dir('bench', 'bench')
+    peak_temp = [0]
+    stop_sampling = threading.Event()
+
+    def sample_temp_dir():
+        while not stop_sampling.wait(0.05):
+            peak_temp[0] = max(peak_temp[0], directory_size(temp_dir))
+    sampler = threading.Thread(target=sample_temp_dir, daemon=True)
+    sampler.start()
+
+    result = {'mode': args.child}
+    try:
+        output_path = scraper._download_episode(stream_info, 'bench', 'bench')
+        result['ok'] = True
+        result['output_bytes'] = os.path.getsize(output_path)
+    except Exception as e:
+        result['ok'] = False
+        result['error'] = str(e)
+    result['time_to_mp4'] = time.perf_counter() - started
+    result['download_time'] = timings.get('download', result['time_to_mp4'])
+    stop_sampling.set()
+    sampler.join()
+    result['peak_temp_mb'] = peak_temp[0] / 1024 / 1024
+    result['peak_rss_mb'] = peak_rss_mb()
+    print(RESULT_PREFIX + json.dumps(result))
+
+
+def run_mode(mode, cdn, args):
+    work_dir = tempfile.mkdtemp(prefix=f"anithief_bench_{mode}_")
+    command = [
+        sys.executable, os.path.abspath(__file__), '--child', mode,
+        '--playlist-url', cdn.playlist_url, '--ffmpeg', args.ffmpeg, '--workers', str(args.workers or 0),
+    ]
+    cdn.reset_stats()
+    try:
+        completed = subprocess.run(command, cwd=work_dir, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            result = json.loads(line[len(RESULT_PREFIX):])
+            break
+    else:
+        tail = (completed.stderr or completed.stdout).strip().splitlines()[-5:]
+        result = {'mode': mode, 'ok': False, 'error': ' / '.join(tail), 'time_to_mp4': 0, 'download_time': 0,
+                  'peak_rss_mb': None, 'peak_temp_mb': 0}
+    result['segments'] = cdn.segments_served
+    result['bytes'] = cdn.bytes_served
+    result['errors'] = cdn.errors_served
+    download_time = max(result['download_time'], 1e-6)
+    result['segments_per_s'] = result['segments'] / download_time
+    result['mb_per_s'] = result['bytes'] / 1024 / 1024 / download_time
+    return result
+
+
+def print_table(results):
+    print(f"{'mode':<12} {'ok':<4} {'seg/s':>8} {'MB/s':>8} {'peak RSS MB':>12} {'peak temp MB':>13} {'download s':>11} {'to mp4 s':>9}")
+    for r in results:
+        rss = f"{r['peak_rss_mb']:.1f}" if r['peak_rss_mb'] is not None else "-"
+        print(f"{r['mode']:<12} {'yes' if r['ok'] else 'NO':<4} {r['segments_per_s']:>8.1f} {r['mb_per_s']:>8.1f} "
+              f"{rss:>12} {r['peak_temp_mb']:>13.1f} {r['download_time']:>11.2f} {r['time_to_mp4']:>9.2f}")
+        if not r['ok']:
+            print(f"    실패: {r.get('error')}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--modes', default=','.join(MODES), help="쉼표로 구분한 모드 목록 (%(default)s)")
+    parser.add_argument('--segments', type=int, default=363)
+    parser.add_argument('--segment-kb', type=int, default=1220)
+    parser.add_argument('--latency-ms', type=float, default=50)
+    parser.add_argument('--bandwidth-mbps', type=float, default=0, help="연결당 대역폭 (0 = 제한 없음)")
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--tail-rate', type=float, default=0.0, help="느리게 응답할 조각 요청 비율")
+    parser.add_argument('--tail-ms', type=float, default=0, help="느린 응답에 더할 지연")
+    parser.add_argument('--workers', type=int, default=0, help="동시 조각 작업자 수 (0 = 기본값)")
+    parser.add_argument('--encrypt', action='store_true', help="AES-128 로 암호화된 조각을 제공")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--ffmpeg', default=os.path.join(BENCH_DIR, 'mux_standin.py'))
+    parser.add_argument('--json', help="결과를 JSON 파일로도 저장")
+    # 내부용 (자식 프로세스)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    parser.add_argument('--playlist-url', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args)
+        return
+
+    from local_cdn import LocalCDN, generate_ts_segments
+
+    ts_dir = None
+    if os.path.basename(args.ffmpeg) != 'mux_standin.py':
+        # 실제 FFMPEG 를 쓸 때는 먹싱이 가능하도록 진짜 TS 조각을 만들어 제공한다.
+        ts_dir = generate_ts_segments(args.ffmpeg, os.path.join(tempfile.gettempdir(), f"anithief_bench_ts_{args.segments}"), args.segments, 4)
+
+    cdn = LocalCDN(segment_count=args.segments, segment_bytes=args.segment_kb * 1024, latency_ms=args.latency_ms,
+                   bandwidth_mbps=args.bandwidth_mbps, error_rate=args.error_rate, ts_dir=ts_dir, encrypt=args.encrypt,
+                   seed=args.seed, tail_rate=args.tail_rate, tail_ms=args.tail_ms).start()
+    print(f"로컬 CDN: {cdn.playlist_url} (조각 {args.segments}개, 지연 {args.latency_ms}ms, "
+          f"대역폭 {args.bandwidth_mbps or '무제한'} Mbps/연결, 오류율 {args.error_rate}, 암호화 {'예' if args.encrypt else '아니오'})")
+    results = []
+    try:
+        for mode in args.modes.split(','):
+            mode = mode.strip()
+            if mode not in MODES:
+                print(f"알 수 없는 모드: {mode} (가능한 모드: {', '.join(MODES)})")
+                continue
+            print(f"[{mode}] 실행 중...")
+            results.append(run_mode(mode, cdn, args))
+    finally:
+        cdn.stop()
+
+    print_table(results)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main()
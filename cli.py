@@ -0,0 +1,220 @@
+"""AniThief 명령줄 도구. PyQt6 / 디스플레이 없이 검색, 상세 정보, 에피소드 일괄 다운로드를 한다.
+
+    python cli.py search 귀멸의 칼날
+    python cli.py details 6739 --json
+    python cli.py download 6739 --episodes 1-3,5 --quality within:30
+    python cli.py download 6739 --provider 30df7673-b666-4b2a-b1db-de749788202d
+
+종료 코드: 0 성공 / 1 하나 이상 실패(네트워크 오류 포함) / 2 잘못된 인자 / 3 결과 없음 / 130 중단(Ctrl+C)
+"""
+import argparse
+import contextlib
+import json
+import re
+import sys
+
+import hls
+from scraper import AniLifeScraper, FetchError
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+EXIT_INTERRUPTED = 130
+
+
+def parse_episode_ranges(text):
+    # "1-3,5,10-" -> [(1, 3), (5, 5), (10, None)]  (끝을 비우면 마지막 화까지)
+    ranges = []
+    for part in text.split(','):
+        part = part.strip()
+        match = re.fullmatch(r'(\d+(?:\.\d+)?)(?:\s*-\s*(\d+(?:\.\d+)?)?)?', part)
+        if not match:
+            raise argparse.ArgumentTypeError(f"에피소드 범위 형식이 올바르지 않습니다: '{part}' (예: 1-3,5,10-)")
+        start = float(match.group(1))
+        if '-' not in part:
+            end = start
+        else:
+            end = float(match.group(2)) if match.group(2) else None
+        if end is not None and end < start:
+            raise argparse.ArgumentTypeError(f"에피소드 범위의 끝이 시작보다 작습니다: '{part}'")
+        ranges.append((start, end))
+    return ranges
+
+
+def episode_number(episode):
+    # 'num' 은 "3", "3화", "12.5" 처럼 올 수 있으므로 처음 나오는 숫자를 화수로 본다.
+    match = re.search(r'\d+(?:\.\d+)?', episode.get('num', ''))
+    return float(match.group()) if match else None
+
+
+def select_episodes(episodes, ranges):
+    selected = []
+    for episode in episodes:
+        number = episode_number(episode)
+        if number is None:
+            continue
+        if any(start <= number and (end is None or number <= end) for start, end in ranges):
+            selected.append(episode)
+    # 목록은 보통 최신화부터 나오므로, 받을 때는 화수 순서로 정렬한다.
+    return sorted(selected, key=episode_number)
+
+
+class ProgressPrinter:
+    # 다운로드 진행 상황을 stderr 에 한 줄씩 남긴다. (세부 진행률은 10% 단위로만)
+    def __init__(self, label, stream=sys.stderr):
+        self.label = label
+        self.stream = stream
+        self._last_sub = None
+
+    def on_progress(self, current, total, message):
+        print(f"[{self.label}] ({current}/{total}) {message}", file=self.stream, flush=True)
+
+    def on_sub_progress(self, current, total, label):
+        step = (label, current * 10 // max(total, 1))
+        if step != self._last_sub:
+            self._last_sub = step
+            print(f"[{self.label}]   {label}: {current}/{total}", file=self.stream, flush=True)
+
+    def on_trace(self, summary):
+        print(f"[{self.label}]   단계별 소요 시간: {summary}", file=self.stream, flush=True)
+
+
+def cmd_search(scraper, args, out):
+    results = scraper.search(args.keyword, raise_errors=True)
+    if args.json:
+        json.dump(results, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        for result in results:
+            out.write(f"{result['id']}\t{result['title']}\n")
+    return EXIT_OK if results else EXIT_NOT_FOUND
+
+
+def cmd_details(scraper, args, out):
+    details = scraper.get_anime_details(args.anime_id, raise_errors=True)
+    if not details:
+        print(f"상세 정보를 가져오지 못했습니다: {args.anime_id}", file=sys.stderr)
+        return EXIT_NOT_FOUND
+    if args.json:
+        json.dump(details, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        out.write(f"{details['title']}\n")
+        for key, value in details.get('extra_info', {}).items():
+            out.write(f"  {key}: {value}\n")
+        for episode in details['episodes']:
+            out.write(f"{episode['num']}\t{episode['provider_id']}\t{episode['title']}\n")
+    return EXIT_OK
+
+
+def cmd_download(scraper, args, out):
+    if args.provider:
+        targets = [{'num': '', 'title': provider_id, 'provider_id': provider_id} for provider_id in args.provider]
+    else:
+        details = scraper.get_anime_details(args.anime_id, raise_errors=True)
+        if not details or not details.get('episodes'):
+            print(f"에피소드 목록을 가져오지 못했습니다: {args.anime_id}", file=sys.stderr)
+            return EXIT_NOT_FOUND
+        if args.episodes is None:
+            targets = sorted(details['episodes'], key=lambda episode: episode_number(episode) or 0)
+        else:
+            targets = select_episodes(details['episodes'], args.episodes)
+        if not targets:
+            print("범위에 맞는 에피소드가 없습니다.", file=sys.stderr)
+            return EXIT_NOT_FOUND
+
+    printer = ProgressPrinter('')
+    errors = []
+    scraper.progress_update.connect(printer.on_progress)
+    scraper.sub_progress_update.connect(printer.on_sub_progress)
+    scraper.trace_finished.connect(printer.on_trace)
+    scraper.error.connect(errors.append)
+
+    results = []
+    for episode in targets:
+        label = f"{episode['num']}화" if episode['num'] else episode['provider_id']
+        printer.label = label
+        errors.clear()
+        result = scraper.get_video_info(episode['provider_id'], args.anime_id)
+        entry = {'num': episode['num'], 'provider_id': episode['provider_id'], 'ok': bool(result.get('download_path'))}
+        if entry['ok']:
+            entry['path'] = result['download_path']
+        else:
+            entry['error'] = errors[-1] if errors else "알 수 없는 오류"
+        results.append(entry)
+        print(f"[{label}] {'완료: ' + entry['path'] if entry['ok'] else '실패: ' + entry['error']}", file=sys.stderr, flush=True)
+        if not entry['ok'] and args.fail_fast:
+            break
+
+    if args.json:
+        json.dump(results, out, ensure_ascii=False, indent=2)
+        out.write("\n")
+    else:
+        for entry in results:
+            out.write(f"{'OK' if entry['ok'] else 'FAIL'}\t{entry['num']}\t{entry.get('path') or entry['error']}\n")
+    failed = sum(1 for entry in results if not entry['ok'])
+    print(f"총 {len(targets)}개 중 {len(results) - failed}개 성공, {failed}개 실패", file=sys.stderr)
+    return EXIT_FAILED if failed or len(results) < len(targets) else EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='cli.py', description=__doc__.splitlines()[0])
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search = subparsers.add_parser('search', help="애니메이션 검색")
+    search.add_argument('keyword')
+    search.add_argument('--json', action='store_true', help="결과를 JSON 으로 출력")
+    search.set_defaults(handler=cmd_search)
+
+    details = subparsers.add_parser('details', help="상세 정보와 에피소드 목록")
+    details.add_argument('anime_id')
+    details.add_argument('--json', action='store_true', help="결과를 JSON 으로 출력")
+    details.set_defaults(handler=cmd_details)
+
+    download = subparsers.add_parser('download', help="에피소드 다운로드 (기본: 전체)")
+    download.add_argument('anime_id')
+    selection = download.add_mutually_exclusive_group()
+    selection.add_argument('--episodes', type=parse_episode_ranges, help="화수 범위 (예: 1-3,5,10-)")
+    selection.add_argument('--provider', action='append', help="provider_id 로 직접 지정 (여러 번 가능)")
+    download.add_argument('--quality', default='highest', help=f"화질 정책 ({', '.join(hls.POLICY_LABELS)})")
+    download.add_argument('--workers', type=int, default=0, help="동시 조각 작업자 수 (0 = 기본값)")
+    download.add_argument('--pipelined', action='store_true', help="받으면서 바로 FFMPEG 로 병합")
+    download.add_argument('--segment-store', action='store_true', help="조각을 파일 하나에 모아 받음 (NAS 등 파일 생성이 느린 저장소용)")
+    download.add_argument('--no-resume', action='store_true', help="이전에 받아둔 조각을 쓰지 않음")
+    download.add_argument('--fail-fast', action='store_true', help="한 화라도 실패하면 멈춤")
+    download.add_argument('--json', action='store_true', help="결과를 JSON 으로 출력")
+    download.set_defaults(handler=cmd_download)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        scraper_kwargs = {}
+        if args.command == 'download':
+            hls.parse_policy(args.quality)
+            scraper_kwargs = {'segment_workers': args.workers or None, 'pipelined': args.pipelined,
+                              'resume': not args.no_resume, 'quality_policy': args.quality,
+                              'segment_store': args.segment_store}
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = sys.stdout
+    try:
+        # 코어의 디버그 출력은 stderr 로 돌려, stdout 에는 결과(표 또는 JSON)만 남긴다.
+        with contextlib.redirect_stdout(sys.stderr):
+            scraper = AniLifeScraper(**scraper_kwargs)
+            return args.handler(scraper, args, out)
+    except FetchError as e:
+        # 요청 실패는 "결과 없음"(3)과 구분해 실패(1)로 끝낸다. (cron 등에서 다시 시도할 수 있도록)
+        print(f"사이트에 연결하지 못했습니다: {e}", file=sys.stderr)
+        return EXIT_FAILED
+    except KeyboardInterrupt:
+        print("중단되었습니다.", file=sys.stderr)
+        return EXIT_INTERRUPTED
+
+
+if __name__ == '__main__':
+    sys.exit(main())
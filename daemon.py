@@ -0,0 +1,525 @@
+"""AniThief 다운로드 데몬. GUI 를 닫아도 계속 도는 다운로드 작업 큐.
+
+    python daemon.py serve --resolve 1 --transfer 2
+    python daemon.py list
+    python daemon.py cancel 12
+    python daemon.py retry 12
+    python daemon.py stop
+
+작업은 SQLite(cache/jobs.sqlite3)에 기록되며, 상태는 queued -> resolving -> downloading -> muxing -> done / failed 로 바뀐다.
+데몬이 죽거나 다시 켜지면 진행 중이던 작업을 대기열로 되돌리고, 작업 폴더에 받아둔 조각은 이어받기로 다시 쓴다.
+main.py 등 클라이언트는 127.0.0.1 의 TCP 소켓으로 한 줄짜리 JSON 요청/응답을 주고받는다. (DaemonClient)
+요청마다 데몬이 시작할 때 cache/daemon.token 에 쓴 토큰을 실어야 한다. (같은 사용자만 읽을 수 있는 파일)
+"""
+import argparse
+import hmac
+import json
+import os
+import secrets
+import socket
+import socketserver
+import sqlite3
+import sys
+import threading
+import time
+
+from scraper import AniLifeScraper
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = int(os.environ.get('ANITHIEF_DAEMON_PORT', 47321))
+# 데몬이 시작할 때마다 새로 만드는 접속 토큰 파일 (웹 페이지 등 다른 출처의 요청을 막기 위함)
+DEFAULT_TOKEN_PATH = os.path.join("cache", "daemon.token")
+# 요청 한 줄의 최대 길이
+MAX_REQUEST_BYTES = 1024 * 1024
+
+# 작업 상태 (ACTIVE_STATES 는 작업자 스레드가 처리 중인 상태)
+QUEUED = 'queued'
+RESOLVING = 'resolving'
+DOWNLOADING = 'downloading'
+MUXING = 'muxing'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE_STATES = (RESOLVING, DOWNLOADING, MUXING)
+FINISHED_STATES = (DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    provider_id TEXT NOT NULL,
+    anime_id TEXT NOT NULL,
+    label TEXT NOT NULL,
+    quality_policy TEXT NOT NULL DEFAULT 'highest',
+    state TEXT NOT NULL DEFAULT 'queued',
+    priority REAL NOT NULL,
+    message TEXT,
+    path TEXT,
+    error TEXT,
+    trace_summary TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, priority, id);
+"""
+
+
+class JobStore:
+    """다운로드 작업 큐를 SQLite 에 저장한다. 여러 스레드에서 같이 써도 된다. (연결 하나 + 잠금)
+
+    대기 중인 작업은 priority 가 작은 것부터, 같으면 먼저 넣은 것부터 꺼낸다.
+    """
+
+    def __init__(self, path=os.path.join("cache", "jobs.sqlite3")):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        # 상태가 바뀔 때마다 한 번씩 커밋하므로 WAL 모드로 쓰기 비용을 줄인다.
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+    def _row(self, job_id):
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def get(self, job_id):
+        with self._lock:
+            return self._row(job_id)
+
+    def add(self, provider_id, anime_id, label, quality_policy='highest'):
+        # 같은 에피소드가 이미 대기 중이거나 진행 중이면 새로 넣지 않고 그 작업을 돌려준다. 반환값: (작업, 새로 넣었는지)
+        now = time.time()
+        with self._lock, self._db:
+            placeholders = ",".join("?" * (len(ACTIVE_STATES) + 1))
+            row = self._db.execute(f"SELECT * FROM jobs WHERE provider_id = ? AND state IN ({placeholders})",
+                                   (provider_id, QUEUED) + ACTIVE_STATES).fetchone()
+            if row:
+                return dict(row), False
+            cursor = self._db.execute(
+                "INSERT INTO jobs (provider_id, anime_id, label, quality_policy, state, priority, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(priority), 0) + 1 FROM jobs), ?, ?)",
+                (provider_id, anime_id, label, quality_policy, QUEUED, now, now))
+            return self._row(cursor.lastrowid), True
+
+    def update(self, job_id, **fields):
+        fields['updated_at'] = time.time()
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._db:
+            self._db.execute(f"UPDATE jobs SET {columns} WHERE id = ?", tuple(fields.values()) + (job_id,))
+
+    def claim(self):
+        # 다음 대기 작업을 resolving 으로 바꿔서 꺼낸다. (없으면 None)
+        with self._lock, self._db:
+            row = self._db.execute("SELECT id FROM jobs WHERE state = ? ORDER BY priority, id LIMIT 1", (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("UPDATE jobs SET state = ?, attempts = attempts + 1, error = NULL, updated_at = ? WHERE id = ?",
+                             (RESOLVING, time.time(), row['id']))
+            return self._row(row['id'])
+
+    def recover(self):
+        # 데몬이 중간에 죽어서 진행 중으로 남은 작업을 대기열 맨 앞으로 되돌린다. 반환값: 되돌린 작업 수
+        with self._lock, self._db:
+            placeholders = ",".join("?" * len(ACTIVE_STATES))
+            cursor = self._db.execute(
+                f"UPDATE jobs SET state = ?, message = ?, priority = priority - (SELECT COALESCE(MAX(priority), 0) FROM jobs), "
+                f"updated_at = ? WHERE state IN ({placeholders})",
+                (QUEUED, "데몬 재시작: 이어받기 대기 중", time.time()) + ACTIVE_STATES)
+            return cursor.rowcount
+
+    def cancel_queued(self, job_id, error):
+        # 아직 대기 중인 작업만 실패로 바꾼다. (이미 작업자가 꺼냈으면 아무것도 바꾸지 않고 False)
+        with self._lock, self._db:
+            cursor = self._db.execute("UPDATE jobs SET state = ?, error = ?, updated_at = ? WHERE id = ? AND state = ?",
+                                      (FAILED, error, time.time(), job_id, QUEUED))
+            return cursor.rowcount > 0
+
+    def requeue(self, job_id):
+        # 실패한 작업을 다시 대기열 끝에 넣는다.
+        with self._lock, self._db:
+            cursor = self._db.execute(
+                "UPDATE jobs SET state = ?, message = NULL, error = NULL, path = NULL, "
+                "priority = (SELECT COALESCE(MAX(priority), 0) + 1 FROM jobs), updated_at = ? WHERE id = ? AND state = ?",
+                (QUEUED, time.time(), job_id, FAILED))
+            return cursor.rowcount > 0
+
+    def move(self, job_id, delta):
+        # 대기 중인 작업끼리 순서를 바꾼다. (main.py DownloadScheduler.move_job 과 같은 규칙)
+        with self._lock, self._db:
+            queued = [row['id'] for row in self._db.execute("SELECT id FROM jobs WHERE state = ? ORDER BY priority, id", (QUEUED,))]
+            if job_id not in queued:
+                return False
+            index = queued.index(job_id)
+            new_index = max(0, min(len(queued) - 1, index + delta))
+            if new_index == index:
+                return False
+            queued.insert(new_index, queued.pop(index))
+            base = self._db.execute("SELECT COALESCE(MIN(priority), 0) FROM jobs").fetchone()[0]
+            self._db.executemany("UPDATE jobs SET priority = ? WHERE id = ?",
+                                 [(base + position, queued_id) for position, queued_id in enumerate(queued)])
+            return True
+
+    def list(self, finished_limit=100):
+        # 대기/진행 중인 작업 전부와 최근에 끝난 작업 finished_limit 개 (목록 순서: 끝난 것 -> 진행 중 -> 대기 순서)
+        with self._lock:
+            finished = self._db.execute(
+                "SELECT * FROM jobs WHERE state IN (?, ?) ORDER BY updated_at DESC LIMIT ?", FINISHED_STATES + (finished_limit,)).fetchall()
+            pending = self._db.execute(
+                "SELECT * FROM jobs WHERE state NOT IN (?, ?) ORDER BY state = ?, priority, id", FINISHED_STATES + (QUEUED,)).fetchall()
+        return [dict(row) for row in reversed(finished)] + [dict(row) for row in pending]
+
+
+class DownloadDaemon:
+    """JobStore 의 작업을 작업자 스레드들이 꺼내 AniLifeScraper 로 받는다.
+
+    브라우저 해석과 조각 전송은 GUI 의 DownloadScheduler 와 같은 방식으로 각각 동시 실행 수를 제한하고,
+    두 한도의 합만큼 작업자를 띄운다. 진행률은 메모리에만 두고, 상태/결과만 SQLite 에 기록한다.
+    """
+
+    def __init__(self, store, resolve_limit=1, transfer_limit=2, host=DEFAULT_HOST, port=DEFAULT_PORT, segment_store=False,
+                 token_path=DEFAULT_TOKEN_PATH):
+        self.store = store
+        self.token_path = token_path
+        self.token = secrets.token_hex(32)
+        # 조각을 파일 하나에 모아 받을지 (AniLifeScraper segment_store)
+        self.segment_store = segment_store
+        self.resolve_slots = threading.BoundedSemaphore(resolve_limit)
+        self.transfer_slots = threading.BoundedSemaphore(transfer_limit)
+        self.worker_count = resolve_limit + transfer_limit
+        # job_id -> {'main': [현재, 전체, 메시지], 'sub': [현재, 전체, 레이블]}
+        self.progress = {}
+        # job_id -> 취소용 threading.Event (진행 중인 작업만)
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._stopping = threading.Event()
+        self._workers = []
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler_class(), bind_and_activate=False)
+        self.server.daemon_threads = True
+        # 윈도우의 SO_REUSEADDR 은 이미 쓰이는 포트를 다른 프로세스가 가로채게 하므로, 재시작 편의(TIME_WAIT)는 POSIX 에서만 켜고
+        # 윈도우에서는 SO_EXCLUSIVEADDRUSE 로 포트를 독점한다.
+        self.server.allow_reuse_address = os.name != 'nt'
+        if hasattr(socket, 'SO_EXCLUSIVEADDRUSE'):
+            self.server.socket.setsockopt(socket.SOL_SOCKET, socket.SO_EXCLUSIVEADDRUSE, 1)
+
+    @property
+    def address(self):
+        return self.server.server_address[:2]
+
+    def start(self):
+        recovered = self.store.recover()
+        if recovered:
+            print(f"[DEBUG] 진행 중이던 작업 {recovered}개를 대기열로 되돌렸습니다. (이어받기)")
+        self.server.server_bind()
+        self.server.server_activate()
+        # 포트를 잡은 뒤에 토큰을 쓴다. (이미 실행 중인 데몬의 토큰을 덮어쓰지 않도록)
+        write_token(self.token_path, self.token)
+        for i in range(self.worker_count):
+            worker = threading.Thread(target=self._worker_loop, name=f"daemon-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+        threading.Thread(target=self.server.serve_forever, name='daemon-server', daemon=True).start()
+        print(f"[DEBUG] 다운로드 데몬 시작: {self.address[0]}:{self.address[1]} (작업자 {self.worker_count}개, DB {self.store.path})")
+        return self
+
+    def stop(self):
+        # 진행 중인 작업은 실패로 기록하지 않고 조각 전송만 멈춘다. (상태가 그대로 남아 다음 시작 때 recover 로 이어받는다)
+        self._stopping.set()
+        with self._wakeup:
+            for event in self._cancel_events.values():
+                event.set()
+            self._wakeup.notify_all()
+        self.server.shutdown()
+        self.server.server_close()
+        try:
+            os.remove(self.token_path)
+        except OSError:
+            pass
+
+    def wait(self):
+        try:
+            while not self._stopping.wait(1):
+                pass
+        except KeyboardInterrupt:
+            print("[DEBUG] 다운로드 데몬 중단 요청")
+            self.stop()
+
+    # --- 작업 실행 ---
+    def _next_job(self):
+        with self._wakeup:
+            while not self._stopping.is_set():
+                job = self.store.claim()
+                if job is not None:
+                    self._cancel_events[job['id']] = threading.Event()
+                    return job
+                self._wakeup.wait(5)
+        return None
+
+    def _worker_loop(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            try:
+                self._run_job(job)
+            except Exception as e:
+                # 작업 하나의 예상치 못한 오류로 작업자 스레드가 죽지 않게 한다.
+                print(f"[DEBUG] 작업 #{job['id']} 처리 중 예외: {e}")
+                self.store.update(job['id'], state=FAILED, error=str(e))
+            finally:
+                with self._lock:
+                    self._cancel_events.pop(job['id'], None)
+                    self.progress.pop(job['id'], None)
+
+    def _run_job(self, job):
+        job_id = job['id']
+        print(f"[DEBUG] 데몬 작업 #{job_id} 시작: {job['label']} (시도 {job['attempts']}회째)")
+        progress = self.progress.setdefault(job_id, {'main': [0, 15, "시작 중..."], 'sub': [0, 1, ""]})
+        scraper = AniLifeScraper(resolve_slots=self.resolve_slots, transfer_slots=self.transfer_slots, quality_policy=job['quality_policy'],
+                                 segment_store=self.segment_store)
+        scraper.cancel_event = self._cancel_events[job_id]
+        errors = []
+        trace = []
+        # 취소된 뒤에 넘어가는 단계는 기록하지 않는다. (취소가 진행 상태로 덮이지 않도록)
+        scraper.stage_changed.connect(lambda stage: None if scraper.cancel_event.is_set() else self.store.update(job_id, state=stage))
+        scraper.progress_update.connect(lambda current, total, message: progress.update(main=[current, total, message]))
+        scraper.sub_progress_update.connect(lambda current, total, label: progress.update(sub=[current, total, label]))
+        scraper.error.connect(errors.append)
+        scraper.trace_finished.connect(trace.append)
+
+        # 꺼내자마자 취소된 작업은 브라우저를 띄우지 않는다.
+        result = {} if scraper.cancel_event.is_set() else scraper.get_video_info(job['provider_id'], job['anime_id'])
+        download_path = result.get('download_path')
+        if not download_path and self._stopping.is_set():
+            print(f"[DEBUG] 데몬 종료로 작업 #{job_id} 중단 (다음 실행 때 이어받음)")
+            return
+        # 해석/병합 중에 취소되어 파일이 완성됐더라도, 사용자가 취소한 작업은 완료로 기록하지 않는다.
+        if download_path and not (scraper.cancel_event.is_set() and not self._stopping.is_set()):
+            self.store.update(job_id, state=DONE, path=download_path, message="다운로드 완료", trace_summary=trace[-1] if trace else None)
+            print(f"[DEBUG] 데몬 작업 #{job_id} 완료: {download_path}")
+            return
+        if scraper.cancel_event.is_set():
+            error = "사용자가 취소했습니다."
+        else:
+            error = errors[-1] if errors else "알 수 없는 오류"
+        self.store.update(job_id, state=FAILED, error=error, message=progress['main'][2], trace_summary=trace[-1] if trace else None)
+        print(f"[DEBUG] 데몬 작업 #{job_id} 실패: {error}")
+
+    # --- 요청 처리 ---
+    def submit(self, provider_id, anime_id, label, quality_policy='highest'):
+        job, added = self.store.add(provider_id, anime_id, label, quality_policy)
+        if added:
+            with self._wakeup:
+                self._wakeup.notify()
+        return job
+
+    def cancel(self, job_id):
+        # 대기 중이면 바로 실패 처리하고, 진행 중이면 조각 다운로드를 멈추게 한다.
+        # 작업자는 _wakeup 을 잡은 채로 작업을 꺼내고 취소 이벤트를 등록하므로, 같은 잠금 안에서 확인해야 둘 사이에 끼지 않는다.
+        with self._wakeup:
+            if self.store.cancel_queued(job_id, "사용자가 취소했습니다."):
+                return True
+            event = self._cancel_events.get(job_id)
+        if event is not None:
+            event.set()
+            return True
+        return False
+
+    def retry(self, job_id):
+        if not self.store.requeue(job_id):
+            return False
+        with self._wakeup:
+            self._wakeup.notify()
+        return True
+
+    def jobs(self):
+        jobs = self.store.list()
+        with self._lock:
+            for job in jobs:
+                progress = self.progress.get(job['id'])
+                if progress:
+                    job['progress'] = progress['main']
+                    job['sub_progress'] = progress['sub']
+        return jobs
+
+    def authorized(self, request):
+        return isinstance(request.get('token'), str) and hmac.compare_digest(request['token'], self.token)
+
+    def handle(self, request):
+        command = request.get('cmd')
+        if command == 'ping':
+            return {'ok': True, 'pid': os.getpid()}
+        if command == 'submit':
+            jobs = [self.submit(item['provider_id'], item['anime_id'], item.get('label') or item['provider_id'],
+                                item.get('quality_policy', 'highest')) for item in request['jobs']]
+            return {'ok': True, 'jobs': jobs}
+        if command == 'list':
+            return {'ok': True, 'jobs': self.jobs()}
+        if command == 'cancel':
+            return {'ok': self.cancel(int(request['id']))}
+        if command == 'retry':
+            return {'ok': self.retry(int(request['id']))}
+        if command == 'move':
+            return {'ok': self.store.move(int(request['id']), int(request['delta']))}
+        if command == 'stop':
+            threading.Thread(target=self.stop, daemon=True).start()
+            return {'ok': True}
+        return {'ok': False, 'error': f"알 수 없는 명령: {command}"}
+
+    def _handler_class(self):
+        daemon = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def respond(self, response):
+                self.wfile.write(json.dumps(response, ensure_ascii=False).encode('utf-8') + b"\n")
+                self.wfile.flush()
+
+            def handle(self):
+                # 한 줄에 요청 하나. 연결을 유지하면 여러 요청을 차례로 보낼 수 있다.
+                # JSON 객체가 아니거나 토큰이 맞지 않는 줄이 오면 바로 연결을 끊는다.
+                # (브라우저가 보낸 HTTP 요청의 헤더 줄을 건너뛰고 본문의 명령을 실행하지 않도록)
+                while True:
+                    line = self.rfile.readline(MAX_REQUEST_BYTES)
+                    if not line:
+                        return
+                    try:
+                        request = json.loads(line)
+                    except ValueError:
+                        request = None
+                    if not isinstance(request, dict):
+                        self.respond({'ok': False, 'error': "잘못된 요청"})
+                        return
+                    if not daemon.authorized(request):
+                        self.respond({'ok': False, 'error': "인증 실패"})
+                        return
+                    try:
+                        response = daemon.handle(request)
+                    except (ValueError, KeyError, TypeError) as e:
+                        response = {'ok': False, 'error': f"잘못된 요청: {e}"}
+                    self.respond(response)
+
+        return Handler
+
+
+class DaemonClient:
+    """다운로드 데몬에 요청을 보내는 클라이언트. 요청마다 새로 연결한다.
+
+    데몬이 꺼져 있으면(토큰 파일이 없는 경우 포함) OSError(ConnectionRefusedError 등)가 그대로 올라온다.
+    토큰은 데몬이 다시 켜지면 바뀌므로 요청할 때마다 파일에서 읽는다.
+    """
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=3, token_path=DEFAULT_TOKEN_PATH):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.token_path = token_path
+
+    def call(self, cmd, **params):
+        params['cmd'] = cmd
+        with open(self.token_path, 'r', encoding='utf-8') as f:
+            params['token'] = f.read().strip()
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(json.dumps(params, ensure_ascii=False).encode('utf-8') + b"\n")
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+        if not line:
+            raise ConnectionError("다운로드 데몬이 응답 없이 연결을 끊었습니다.")
+        return json.loads(line)
+
+    def is_running(self):
+        try:
+            return self.call('ping').get('ok', False)
+        except OSError:
+            return False
+
+    def submit(self, jobs):
+        # jobs: [{'provider_id', 'anime_id', 'label', 'quality_policy'}, ...] -> 작업 dict 목록 (이미 있던 작업이면 그 작업)
+        return self.call('submit', jobs=jobs)['jobs']
+
+    def jobs(self):
+        return self.call('list')['jobs']
+
+    def cancel(self, job_id):
+        return self.call('cancel', id=job_id)['ok']
+
+    def retry(self, job_id):
+        return self.call('retry', id=job_id)['ok']
+
+    def move(self, job_id, delta):
+        return self.call('move', id=job_id, delta=delta)['ok']
+
+    def stop(self):
+        return self.call('stop')['ok']
+
+
+def write_token(path, token):
+    # 소유자만 읽고 쓸 수 있는 파일로 만든다. (이미 있던 파일도 권한을 다시 좁힌다)
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        if hasattr(os, 'fchmod'):
+            os.fchmod(f.fileno(), 0o600)
+        f.write(token)
+
+
+def print_jobs(jobs, out=sys.stdout):
+    for job in jobs:
+        detail = job.get('path') or job.get('error') or ""
+        if job.get('progress'):
+            current, total, message = job['progress']
+            detail = f"({current}/{total}) {message}"
+        out.write(f"{job['id']}\t{job['state']}\t{job['label']}\t{detail}\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='daemon.py', description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"소켓 포트 (기본 {DEFAULT_PORT}, 환경 변수 ANITHIEF_DAEMON_PORT)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    serve = subparsers.add_parser('serve', help="데몬 실행")
+    serve.add_argument('--resolve', type=int, default=1, help="동시에 브라우저로 해석할 작업 수")
+    serve.add_argument('--transfer', type=int, default=2, help="동시에 조각을 전송할 작업 수")
+    serve.add_argument('--segment-store', action='store_true', help="조각을 파일 하나에 모아 받음 (NAS 등 파일 생성이 느린 저장소용)")
+    serve.add_argument('--db', default=os.path.join("cache", "jobs.sqlite3"), help="작업 큐 DB 경로")
+    subparsers.add_parser('list', help="작업 목록")
+    for name, help_text in (('cancel', "작업 취소"), ('retry', "실패한 작업 다시 받기")):
+        command = subparsers.add_parser(name, help=help_text)
+        command.add_argument('job_id', type=int)
+    subparsers.add_parser('stop', help="데몬 종료 (진행 중인 작업은 다음 실행 때 이어받음)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        daemon = DownloadDaemon(JobStore(args.db), max(1, args.resolve), max(1, args.transfer), port=args.port, segment_store=args.segment_store)
+        try:
+            daemon.start()
+        except OSError as e:
+            print(f"데몬을 시작하지 못했습니다 (이미 실행 중인지 확인): {e}", file=sys.stderr)
+            return 1
+        daemon.wait()
+        return 0
+
+    client = DaemonClient(port=args.port)
+    try:
+        if args.command == 'list':
+            print_jobs(client.jobs())
+            return 0
+        if args.command == 'stop':
+            return 0 if client.stop() else 1
+        ok = client.cancel(args.job_id) if args.command == 'cancel' else client.retry(args.job_id)
+        return 0 if ok else 1
+    except OSError as e:
+        print(f"다운로드 데몬에 연결하지 못했습니다: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,157 @@
+import atexit
+import queue
+import threading
+
+# get_video_info 에서 사용하는 것과 동일한 브라우저 위장 정보
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
+
+
+class WebDriverPool:
+    """미리 설정된 headless Chrome 드라이버들을 재사용하는 풀.
+
+    acquire()로 빌려가고 release()로 돌려준다. 돌려받은 드라이버는 다음 대여 때 상태를 점검하고,
+    max_uses 회 이상 사용된 드라이버는 종료 후 새로 만든다.
+    """
+
+    # driver.get() 한 번에 기다리는 최대 시간 (초)
+    PAGE_LOAD_TIMEOUT = 30
+
+    def __init__(self, size=2, max_uses=20):
+        self.size = max(1, size)
+        self.max_uses = max(1, max_uses)
+        # 가장 최근에 쓴(따뜻한) 드라이버부터 다시 빌려주도록 LIFO 큐를 사용
+        self._idle = queue.LifoQueue()
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._created = 0
+        self._driver_path = None
+        self._closed = False
+
+    def _service(self):
+        # ChromeDriverManager().install()은 느리므로 풀 전체에서 한 번만 호출한다.
+        # selenium / webdriver_manager 는 실제로 브라우저를 띄울 때만 불러온다.
+        from selenium.webdriver.chrome.service import Service as ChromeService
+        from webdriver_manager.chrome import ChromeDriverManager
+        with self._lock:
+            if self._driver_path is None:
+                self._driver_path = ChromeDriverManager().install()
+            return ChromeService(self._driver_path)
+
+    def _create_driver(self):
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        print("[DEBUG] WebDriverPool: 새 Chrome 드라이버 생성...")
+        options = Options()
+        options.add_argument("--headless")
+        options.add_argument("--log-level=3")
+        options.add_argument(f'user-agent={USER_AGENT}')
+        driver = webdriver.Chrome(service=self._service(), options=options)
+        # 응답 없는 페이지에서 작업이 멈춰 있지 않도록 페이지 로드 시간을 제한한다.
+        driver.set_page_load_timeout(self.PAGE_LOAD_TIMEOUT)
+
+        # --- 봇 탐지 우회 (CDP) ---
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
+            'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
+        })
+
+        # --- [전략 회귀] JS를 처음부터 비활성화 ---
+        driver.execute_cdp_cmd("Emulation.setScriptExecutionDisabled", {"value": True})
+        return driver
+
+    def _is_healthy(self, driver):
+        try:
+            driver.current_url
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+            self._created -= 1
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"[DEBUG] WebDriverPool: 드라이버 종료 중 오류 무시: {e}")
+
+    def acquire(self, timeout=None):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                driver = None
+            if driver is not None:
+                if self._uses.get(id(driver), 0) >= self.max_uses:
+                    print("[DEBUG] WebDriverPool: 사용 횟수 초과로 드라이버 교체")
+                    self._discard(driver)
+                    continue
+                if not self._is_healthy(driver):
+                    print("[DEBUG] WebDriverPool: 응답 없는 드라이버 교체")
+                    self._discard(driver)
+                    continue
+                break
+
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    driver = self._create_driver()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+                break
+
+            # 풀이 가득 찼으면 다른 작업이 돌려줄 때까지 기다린다.
+            try:
+                driver = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise TimeoutError("사용 가능한 WebDriver가 없습니다.")
+            self._idle.put(driver)
+
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+        return driver
+
+    def release(self, driver):
+        if self._closed:
+            self._discard(driver)
+            return
+        try:
+            # 이전 작업의 페이지가 백그라운드에서 계속 돌지 않도록 빈 페이지로 이동
+            driver.get("about:blank")
+        except Exception:
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def warm_up(self, count=1):
+        # 첫 에피소드 요청 전에 드라이버를 미리 띄워둔다.
+        drivers = [self.acquire() for _ in range(min(count, self.size))]
+        for driver in drivers:
+            self.release(driver)
+
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(driver)
+
+
+_shared_pool = None
+_shared_pool_lock = threading.Lock()
+
+
+def get_driver_pool():
+    # 프로세스 전체에서 공유하는 드라이버 풀. 프로그램 종료 시 남은 브라우저를 모두 닫는다.
+    global _shared_pool
+    with _shared_pool_lock:
+        if _shared_pool is None:
+            _shared_pool = WebDriverPool()
+            atexit.register(_shared_pool.close)
+        return _shared_pool
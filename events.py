@@ -0,0 +1,60 @@
+import threading
+import traceback
+
+
+class BoundSignal:
+    """객체 하나에 묶인 시그널. connect 한 함수들을 emit 한 스레드에서 차례로 호출한다."""
+
+    def __init__(self):
+        self._slots = []
+        self._lock = threading.Lock()
+
+    def connect(self, slot):
+        with self._lock:
+            self._slots.append(slot)
+
+    def disconnect(self, slot=None):
+        # slot 을 주지 않으면 모두 끊는다.
+        with self._lock:
+            if slot is None:
+                self._slots = []
+            elif slot in self._slots:
+                self._slots.remove(slot)
+
+    def emit(self, *args):
+        with self._lock:
+            slots = list(self._slots)
+        for slot in slots:
+            try:
+                slot(*args)
+            except Exception:
+                # 받는 쪽의 오류 때문에 다운로드가 멈추지 않도록 기록만 하고 넘어간다.
+                print("[DEBUG] 시그널 처리 중 오류:")
+                traceback.print_exc()
+
+
+class Signal:
+    """Qt 없이 쓰는 pyqtSignal 대용품. 클래스 속성으로 선언하면 인스턴스마다 따로 BoundSignal 이 생긴다.
+
+        class Worker:
+            progress = Signal(int, int)
+
+        worker.progress.connect(print)
+        worker.progress.emit(1, 10)
+
+    Qt 와 달리 받는 쪽 스레드로 넘겨주지 않으므로, UI 로 보낼 때는 qt_adapter.forward 로 pyqtSignal 에 이어준다.
+    """
+
+    def __init__(self, *types):
+        # 인자 타입은 문서용 (검사하지 않음)
+        self.types = types
+        self.name = None
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self
+        # 처음 접근할 때 인스턴스 사전에 넣어두고, 이후로는 그것을 그대로 쓴다.
+        return instance.__dict__.setdefault(self.name, BoundSignal())
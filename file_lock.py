@@ -0,0 +1,63 @@
+import contextlib
+import os
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+def _thread_lock(path):
+    # 같은 프로세스 안의 스레드끼리는 파일 잠금이 서로를 막아주지 않으므로(fcntl 은 프로세스 단위) 따로 잠근다.
+    key = os.path.abspath(path)
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.Lock()
+        return lock
+
+
+@contextlib.contextmanager
+def locked(path):
+    """path 옆의 '<path>.lock' 파일을 잡아, 여러 프로세스(GUI/데몬/CLI)가 같은 캐시 파일을 동시에 읽고-합치고-쓰지 않게 한다."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with _thread_lock(path):
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            elif msvcrt is not None:
+                # LK_LOCK 은 10번(약 10초)까지만 다시 시도하므로 잡힐 때까지 반복한다.
+                os.lseek(fd, 0, os.SEEK_SET)
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                elif msvcrt is not None:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+def temp_path(path):
+    # 프로세스/스레드마다 다른 임시 파일 이름 (서로의 임시 파일을 덮어쓰거나 지우지 않도록)
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
@@ -0,0 +1,313 @@
+import re
+from urllib.parse import urljoin
+
+# KEY=VALUE 속성 목록. 값은 따옴표 문자열이거나 쉼표가 나오기 전까지의 토큰이다.
+_ATTRIBUTE_RE = re.compile(r'([A-Z0-9-]+)=("[^"]*"|[^,]*)')
+
+
+def parse_attributes(text):
+    # '#EXT-X-KEY:METHOD=AES-128,URI="..."' 의 콜론 뒤 부분을 딕셔너리로 바꾼다. (따옴표는 벗긴다)
+    attributes = {}
+    for name, value in _ATTRIBUTE_RE.findall(text):
+        if len(value) >= 2 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+        attributes[name] = value
+    return attributes
+
+
+class Key:
+    """#EXT-X-KEY 한 줄. 이후 다음 키가 나올 때까지의 조각에 적용된다."""
+
+    def __init__(self, method, uri=None, iv=None, keyformat='identity'):
+        self.method = method
+        self.uri = uri
+        # 16바이트 IV. 없으면 조각의 미디어 시퀀스 번호를 IV로 쓴다. (RFC 8216 5.2)
+        self.iv = iv
+        self.keyformat = keyformat
+
+    def to_tag(self):
+        parts = [f"METHOD={self.method}"]
+        if self.uri:
+            parts.append(f'URI="{self.uri}"')
+        if self.iv is not None:
+            parts.append(f"IV=0x{self.iv.hex()}")
+        if self.keyformat != 'identity':
+            parts.append(f'KEYFORMAT="{self.keyformat}"')
+        return "#EXT-X-KEY:" + ",".join(parts)
+
+
+class Segment:
+    def __init__(self, uri, duration, sequence, title='', byterange=None, key=None, discontinuity=False):
+        self.uri = uri
+        self.duration = duration
+        # 미디어 시퀀스 번호 (EXT-X-MEDIA-SEQUENCE 부터 1씩 증가)
+        self.sequence = sequence
+        self.title = title
+        # (길이, 시작 오프셋) - EXT-X-BYTERANGE 가 있을 때만
+        self.byterange = byterange
+        self.key = key
+        self.discontinuity = discontinuity
+
+    def range_header(self):
+        # 이 조각만 받기 위한 HTTP Range 헤더 값 (바이트 범위가 없으면 None)
+        if not self.byterange:
+            return None
+        length, offset = self.byterange
+        return f"bytes={offset}-{offset + length - 1}"
+
+
+class Variant:
+    """마스터 플레이리스트의 #EXT-X-STREAM-INF 항목 (화질 하나)."""
+
+    def __init__(self, uri, bandwidth=None, average_bandwidth=None, resolution=None, codecs=None, frame_rate=None, name=None):
+        self.uri = uri
+        # 초당 비트 수 (마스터 플레이리스트에 없으면 조각 크기로 추정해서 채운다)
+        self.bandwidth = bandwidth
+        self.average_bandwidth = average_bandwidth
+        # (가로, 세로)
+        self.resolution = resolution
+        self.codecs = codecs
+        self.frame_rate = frame_rate
+        self.name = name
+
+    @property
+    def height(self):
+        if self.resolution:
+            return self.resolution[1]
+        # '1080' 처럼 이름에 세로 해상도가 들어 있는 경우
+        match = re.search(r'(\d{3,4})', self.name or '')
+        return int(match.group(1)) if match else 0
+
+    def bitrate(self):
+        # 용량 계산에는 평균 비트레이트가 더 정확하다.
+        return self.average_bandwidth or self.bandwidth
+
+    def __repr__(self):
+        return f"Variant({self.name or self.uri!r}, {self.height}p, {self.bitrate()}bps)"
+
+
+class MasterPlaylist:
+    is_master = True
+
+    def __init__(self, variants, version=None):
+        self.variants = variants
+        self.version = version
+
+
+class MediaPlaylist:
+    is_master = False
+
+    def __init__(self, segments, version=None, target_duration=None, media_sequence=0, playlist_type=None, endlist=False):
+        self.segments = segments
+        self.version = version
+        self.target_duration = target_duration
+        self.media_sequence = media_sequence
+        self.playlist_type = playlist_type
+        self.endlist = endlist
+
+    @property
+    def duration(self):
+        return sum(segment.duration for segment in self.segments)
+
+    @property
+    def is_encrypted(self):
+        return any(segment.key for segment in self.segments)
+
+    def total_bytes(self):
+        # 모든 조각에 바이트 범위가 있으면 전체 용량을 정확히 알 수 있다. (아니면 None)
+        if not self.segments or not all(segment.byterange for segment in self.segments):
+            return None
+        return sum(segment.byterange[0] for segment in self.segments)
+
+    def dumps(self, segment_uri=None, byteranges=True, keys=True):
+        # 플레이리스트 텍스트로 되돌린다. segment_uri(index, segment) 로 조각 주소를 바꿔 쓸 수 있다. (예: 로컬 파일 이름)
+        target_duration = self.target_duration or max([int(segment.duration + 0.999) for segment in self.segments] or [10])
+        lines = [
+            "#EXTM3U",
+            f"#EXT-X-VERSION:{self.version or 3}",
+            f"#EXT-X-TARGETDURATION:{target_duration}",
+            f"#EXT-X-MEDIA-SEQUENCE:{self.media_sequence}",
+        ]
+        if self.playlist_type:
+            lines.append(f"#EXT-X-PLAYLIST-TYPE:{self.playlist_type}")
+        current_key = None
+        for i, segment in enumerate(self.segments):
+            if keys and segment.key is not current_key:
+                lines.append(segment.key.to_tag() if segment.key else "#EXT-X-KEY:METHOD=NONE")
+                current_key = segment.key
+            if segment.discontinuity:
+                lines.append("#EXT-X-DISCONTINUITY")
+            lines.append(f"#EXTINF:{segment.duration:g},{segment.title}")
+            if byteranges and segment.byterange:
+                lines.append(f"#EXT-X-BYTERANGE:{segment.byterange[0]}@{segment.byterange[1]}")
+            lines.append(segment_uri(i, segment) if segment_uri else segment.uri)
+        if self.endlist:
+            lines.append("#EXT-X-ENDLIST")
+        return "\n".join(lines) + "\n"
+
+
+def _parse_iv(value):
+    if not value:
+        return None
+    value = value[2:] if value.lower().startswith('0x') else value
+    return bytes.fromhex(value.rjust(32, '0'))
+
+
+def parse_playlist(text, base_url=''):
+    """m3u8 텍스트를 MasterPlaylist 또는 MediaPlaylist 로 해석한다. 상대 주소는 base_url 기준 절대 주소로 바꾼다."""
+    lines = [line.strip() for line in text.splitlines()]
+    if not lines or lines[0].lstrip('﻿') != '#EXTM3U':
+        raise ValueError("m3u8 플레이리스트가 아닙니다 (#EXTM3U 없음)")
+
+    version = None
+    variants = []
+    pending_variant = None
+    segments = []
+    target_duration = None
+    media_sequence = 0
+    playlist_type = None
+    endlist = False
+    # 다음 조각 URI 가 나올 때까지 모아두는 태그 값들
+    duration = None
+    title = ''
+    byterange = None
+    discontinuity = False
+    key = None
+    # BYTERANGE 에 오프셋이 없으면 같은 파일의 직전 범위 끝에서 이어진다.
+    last_range_end = {}
+
+    for line in lines[1:]:
+        if not line:
+            continue
+        if line.startswith('#'):
+            tag, _, value = line.partition(':')
+            if tag == '#EXT-X-VERSION':
+                version = int(value)
+            elif tag == '#EXT-X-STREAM-INF':
+                attributes = parse_attributes(value)
+                resolution = None
+                if 'RESOLUTION' in attributes and 'x' in attributes['RESOLUTION']:
+                    width, height = attributes['RESOLUTION'].lower().split('x', 1)
+                    resolution = (int(width), int(height))
+                pending_variant = Variant(
+                    None,
+                    bandwidth=int(attributes['BANDWIDTH']) if 'BANDWIDTH' in attributes else None,
+                    average_bandwidth=int(attributes['AVERAGE-BANDWIDTH']) if 'AVERAGE-BANDWIDTH' in attributes else None,
+                    resolution=resolution,
+                    codecs=attributes.get('CODECS'),
+                    frame_rate=float(attributes['FRAME-RATE']) if 'FRAME-RATE' in attributes else None,
+                    name=attributes.get('NAME'),
+                )
+            elif tag == '#EXT-X-TARGETDURATION':
+                target_duration = int(float(value))
+            elif tag == '#EXT-X-MEDIA-SEQUENCE':
+                media_sequence = int(value)
+            elif tag == '#EXT-X-PLAYLIST-TYPE':
+                playlist_type = value
+            elif tag == '#EXT-X-ENDLIST':
+                endlist = True
+            elif tag == '#EXTINF':
+                duration_text, _, title = value.partition(',')
+                duration = float(duration_text)
+            elif tag == '#EXT-X-BYTERANGE':
+                length_text, _, offset_text = value.partition('@')
+                byterange = (int(length_text), int(offset_text) if offset_text else None)
+            elif tag == '#EXT-X-DISCONTINUITY':
+                discontinuity = True
+            elif tag == '#EXT-X-KEY':
+                attributes = parse_attributes(value)
+                method = attributes.get('METHOD', 'NONE')
+                if method == 'NONE':
+                    key = None
+                else:
+                    key = Key(
+                        method,
+                        uri=urljoin(base_url, attributes['URI']) if 'URI' in attributes else None,
+                        iv=_parse_iv(attributes.get('IV')),
+                        keyformat=attributes.get('KEYFORMAT', 'identity'),
+                    )
+            # 그 밖의 태그(#EXT-X-MEDIA, #EXT-X-I-FRAME-STREAM-INF 등)와 주석은 무시한다.
+            continue
+
+        uri = urljoin(base_url, line)
+        if pending_variant is not None:
+            pending_variant.uri = uri
+            variants.append(pending_variant)
+            pending_variant = None
+            continue
+        if duration is None:
+            raise ValueError(f"#EXTINF 없이 조각 주소가 나왔습니다: {line}")
+        if byterange is not None:
+            length, offset = byterange
+            if offset is None:
+                offset = last_range_end.get(uri, 0)
+            byterange = (length, offset)
+            last_range_end[uri] = offset + length
+        segments.append(Segment(uri, duration, media_sequence + len(segments), title, byterange, key, discontinuity))
+        duration = None
+        title = ''
+        byterange = None
+        discontinuity = False
+
+    if variants:
+        return MasterPlaylist(variants, version)
+    return MediaPlaylist(segments, version, target_duration, media_sequence, playlist_type, endlist)
+
+
+# --- 화질 선택 정책 ---
+# 'highest'     : 가장 높은 화질 (기본값, 예전 동작: 1080 우선)
+# 'lowest'      : 가장 낮은 화질 (가장 빨리 끝남)
+# 'within:<분>' : 측정된 처리량으로 <분> 안에 받을 수 있는 가장 높은 화질. 아무것도 안 되면 가장 빠른 화질.
+POLICY_LABELS = {
+    'highest': "최고 화질",
+    'within:30': "30분 안에 끝나는 최고 화질",
+    'within:10': "10분 안에 끝나는 최고 화질",
+    'lowest': "가장 빠르게 (최저 화질)",
+}
+
+
+def parse_policy(policy):
+    # 정책 문자열을 (종류, 제한 시간 초) 로 해석한다. 잘못된 값이면 ValueError.
+    if policy in ('highest', 'lowest'):
+        return policy, None
+    kind, _, minutes = (policy or '').partition(':')
+    if kind == 'within':
+        try:
+            return kind, float(minutes) * 60
+        except ValueError:
+            pass
+    raise ValueError(f"알 수 없는 화질 선택 정책: {policy}")
+
+
+def estimate_seconds(variant, duration, throughput):
+    # 이 화질로 전체를 받는 데 걸릴 예상 시간(초). 비트레이트나 처리량을 모르면 None.
+    bitrate = variant.bitrate()
+    if not bitrate or not throughput:
+        return None
+    return bitrate / 8 * duration / throughput
+
+
+def rank_variants(variants):
+    # 화질이 높은 순서 (세로 해상도, 비트레이트)
+    return sorted(variants, key=lambda variant: (variant.height, variant.bitrate() or 0), reverse=True)
+
+
+def select_variant(variants, policy='highest', throughput=None, duration=None):
+    """정책에 맞는 화질을 고른다. throughput 은 측정된 처리량(바이트/초), duration 은 영상 길이(초)."""
+    if not variants:
+        raise ValueError("선택할 수 있는 화질이 없습니다.")
+    kind, deadline = parse_policy(policy)
+    ranked = rank_variants(variants)
+    if kind == 'highest':
+        return ranked[0]
+    if kind == 'lowest':
+        return ranked[-1]
+    if not throughput or not duration:
+        # 처리량을 전혀 모르면 판단할 근거가 없으므로 최고 화질로 둔다.
+        return ranked[0]
+    for variant in ranked:
+        seconds = estimate_seconds(variant, duration, throughput)
+        if seconds is not None and seconds <= deadline:
+            return variant
+    # 제한 시간 안에 끝나는 화질이 없으면 가장 빨리 끝나는 것
+    return min(ranked, key=lambda variant: variant.bitrate() or float('inf'))
@@ -0,0 +1,277 @@
+import atexit
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+import hls
+import http_client
+from image_cache import DiskImageCache
+from segment_crypto import KeyCache, SegmentDecryptor, segment_iv
+
+
+class HLSProxy:
+    """플레이어(libvlc)가 CDN 에서 바로 재생할 수 있게 해주는 localhost HLS 프록시.
+
+    - 조각 주소를 프록시 주소로 바꾼 플레이리스트를 제공한다.
+    - 조각을 받을 때 재생 페이지에서 얻은 Referer/Cookie 헤더를 대신 붙이고, AES-128 조각은 복호화해서 평문 TS 로 준다.
+    - 요청된 조각 뒤로 read_ahead 개를 미리 받아두고, 받은 조각은 용량 제한이 있는 디스크 캐시에 보관한다.
+      (앞으로 되감으면 네트워크 대신 캐시에서 바로 재생)
+    - 재생 도중 토큰이 만료되어 CDN 이 403 을 돌려주면, register 때 받은 resolve() 로 스트림 정보를 한 번 다시 얻어 이어간다.
+    """
+
+    def __init__(self, cache_dir=os.path.join("cache", "segments"), max_cache_bytes=1024 * 1024 * 1024, read_ahead=4, workers=4,
+                 max_streams=8, host='127.0.0.1', port=0):
+        self.read_ahead = read_ahead
+        self.max_streams = max_streams
+        self.cache = DiskImageCache(cache_dir, max_cache_bytes)
+        self.key_cache = KeyCache()
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        # stream_id -> {'playlist': MediaPlaylist, 'headers': dict, 'resolve': 함수 또는 None, 'generation': 다시 얻은 횟수, 'lock': Lock}
+        self._streams = OrderedDict()
+        # 캐시 키 -> 진행 중인 Future (같은 조각을 동시에 두 번 받지 않도록)
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self.server.shutdown()
+            self._thread = None
+        self.server.server_close()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _media_playlist(stream_info):
+        playlist = hls.parse_playlist(stream_info['m3u8_content_fixed'])
+        if playlist.is_master:
+            raise ValueError("미디어 플레이리스트가 아닙니다 (마스터 플레이리스트)")
+        return playlist
+
+    def register(self, stream_info, resolve=None):
+        # 스트림 정보(scraper 의 stream_info)를 등록하고, 플레이어에 넘길 로컬 플레이리스트 주소를 돌려준다.
+        # resolve: 토큰이 만료되었을 때 새 stream_info 를 돌려주는 함수 (캐시를 버리고 다시 해석. 없으면 403 을 그대로 알린다)
+        playlist = self._media_playlist(stream_info)
+        stream_id = hashlib.sha1(stream_info['m3u8_content_fixed'].encode('utf-8')).hexdigest()[:16]
+        with self._lock:
+            self._streams[stream_id] = {'playlist': playlist, 'headers': dict(stream_info['headers']), 'resolve': resolve,
+                                        'generation': 0, 'lock': threading.Lock()}
+            self._streams.move_to_end(stream_id)
+            while len(self._streams) > self.max_streams:
+                self._streams.popitem(last=False)
+        return f"{self.base_url}/s/{stream_id}/playlist.m3u8"
+
+    def _stream(self, stream_id):
+        with self._lock:
+            return self._streams.get(stream_id)
+
+    def playlist_text(self, stream_id):
+        stream = self._stream(stream_id)
+        if stream is None:
+            return None
+        # 조각은 프록시가 복호화해서 주므로 KEY/BYTERANGE 태그는 빼고, 처음부터 끝까지 있는 VOD 로 알린다.
+        playlist = stream['playlist']
+        local_playlist = hls.MediaPlaylist(playlist.segments, 3, playlist.target_duration, playlist.media_sequence, 'VOD', endlist=True)
+        return local_playlist.dumps(lambda i, segment: f"/s/{stream_id}/{i}.ts", byteranges=False, keys=False)
+
+    @staticmethod
+    def _cache_key(segment):
+        return f"{segment.uri}#{segment.range_header() or ''}"
+
+    def _download(self, stream, segment):
+        # CDN 에서 조각을 받아 (필요하면 복호화해서) 디스크 캐시에 넣는다.
+        headers = dict(stream['headers'])
+        range_header = segment.range_header()
+        if range_header:
+            headers['Range'] = range_header
+        decryptor = None
+        if segment.key:
+            if segment.key.method != 'AES-128':
+                raise ValueError(f"지원하지 않는 암호화 방식: {segment.key.method}")
+            decryptor = SegmentDecryptor(self.key_cache.get(segment.key.uri, stream['headers']), segment_iv(segment))
+        response = http_client.get(segment.uri, headers=headers, timeout=15)
+        response.raise_for_status()
+        data = response.content
+        if decryptor:
+            data = decryptor.update(data) + decryptor.finalize()
+        self.cache.put(self._cache_key(segment), data)
+        return data
+
+    def _refresh(self, stream, generation):
+        # 토큰 만료: resolve() 로 새 스트림 정보를 얻어 조각 주소와 헤더를 바꾼다.
+        # 같은 만료로 여러 조각이 동시에 403 을 받아도 한 번만 다시 얻는다. (그 사이 다른 스레드가 바꿨으면 그것을 쓴다)
+        with stream['lock']:
+            if stream['generation'] != generation:
+                return
+            print("[DEBUG] HLS 프록시: CDN 403 응답, 스트림 정보를 다시 얻습니다.")
+            stream_info = stream['resolve']()
+            if not stream_info:
+                raise ValueError("스트림 정보를 다시 얻지 못했습니다")
+            playlist = self._media_playlist(stream_info)
+            if len(playlist.segments) != len(stream['playlist'].segments):
+                raise ValueError("다시 얻은 플레이리스트의 조각 수가 다릅니다")
+            stream['playlist'] = playlist
+            stream['headers'] = dict(stream_info['headers'])
+            stream['generation'] += 1
+
+    def _fetch_segment(self, stream, index):
+        # 토큰 만료(403)면 스트림 정보를 한 번 다시 얻고 같은 번호의 조각을 다시 받는다.
+        generation = stream['generation']
+        try:
+            return self._download(stream, stream['playlist'].segments[index])
+        except requests.HTTPError as e:
+            if stream['resolve'] is None or e.response is None or e.response.status_code != 403:
+                raise
+        self._refresh(stream, generation)
+        return self._download(stream, stream['playlist'].segments[index])
+
+    def _schedule(self, stream, index):
+        # 이미 받고 있는 조각이면 그 Future 를 같이 기다린다.
+        key = self._cache_key(stream['playlist'].segments[index])
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self.executor.submit(self._fetch_segment, stream, index)
+                self._in_flight[key] = future
+                future.add_done_callback(lambda _: self._forget(key))
+        return future
+
+    def _forget(self, key):
+        with self._lock:
+            self._in_flight.pop(key, None)
+
+    def _read_ahead(self, stream, index):
+        segments = stream['playlist'].segments
+        for next_index in range(index + 1, min(index + 1 + self.read_ahead, len(segments))):
+            if self.cache.contains(self._cache_key(segments[next_index])):
+                continue
+            self._schedule(stream, next_index)
+
+    def _segment(self, stream_id, index):
+        stream = self._stream(stream_id)
+        if stream is None or not 0 <= index < len(stream['playlist'].segments):
+            return None, None
+        return stream, stream['playlist'].segments[index]
+
+    def segment_data(self, stream_id, index):
+        stream, segment = self._segment(stream_id, index)
+        if stream is None:
+            return None
+        data = self.cache.get(self._cache_key(segment))
+        if data is None:
+            data = self._schedule(stream, index).result()
+        self._read_ahead(stream, index)
+        return data
+
+    def segment_length(self, stream_id, index):
+        # HEAD 요청용: 조각을 받지 않고 길이만 알아낸다. 반환값: (조각이 있는지, 길이 또는 None)
+        # 캐시에 있으면 그 크기, 없으면 암호화되지 않은 BYTERANGE 조각만 플레이리스트의 길이를 쓴다. (복호화하면 패딩만큼 줄어든다)
+        stream, segment = self._segment(stream_id, index)
+        if stream is None:
+            return False, None
+        length = self.cache.size(self._cache_key(segment))
+        if length is None and segment.byterange and not segment.key:
+            length = segment.byterange[0]
+        return True, length
+
+    def _handler_class(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body, content_type):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                if self.command != 'HEAD':
+                    self.wfile.write(body)
+
+            def _route(self):
+                # /s/<stream_id>/playlist.m3u8 또는 /s/<stream_id>/<번호>.ts -> (stream_id, 이름), 아니면 404 후 None
+                parts = self.path.split('?', 1)[0].strip('/').split('/')
+                if len(parts) != 3 or parts[0] != 's':
+                    self._send(404, b"not found", 'text/plain')
+                    return None
+                return parts[1], parts[2]
+
+            def do_HEAD(self):
+                # 헤더만 돌려준다. 조각을 받거나 복호화하지 않으므로, 캐시에 없는 조각은 길이를 알 때만 Content-Length 를 붙인다.
+                route = self._route()
+                if route is None:
+                    return
+                stream_id, name = route
+                if name == 'playlist.m3u8':
+                    text = proxy.playlist_text(stream_id)
+                    if text is not None:
+                        self._send(200, text.encode('utf-8'), 'application/vnd.apple.mpegurl')
+                        return
+                elif name.endswith('.ts') and name[:-3].isdigit():
+                    exists, length = proxy.segment_length(stream_id, int(name[:-3]))
+                    if exists:
+                        self.send_response(200)
+                        self.send_header('Content-Type', 'video/mp2t')
+                        if length is not None:
+                            self.send_header('Content-Length', str(length))
+                        self.end_headers()
+                        return
+                self._send(404, b"not found", 'text/plain')
+
+            def do_GET(self):
+                route = self._route()
+                if route is None:
+                    return
+                stream_id, name = route
+                try:
+                    if name == 'playlist.m3u8':
+                        text = proxy.playlist_text(stream_id)
+                        if text is not None:
+                            self._send(200, text.encode('utf-8'), 'application/vnd.apple.mpegurl')
+                            return
+                    elif name.endswith('.ts') and name[:-3].isdigit():
+                        data = proxy.segment_data(stream_id, int(name[:-3]))
+                        if data is not None:
+                            self._send(200, data, 'video/mp2t')
+                            return
+                    self._send(404, b"not found", 'text/plain')
+                except Exception as e:
+                    # 다시 얻어도 실패한 403 등 CDN 오류는 플레이어에 502 로 알린다.
+                    print(f"[DEBUG] HLS 프록시 오류 ({self.path}): {e}")
+                    self._send(502, str(e).encode('utf-8', errors='replace'), 'text/plain')
+
+        return Handler
+
+
+_shared_proxy = None
+_shared_proxy_lock = threading.Lock()
+
+
+def get_hls_proxy():
+    # 프로세스 전체에서 공유하는 프록시 (처음 쓸 때 시작, 종료 시 정리)
+    global _shared_proxy
+    with _shared_proxy_lock:
+        if _shared_proxy is None:
+            _shared_proxy = HLSProxy().start()
+            atexit.register(_shared_proxy.stop)
+        return _shared_proxy
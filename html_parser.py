@@ -0,0 +1,166 @@
+from bs4 import BeautifulSoup
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import lxml  # noqa: F401 (BeautifulSoup 'lxml' 백엔드 사용 가능 여부 확인용)
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+
+class BeautifulSoupParser:
+    """BeautifulSoup 기반 파서. features 로 'html.parser'(기본, 가장 느림) 또는 'lxml' 을 고른다."""
+
+    def __init__(self, features='html.parser'):
+        self.features = features
+        self.name = features
+
+    def parse_search_results(self, html):
+        soup = BeautifulSoup(html, self.features)
+        search_items = soup.select('.listupd .bs')
+        results = []
+        for item in search_items:
+            a_tag = item.select_one('.bsx > a')
+            img_tag = item.select_one('.bsx > a img')
+            title_tag = item.select_one('.bsx > a .tt')
+            if a_tag and img_tag and title_tag:
+                href = a_tag.get('href', '')
+                if '/detail/id/' in href:
+                    anime_id = href.split('/detail/id/')[-1]
+                    title = title_tag.find('h2').get_text(strip=True) if title_tag.find('h2') else title_tag.get_text(strip=True)
+                    thumbnail_url = img_tag.get('src', '')
+                    results.append({'id': anime_id, 'title': title, 'thumbnail_url': thumbnail_url})
+        return results
+
+    def parse_anime_details(self, html):
+        soup = BeautifulSoup(html, self.features)
+        title_tag = soup.select_one('.infox .entry-title')
+        title = title_tag.get_text(strip=True) if title_tag else 'N/A'
+        summary_tag = soup.select_one('.synp .entry-content p')
+        summary = summary_tag.get_text(strip=True) if summary_tag else '줄거리 정보 없음'
+        poster_tag = soup.select_one('.thumbook .thumb img')
+        poster_url = poster_tag['src'] if poster_tag else ''
+        episodes = []
+        episode_items = soup.select('.eplister ul li')
+        for item in episode_items:
+            a_tag = item.select_one('a')
+            if a_tag:
+                href = a_tag.get('href', '')
+                if '/ani/provider/' in href:
+                    provider_id = href.split('/ani/provider/')[-1]
+                    ep_num_tag = a_tag.select_one('.epl-num')
+                    ep_num = ep_num_tag.get_text(strip=True) if ep_num_tag else ''
+                    ep_title_tag = a_tag.select_one('.epl-title')
+                    ep_title = ep_title_tag.get_text(strip=True) if ep_title_tag else '제목 없음'
+                    episodes.append({'num': ep_num, 'title': ep_title, 'provider_id': provider_id})
+        extra_info = {}
+        info_spans = soup.select('.infox .info-content .spe span')
+        for span in info_spans:
+            key_tag = span.find('b')
+            if key_tag:
+                key = key_tag.get_text(strip=True).replace(':', '')
+                value = ' '.join(t.strip() for t in span.find_all(string=True, recursive=False) if t.strip())
+                if not value:
+                    value_tags = span.find_all('a')
+                    value = ', '.join(a.get_text(strip=True) for a in value_tags if a.get_text(strip=True))
+                extra_info[key] = value if value else "정보 없음"
+        genres = [a.get_text(strip=True) for a in soup.select('.genxed a')]
+        extra_info['장르'] = ', '.join(genres) if genres else "정보 없음"
+        return {'title': title, 'summary': summary, 'poster_url': poster_url, 'episodes': episodes, 'extra_info': extra_info}
+
+
+class SelectolaxParser:
+    """selectolax(lexbor) 기반 파서. BeautifulSoupParser 와 똑같은 딕셔너리를 만든다."""
+
+    name = 'selectolax'
+
+    @staticmethod
+    def _text(node):
+        # BeautifulSoup 의 get_text(strip=True) 와 같은 결과
+        return node.text(deep=True, separator='', strip=True)
+
+    @staticmethod
+    def _attr(node, name):
+        return node.attributes.get(name) or ''
+
+    def parse_search_results(self, html):
+        tree = LexborHTMLParser(html)
+        results = []
+        for item in tree.css('.listupd .bs'):
+            a_tag = item.css_first('.bsx > a')
+            img_tag = item.css_first('.bsx > a img')
+            title_tag = item.css_first('.bsx > a .tt')
+            if a_tag and img_tag and title_tag:
+                href = self._attr(a_tag, 'href')
+                if '/detail/id/' in href:
+                    anime_id = href.split('/detail/id/')[-1]
+                    h2_tag = title_tag.css_first('h2')
+                    title = self._text(h2_tag) if h2_tag else self._text(title_tag)
+                    thumbnail_url = self._attr(img_tag, 'src')
+                    results.append({'id': anime_id, 'title': title, 'thumbnail_url': thumbnail_url})
+        return results
+
+    def parse_anime_details(self, html):
+        tree = LexborHTMLParser(html)
+        title_tag = tree.css_first('.infox .entry-title')
+        title = self._text(title_tag) if title_tag else 'N/A'
+        summary_tag = tree.css_first('.synp .entry-content p')
+        summary = self._text(summary_tag) if summary_tag else '줄거리 정보 없음'
+        poster_tag = tree.css_first('.thumbook .thumb img')
+        poster_url = self._attr(poster_tag, 'src') if poster_tag else ''
+        episodes = []
+        for item in tree.css('.eplister ul li'):
+            a_tag = item.css_first('a')
+            if a_tag:
+                href = self._attr(a_tag, 'href')
+                if '/ani/provider/' in href:
+                    provider_id = href.split('/ani/provider/')[-1]
+                    ep_num_tag = a_tag.css_first('.epl-num')
+                    ep_num = self._text(ep_num_tag) if ep_num_tag else ''
+                    ep_title_tag = a_tag.css_first('.epl-title')
+                    ep_title = self._text(ep_title_tag) if ep_title_tag else '제목 없음'
+                    episodes.append({'num': ep_num, 'title': ep_title, 'provider_id': provider_id})
+        extra_info = {}
+        for span in tree.css('.infox .info-content .spe span'):
+            key_tag = span.css_first('b')
+            if key_tag:
+                key = self._text(key_tag).replace(':', '')
+                # span 바로 아래의 텍스트 노드만 모은다. (find_all(string=True, recursive=False) 와 동일)
+                direct_texts = (child.text(deep=False) for child in span.iter(include_text=True) if child.is_text_node)
+                value = ' '.join(t.strip() for t in direct_texts if t.strip())
+                if not value:
+                    value = ', '.join(self._text(a) for a in span.css('a') if self._text(a))
+                extra_info[key] = value if value else "정보 없음"
+        genres = [self._text(a) for a in tree.css('.genxed a')]
+        extra_info['장르'] = ', '.join(genres) if genres else "정보 없음"
+        return {'title': title, 'summary': summary, 'poster_url': poster_url, 'episodes': episodes, 'extra_info': extra_info}
+
+
+def available_backends():
+    # 빠른 것부터 순서대로
+    backends = []
+    if LexborHTMLParser is not None:
+        backends.append('selectolax')
+    if HAS_LXML:
+        backends.append('lxml')
+    backends.append('html.parser')
+    return backends
+
+
+def get_html_parser(backend='auto'):
+    """이름으로 파서 백엔드를 고른다. 'auto' 는 설치된 것 중 가장 빠른 백엔드를 쓴다."""
+    if backend == 'auto':
+        backend = available_backends()[0]
+    if backend == 'selectolax':
+        if LexborHTMLParser is None:
+            raise ValueError("selectolax 가 설치되어 있지 않습니다.")
+        return SelectolaxParser()
+    if backend == 'lxml' and not HAS_LXML:
+        raise ValueError("lxml 이 설치되어 있지 않습니다.")
+    if backend in ('lxml', 'html.parser'):
+        return BeautifulSoupParser(backend)
+    raise ValueError(f"알 수 없는 HTML 파서 백엔드: {backend}")
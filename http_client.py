@@ -0,0 +1,298 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 검색/상세/썸네일 요청에 기본으로 붙는 헤더
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
+
+# 호스트별 커넥션 풀 설정
+# POOL_CONNECTIONS: 풀을 유지할 호스트 수 (anilife.live, api/edge gcdn, 이미지 서버 등)
+# POOL_MAXSIZE: 호스트 하나당 유지할 keep-alive 커넥션 수 (동시 조각 다운로드 작업자 수보다 넉넉하게)
+POOL_CONNECTIONS = 16
+POOL_MAXSIZE = 32
+
+# timeout 을 주지 않은 요청에 쓰는 기본값 (연결, 읽기) 초. 응답 없는 서버에서 영원히 기다리지 않도록.
+DEFAULT_TIMEOUT = (5, 30)
+
+# 호스트별 기본 제한: 동시 요청 수(커넥션 풀 크기 이하), 초당 요청 수(토큰 버킷)와 순간 허용량
+# CDN 조각 요청이 대부분이므로 기본값은 넉넉하게 두고, 스크래핑 대상 사이트만 따로 조인다. (HOST_LIMITS)
+HOST_MAX_CONCURRENT = 24
+HOST_RATE = 100.0
+HOST_BURST = 100
+HOST_LIMITS = {
+    'anilife.live': {'max_concurrent': 4, 'rate': 4.0, 'burst': 8},
+}
+
+# 5xx / 429 / 타임아웃 / 연결 오류는 지수 백오프(전체 지터)로 다시 시도한다.
+MAX_RETRIES = 3
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+# 모든 스레드가 같은 어댑터(= urllib3 PoolManager, 스레드 안전)를 공유하므로 TCP/TLS 연결이 재사용된다.
+_adapter = HTTPAdapter(pool_connections=POOL_CONNECTIONS, pool_maxsize=POOL_MAXSIZE)
+_local = threading.local()
+
+
+def get_session():
+    """현재 스레드용 requests.Session 을 돌려준다.
+
+    requests.Session 자체는 스레드 안전하지 않으므로 세션(헤더/쿠키 상태)은 스레드마다 따로 두고,
+    실제 커넥션 풀은 프로세스 전체에서 공유한다.
+    """
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        session.headers.update(DEFAULT_HEADERS)
+        session.mount('https://', _adapter)
+        session.mount('http://', _adapter)
+        _local.session = session
+    return session
+
+
+class TokenBucket:
+    """초당 rate 개씩 채워지고 최대 burst 개까지 쌓이는 토큰 버킷. acquire() 는 토큰이 생길 때까지 기다린다."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+
+
+class HostLimiter:
+    # 호스트 하나의 동시 요청 수 제한(세마포어)과 요청 속도 제한(토큰 버킷)
+    def __init__(self, max_concurrent=HOST_MAX_CONCURRENT, rate=HOST_RATE, burst=HOST_BURST):
+        self.slots = threading.BoundedSemaphore(max(1, max_concurrent))
+        self.bucket = TokenBucket(rate, burst) if rate else None
+
+    def acquire(self):
+        self.slots.acquire()
+        if self.bucket is not None:
+            self.bucket.acquire()
+
+    def release(self):
+        self.slots.release()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def configure_host(host, max_concurrent=HOST_MAX_CONCURRENT, rate=HOST_RATE, burst=HOST_BURST):
+    # 특정 호스트의 제한을 바꾼다. (rate=None 이면 속도 제한 없음) 이미 진행 중인 요청에는 영향이 없다.
+    with _limiters_lock:
+        _limiters[host] = HostLimiter(max_concurrent, rate, burst)
+
+
+def host_limiter(url):
+    host = urlsplit(url).netloc
+    with _limiters_lock:
+        limiter = _limiters.get(host)
+        if limiter is None:
+            limiter = _limiters[host] = HostLimiter(**HOST_LIMITS.get(host, {}))
+        return limiter
+
+
+def is_retryable(error):
+    # 다시 시도하면 성공할 수도 있는 오류인지 (4xx 는 다시 보내도 같으므로 제외)
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRY_STATUSES
+    return isinstance(error, (requests.Timeout, requests.ConnectionError, requests.exceptions.ChunkedEncodingError))
+
+
+def backoff_delay(attempt):
+    # 전체 지터(full jitter): 0 ~ min(최대, 기본 * 2^attempt) 사이에서 무작위로 기다려 재시도가 한꺼번에 몰리지 않게 한다.
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def with_retries(fn, retries=MAX_RETRIES, on_retry=None, cancel_event=None):
+    """fn() 을 호출하고, 재시도할 만한 오류면 백오프 후 최대 retries 번 더 호출한다.
+
+    on_retry(attempt, error) 는 다시 시도하기 직전에 불린다. (기록용)
+    cancel_event 가 설정되면 백오프 대기를 멈추고 마지막 오류를 올린다.
+    """
+    attempt = 0
+    while True:
+        try:
+            return fn()
+        except Exception as e:
+            if attempt >= retries or not is_retryable(e):
+                raise
+            delay = backoff_delay(attempt)
+            print(f"[DEBUG] 요청 실패, {delay:.1f}초 뒤 다시 시도 ({attempt + 1}/{retries}): {e}")
+            if on_retry is not None:
+                on_retry(attempt, e)
+            if cancel_event is not None:
+                if cancel_event.wait(delay):
+                    raise
+            else:
+                time.sleep(delay)
+            attempt += 1
+
+
+def request(method, url, retries=MAX_RETRIES, on_retry=None, on_sent=None, **kwargs):
+    """호스트별 제한과 재시도를 거쳐 요청을 보낸다.
+
+    - timeout 을 주지 않으면 DEFAULT_TIMEOUT 을 쓴다.
+    - on_sent() 는 호스트의 동시 요청 칸을 얻어 실제로 요청을 보내기 직전에 (시도마다) 불린다. (칸을 기다린 시간을 빼고 지연 시간을 잴 때)
+    - 5xx/429 응답은 재시도하고, 마지막 시도의 응답은 그대로 돌려준다. (호출한 쪽에서 raise_for_status)
+    - stream=True 응답은 닫힐 때(with 문이 끝날 때)까지 호스트의 동시 요청 칸을 차지한다.
+    """
+    kwargs.setdefault('timeout', DEFAULT_TIMEOUT)
+    limiter = host_limiter(url)
+    attempts = [0]
+
+    def attempt():
+        last = attempts[0] >= retries
+        attempts[0] += 1
+        limiter.acquire()
+        if on_sent is not None:
+            on_sent()
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except Exception:
+            limiter.release()
+            raise
+        if response.status_code in RETRY_STATUSES and not last:
+            response.close()
+            limiter.release()
+            response.raise_for_status()
+        if not kwargs.get('stream'):
+            limiter.release()
+            return response
+        # 스트리밍 응답: 본문을 다 읽고 닫을 때 칸을 돌려준다. (한 번만)
+        close = response.close
+        released = []
+
+        def close_and_release():
+            try:
+                close()
+            finally:
+                if not released:
+                    released.append(True)
+                    limiter.release()
+        response.close = close_and_release
+        return response
+
+    return with_retries(attempt, retries, on_retry)
+
+
+def get(url, **kwargs):
+    return request('GET', url, **kwargs)
+
+
+def head(url, **kwargs):
+    return request('HEAD', url, **kwargs)
+
+
+class LatencyTracker:
+    """최근 요청(조각 다운로드 등)의 소요 시간으로 분위수(p95 등)를 추정한다."""
+
+    def __init__(self, window=200, min_samples=20):
+        self.min_samples = min_samples
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q=0.95):
+        # 표본이 min_samples 개보다 적으면 None
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[min(len(samples) - 1, int(q * len(samples)))]
+
+
+_latency = {}
+_latency_lock = threading.Lock()
+
+
+def latency_tracker(url):
+    # 호스트별로 공유하는 지연 시간 기록
+    host = urlsplit(url).netloc
+    with _latency_lock:
+        tracker = _latency.get(host)
+        if tracker is None:
+            tracker = _latency[host] = LatencyTracker()
+        return tracker
+
+
+# executor 를 주지 않은 hedged() 호출이 쓰는 공용 스레드 풀
+HEDGE_WORKERS = 32
+_hedge_executor = ThreadPoolExecutor(max_workers=HEDGE_WORKERS, thread_name_prefix='hedge')
+
+
+def hedged(fn, delay, discard=None, on_hedge=None, executor=None):
+    """fn(cancel_event) 을 실행하고, delay 초 안에 끝나지 않으면 같은 요청을 하나 더 보내 먼저 성공한 쪽을 쓴다.
+
+    - 두 시도 모두 executor 에서 실행하고 호출한 스레드는 기다리기만 한다. (막힌 읽기에 붙잡히지 않고 이긴 쪽을 바로 돌려주기 위함)
+      executor 가 모자라 시도가 줄을 서면 그 시간도 지연으로 잡히므로, 동시에 부르는 스레드 수의 두 배만큼 작업자를 둔 풀을 넘긴다.
+    - 이긴 쪽이 정해지면 나머지의 cancel_event 를 설정한다. fn 은 이것을 보고 가능한 빨리 그만둬야 한다.
+    - 진 쪽도 성공해버린 경우 그 결과는 discard(result) 로 넘겨 정리하게 한다.
+    - 둘 다 실패하면 먼저 실패한 쪽의 예외를 올린다. delay 가 None 이면 헤지 없이 fn 만 (호출한 스레드에서) 실행한다.
+    """
+    if delay is None:
+        return fn(threading.Event())
+    executor = executor or _hedge_executor
+    attempts = {}
+    # 끝난 순서 (cancel_event 로 구분). wait() 가 두 시도를 한꺼번에 돌려주면 어느 쪽이 먼저인지 알 수 없으므로 직접 기록한다.
+    finished = []
+
+    def run(cancel):
+        try:
+            return fn(cancel)
+        finally:
+            finished.append(cancel)
+
+    def start():
+        cancel = threading.Event()
+        attempts[executor.submit(run, cancel)] = cancel
+
+    start()
+    done, _ = wait(list(attempts), timeout=delay)
+    if not done:
+        if on_hedge is not None:
+            on_hedge()
+        start()
+
+    by_cancel = {cancel: future for future, cancel in attempts.items()}
+    pending = set(attempts)
+    winner = None
+    while pending and winner is None:
+        _, pending = wait(pending, return_when=FIRST_COMPLETED)
+        completed = [by_cancel[cancel] for cancel in list(finished)]
+        winner = next((future for future in completed if future.exception() is None), None)
+
+    for future, cancel in attempts.items():
+        if future is not winner:
+            cancel.set()
+            if discard is not None:
+                future.add_done_callback(lambda f: discard(f.result()) if f.exception() is None else None)
+    if winner is None:
+        raise by_cancel[finished[0]].exception()
+    return winner.result()
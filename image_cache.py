@@ -0,0 +1,177 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, Qt, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+
+import http_client
+
+
+class PixmapLRUCache:
+    """디코딩이 끝난 QPixmap 을 바이트 예산 안에서 보관하는 메모리 LRU 캐시 (UI 스레드 전용)."""
+
+    def __init__(self, max_bytes=32 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._items = OrderedDict()
+
+    @staticmethod
+    def _cost(pixmap):
+        return pixmap.width() * pixmap.height() * max(pixmap.depth(), 8) // 8
+
+    def get(self, key):
+        pixmap = self._items.get(key)
+        if pixmap is not None:
+            self._items.move_to_end(key)
+        return pixmap
+
+    def put(self, key, pixmap):
+        if key in self._items:
+            self.current_bytes -= self._cost(self._items.pop(key))
+        self._items[key] = pixmap
+        self.current_bytes += self._cost(pixmap)
+        # 예산을 넘으면 가장 오래 안 쓴 것부터 버린다.
+        while self.current_bytes > self.max_bytes and len(self._items) > 1:
+            _, evicted = self._items.popitem(last=False)
+            self.current_bytes -= self._cost(evicted)
+
+
+class DiskImageCache:
+    """URL 을 키로 원본 이미지 바이트를 저장하는 디스크 캐시. 용량을 넘으면 가장 오래 안 쓴 파일부터 지운다."""
+
+    def __init__(self, directory=os.path.join("cache", "images"), max_bytes=200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.current_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.is_file())
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha1(url.encode('utf-8')).hexdigest())
+
+    def contains(self, url):
+        return os.path.exists(self._path(url))
+
+    def size(self, url):
+        # 파일을 읽지 않고 크기만 돌려준다. (없으면 None)
+        try:
+            return os.path.getsize(self._path(url))
+        except OSError:
+            return None
+
+    def get(self, url):
+        path = self._path(url)
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+            # 읽을 때마다 수정 시각을 갱신해서 LRU 순서로 쓴다.
+            os.utime(path)
+            return data
+        except OSError:
+            return None
+
+    def put(self, url, data):
+        path = self._path(url)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        with self._lock:
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+            self.current_bytes += len(data) - old_size
+            if self.current_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.is_file() and not entry.name.endswith('.tmp')),
+            key=lambda entry: entry.stat().st_mtime,
+        )
+        for entry in entries:
+            if self.current_bytes <= self.max_bytes:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.current_bytes -= size
+            except OSError:
+                pass
+
+
+class _ImageFetchTask(QRunnable):
+    # 풀 스레드에서 실행: 디스크 캐시 확인 -> 다운로드 -> 디코딩 -> 목표 크기로 축소
+    def __init__(self, loader, key, url, size):
+        super().__init__()
+        self.loader = loader
+        self.key = key
+        self.url = url
+        self.size = size
+
+    def run(self):
+        image = QImage()
+        try:
+            data = self.loader.disk_cache.get(self.url)
+            if data is None:
+                response = http_client.get(self.url, headers={'Referer': 'https://anilife.live/'}, timeout=15)
+                response.raise_for_status()
+                data = response.content
+                self.loader.disk_cache.put(self.url, data)
+            image.loadFromData(data)
+            if not image.isNull() and self.size is not None:
+                image = image.scaled(self.size, Qt.AspectRatioMode.KeepAspectRatio, Qt.TransformationMode.SmoothTransformation)
+        except Exception as e:
+            print(f"Image download failed for {self.url}: {e}")
+            image = QImage()
+        # QImage 는 스레드 간에 넘겨도 안전하다. QPixmap 변환은 UI 스레드에서 한다.
+        self.loader._image_ready.emit(self.key, image)
+
+
+class ImageLoader(QObject):
+    """썸네일/포스터 이미지 로더.
+
+    메모리 LRU(QPixmap) -> 디스크 캐시 -> 네트워크 순서로 찾고, 네트워크/디코딩 작업은 고정 크기 스레드 풀에서 처리한다.
+    같은 이미지를 동시에 여러 번 요청하면 한 번만 받아서 모든 콜백에 나눠준다.
+    """
+    _image_ready = pyqtSignal(object, QImage)
+
+    def __init__(self, max_threads=4, memory_budget=32 * 1024 * 1024, disk_cache=None, parent=None):
+        super().__init__(parent)
+        self.memory_cache = PixmapLRUCache(memory_budget)
+        self.disk_cache = disk_cache or DiskImageCache()
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_threads)
+        self._pending = {}
+        self._image_ready.connect(self._on_image_ready)
+
+    def load(self, url, size, callback):
+        # size: 축소할 목표 크기(QSize). callback(QPixmap) 은 UI 스레드에서 호출된다. 실패 시 빈 QPixmap.
+        key = (url, size.width(), size.height()) if size is not None else (url, None, None)
+        pixmap = self.memory_cache.get(key)
+        if pixmap is not None:
+            callback(pixmap)
+            return
+        if key in self._pending:
+            self._pending[key].append(callback)
+            return
+        self._pending[key] = [callback]
+        self.pool.start(_ImageFetchTask(self, key, url, size))
+
+    def _on_image_ready(self, key, image):
+        pixmap = QPixmap.fromImage(image)
+        if not pixmap.isNull():
+            self.memory_cache.put(key, pixmap)
+        for callback in self._pending.pop(key, []):
+            callback(pixmap)
+
+
+_shared_loader = None
+
+
+def get_image_loader():
+    # UI 스레드에서 공유하는 이미지 로더 (QApplication 생성 후에 호출해야 함)
+    global _shared_loader
+    if _shared_loader is None:
+        _shared_loader = ImageLoader()
+    return _shared_loader
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS episodes (
+    provider_id TEXT PRIMARY KEY,
+    anime_id TEXT NOT NULL,
+    episode TEXT NOT NULL,
+    title TEXT,
+    path TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    duration REAL,
+    checksum TEXT NOT NULL,
+    added_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS episodes_anime ON episodes (anime_id);
+"""
+
+
+def file_checksum(path, chunk_size=1024 * 1024):
+    # 완성된 mp4 의 sha256 (기록할 때 한 번, 파일이 바뀐 것 같을 때만 다시 계산한다)
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class LibraryCatalog:
+    """다운로드를 마친 에피소드 목록 (SQLite). provider_id 하나에 파일 하나.
+
+    - record(): 병합이 끝난 mp4 를 크기/재생 시간/sha256 과 함께 한 번의 트랜잭션으로 기록한다.
+      병합 도중에 끊긴 파일은 기록되지 않으므로, 파일이 있다는 것만으로 완성본으로 보지 않는다.
+    - lookup(): 기록된 파일이 그대로 있는지 stat 으로 확인한다. (크기가 다르면 무효, 수정 시각만 다르면 체크섬으로 확인)
+    GUI 와 다운로드 데몬이 같은 파일을 함께 쓰므로 WAL 모드로 연다.
+    """
+
+    def __init__(self, path=os.path.join("cache", "library.sqlite3")):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+
+    def record(self, provider_id, anime_id, episode, path, title=None, duration=None):
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        checksum = file_checksum(path)
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO episodes (provider_id, anime_id, episode, title, path, size, mtime_ns, duration, checksum, added_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (provider_id, str(anime_id), episode, title, path, stat.st_size, stat.st_mtime_ns, duration, checksum, time.time()))
+        print(f"[DEBUG] 라이브러리에 기록: {provider_id} -> {path} ({stat.st_size / (1024 * 1024):.1f}MB)")
+
+    def _validate(self, row, deep=True):
+        # 파일이 기록 당시 그대로인지 확인한다. 반환값: 유효하면 dict, 아니면 None (무효인 기록은 지운다)
+        # deep=False 이면 크기만 맞으면 유효로 본다. (UI 표시용: 체크섬 계산으로 화면을 멈추지 않는다)
+        entry = dict(row)
+        try:
+            stat = os.stat(entry['path'])
+        except OSError:
+            stat = None
+        if stat is not None and stat.st_size == entry['size']:
+            if stat.st_mtime_ns == entry['mtime_ns'] or not deep:
+                return entry
+            # 복사/이동 등으로 수정 시각만 바뀌었을 수 있으므로 내용을 확인하고, 같으면 새 시각으로 고쳐 둔다.
+            if file_checksum(entry['path']) == entry['checksum']:
+                with self._lock, self._db:
+                    self._db.execute("UPDATE episodes SET mtime_ns = ? WHERE provider_id = ?", (stat.st_mtime_ns, entry['provider_id']))
+                entry['mtime_ns'] = stat.st_mtime_ns
+                return entry
+        print(f"[DEBUG] 라이브러리 기록 무효 (파일이 없거나 바뀜): {entry['path']}")
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM episodes WHERE provider_id = ? AND path = ?", (entry['provider_id'], entry['path']))
+        return None
+
+    def lookup(self, provider_id, deep=True):
+        with self._lock:
+            row = self._db.execute("SELECT * FROM episodes WHERE provider_id = ?", (provider_id,)).fetchone()
+        return self._validate(row, deep) if row else None
+
+    def downloaded(self, anime_id):
+        # 작품 하나의 받아둔 에피소드: {provider_id: 기록}
+        with self._lock:
+            rows = self._db.execute("SELECT * FROM episodes WHERE anime_id = ?", (str(anime_id),)).fetchall()
+        entries = (self._validate(row, deep=False) for row in rows)
+        return {entry['provider_id']: entry for entry in entries if entry}
+
+
+_shared_library = None
+_shared_library_lock = threading.Lock()
+
+
+def get_library():
+    # 프로세스 전체에서 공유하는 라이브러리 목록 (cache/library.sqlite3)
+    global _shared_library
+    with _shared_library_lock:
+        if _shared_library is None:
+            _shared_library = LibraryCatalog()
+        return _shared_library
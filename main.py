@@ -1,14 +1,23 @@
+import os
 import sys
-import requests
+import shutil
+import threading
 from PyQt6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
     QPushButton, QStackedWidget, QLabel, QStatusBar, QButtonGroup,
-    QLineEdit, QListWidget, QListWidgetItem, QTextEdit, QProgressBar, QDialog
+    QLineEdit, QListWidget, QListWidgetItem, QTextEdit, QProgressBar, QAbstractItemView, QComboBox, QCheckBox
 )
-from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal, QSize
-from PyQt6.QtGui import QPixmap, QImage, QIcon
-from scraper import AniLifeScraper
+from PyQt6.QtCore import Qt, QObject, QThread, pyqtSignal, QSize, QTimer
+from PyQt6.QtGui import QPixmap, QIcon
+from scraper import AniLifeScraper, DownloadCancelled
+from qt_adapter import forward, forward_all, AsyncBridge
+from async_engine import aiohttp, get_async_engine
+from throughput import BandwidthLimiter
+from hls import POLICY_LABELS
+from image_cache import get_image_loader
+from library import get_library
 from VideoPlayer import VideoPlayer
+from daemon import DaemonClient, ACTIVE_STATES
 
 # --- Workers for Threading ---
 class SearchWorker(QObject):
@@ -37,96 +46,552 @@ class DetailWorker(QObject):
         except Exception as e:
             self.error.emit(str(e))
 
-class ThumbnailDownloader(QObject):
-    finished = pyqtSignal(QListWidgetItem, QPixmap)
-    def __init__(self, item, url):
-        super().__init__()
-        self.item = item
-        self.url = url
-    def run(self):
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-                'Referer': 'https://anilife.live/'
-            }
-            response = requests.get(self.url, headers=headers, timeout=15)
-            response.raise_for_status()
-            image = QImage()
-            image.loadFromData(response.content)
-            self.finished.emit(self.item, QPixmap.fromImage(image))
-        except Exception as e:
-            print(f"Thumbnail download failed for {self.url}: {e}")
-            self.finished.emit(self.item, QPixmap())
-
-class PosterDownloader(QObject):
-    finished = pyqtSignal(QPixmap)
-    def __init__(self, url):
+class StreamWorker(QObject):
+    # 다운로드 없이 스트리밍 재생할 스트림 정보만 알아낸다.
+    finished = pyqtSignal(dict)
+    error = pyqtSignal(str)
+    def __init__(self, provider_id, anime_id):
         super().__init__()
-        self.url = url
+        self.provider_id = provider_id
+        self.anime_id = anime_id
+        self.scraper = None
     def run(self):
-        try:
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3',
-                'Referer': 'https://anilife.live/'
-            }
-            response = requests.get(self.url, headers=headers, timeout=15)
-            response.raise_for_status()
-            image = QImage()
-            image.loadFromData(response.content)
-            self.finished.emit(QPixmap.fromImage(image))
-        except Exception as e:
-            print(f"Poster download failed for {self.url}: {e}")
-            self.finished.emit(QPixmap())
+        self.scraper = AniLifeScraper()
+        forward(self.scraper.error, self.error)
+        stream_info = self.scraper.get_stream_info(self.provider_id, self.anime_id)
+        if stream_info:
+            self.finished.emit(stream_info)
 
 class VideoWorker(QObject):
-    progress_update = pyqtSignal(int, int, str)
-    sub_progress_update = pyqtSignal(int, int, str)
-    finished = pyqtSignal(dict)
-    error = pyqtSignal(str)
+    # 모든 시그널의 첫 번째 인자는 다운로드 작업 번호(job_id)
+    progress_update = pyqtSignal(int, int, int, str)
+    sub_progress_update = pyqtSignal(int, int, int, str)
+    finished = pyqtSignal(int, dict)
+    error = pyqtSignal(int, str)
+    playback_ready = pyqtSignal(int, str)
+    trace_finished = pyqtSignal(int, str)
 
-    def __init__(self, provider_id, anime_id):
+    def __init__(self, job_id, provider_id, anime_id, resolve_slots=None, transfer_slots=None, quality_policy='highest', progressive=False):
         super().__init__()
+        self.job_id = job_id
         self.provider_id = provider_id
         self.anime_id = anime_id
+        self.resolve_slots = resolve_slots
+        self.transfer_slots = transfer_slots
+        self.quality_policy = quality_policy
+        self.progressive = progressive
         # Scraper는 run 메소드 안에서, 해당 스레드에서 생성되어야 함
         self.scraper = None
 
-    def run(self):
-        print("[DEBUG] VideoWorker.run() 시작")
-        self.scraper = AniLifeScraper()
+    def _create_scraper(self):
+        self.scraper = AniLifeScraper(resolve_slots=self.resolve_slots, transfer_slots=self.transfer_slots, quality_policy=self.quality_policy, progressive=self.progressive)
+
+        # Scraper의 시그널에 작업 번호를 붙여 Worker의 (Qt) 시그널로 다시 전달(re-emit)
+        forward_all(self.scraper, self, ('progress_update', 'sub_progress_update', 'finished', 'error', 'playback_ready', 'trace_finished'), self.job_id)
 
-        # Scraper의 시그널을 Worker의 시그널로 다시 전달(re-emit)
-        self.scraper.progress_update.connect(self.progress_update)
-        self.scraper.sub_progress_update.connect(self.sub_progress_update)
-        self.scraper.finished.connect(self.finished)
-        self.scraper.error.connect(self.error)
+    def start_async(self, engine):
+        # 스레드 없이 비동기 엔진에서 실행한다. (progressive 작업은 지원하지 않음) 시그널은 엔진 스레드에서 UI 스레드로 넘어온다.
+        print(f"[DEBUG] VideoWorker 비동기 실행 (작업 #{self.job_id})")
+        self._create_scraper()
+        return engine.submit(engine.download_episode(self.scraper, self.provider_id, self.anime_id))
+
+    def run(self):
+        print(f"[DEBUG] VideoWorker.run() 시작 (작업 #{self.job_id})")
+        self._create_scraper()
 
         # Scraper가 자체적으로 finished/error 시그널을 보내므로,
         # Worker는 그냥 실행만 시키면 됨.
         self.scraper.get_video_info(self.provider_id, self.anime_id)
-        print("[DEBUG] VideoWorker.run() 종료")
+        print(f"[DEBUG] VideoWorker.run() 종료 (작업 #{self.job_id})")
+
+class PrefetchWorker(QObject):
+    # finished: (provider_id, 결과 메시지) - 완료/취소/실패 모두
+    finished = pyqtSignal(str, str)
+
+    def __init__(self, provider_id, anime_id, label, cancel_event, segment_limit, max_bytes, bandwidth, resolve_slots=None):
+        super().__init__()
+        self.provider_id = provider_id
+        self.anime_id = anime_id
+        self.label = label
+        self.cancel_event = cancel_event
+        self.segment_limit = segment_limit
+        self.max_bytes = max_bytes
+        self.bandwidth = bandwidth
+        self.resolve_slots = resolve_slots
+        self.scraper = None
+
+    def run(self):
+        # 본 다운로드보다 눈에 띄지 않도록 작업자 수와 전송 속도를 낮춰서 받는다.
+        self.scraper = AniLifeScraper(segment_workers=2, resolve_slots=self.resolve_slots)
+        self.scraper.cancel_event = self.cancel_event
+        if self.bandwidth:
+            self.scraper.bandwidth_limiter = BandwidthLimiter(self.bandwidth)
+        try:
+            stored, count = self.scraper.prefetch(self.provider_id, self.anime_id, self.segment_limit or None, self.max_bytes or None)
+            message = f"다음 화 미리 받기 완료: {self.label} (조각 {count}개, {stored / (1024 * 1024):.0f}MB)"
+        except DownloadCancelled:
+            message = f"다음 화 미리 받기 취소: {self.label}"
+        except Exception as e:
+            message = f"다음 화 미리 받기 실패: {e}"
+        print(f"[DEBUG] {message}")
+        self.finished.emit(self.provider_id, message)
+
+# --- Download Queue ---
+class DownloadJob:
+    # state: queued(대기) -> running(진행 중) -> done(완료) / failed(실패)
+    def __init__(self, job_id, provider_id, anime_id, label, progressive=False):
+        self.job_id = job_id
+        self.provider_id = provider_id
+        self.anime_id = anime_id
+        self.label = label
+        # progressive: 받으면서 보기 작업 (앞쪽 조각이 준비되면 바로 재생)
+        self.progressive = progressive
+        self.state = 'queued'
+        self.download_path = None
+        # progressive 작업이 재생용으로 남겨둔 작업 폴더 (재생이 끝나면 정리)
+        self.work_dir = None
+        self.error_message = None
+        # 작업이 끝난 뒤 받는 단계별 소요 시간 요약 (자세한 기록은 logs/trace.jsonl)
+        self.trace_summary = None
+        # 다운로드 데몬이 맡은 작업이면 데몬 쪽 작업 번호 (RemoteDownloadScheduler)
+        self.remote_id = None
+        # 데몬에 넘기는 중이라 아직 작업 번호를 받지 못함 (이 프로세스에서 시작하지 않는다)
+        self.submitting = False
+        self.thread = None
+        self.worker = None
+
+class DownloadScheduler(QObject):
+    """에피소드 다운로드 작업 큐.
+
+    목록 순서가 곧 우선순위이며, 대기 중인 작업은 move_job()으로 순서를 바꿀 수 있다.
+    브라우저 해석(resolve_limit)과 조각 전송(transfer_limit)은 각각 따로 동시 실행 수가 제한된다.
+    """
+    job_added = pyqtSignal(object)
+    job_changed = pyqtSignal(object)
+    job_progress = pyqtSignal(object, int, int, str)
+    job_sub_progress = pyqtSignal(object, int, int, str)
+    job_playback_ready = pyqtSignal(object, str)
+    queue_reordered = pyqtSignal()
+
+    def __init__(self, resolve_limit=1, transfer_limit=2, engine=None, parent=None):
+        super().__init__(parent)
+        # engine(async_engine.AsyncEngine)이 있으면 progressive 가 아닌 작업은 스레드 대신 엔진의 이벤트 루프에서 받는다.
+        self.engine = engine
+        self.resolve_slots = threading.BoundedSemaphore(resolve_limit)
+        self.transfer_slots = threading.BoundedSemaphore(transfer_limit)
+        # 한 작업이 브라우저를 쓰는 동안 다른 작업들은 전송을 계속할 수 있도록 두 한도의 합만큼 작업을 띄운다.
+        self.max_running = resolve_limit + transfer_limit
+        # 새로 시작하는 작업에 적용할 화질 선택 정책 (hls.POLICY_LABELS)
+        self.quality_policy = 'highest'
+        self.jobs = []
+        self._next_job_id = 1
+
+    def job(self, job_id):
+        for job in self.jobs:
+            if job.job_id == job_id:
+                return job
+        return None
+
+    def enqueue(self, provider_id, anime_id, label, progressive=False):
+        # 이미 대기 중이거나 진행 중인 같은 에피소드는 다시 넣지 않는다.
+        for job in self.jobs:
+            if job.provider_id == provider_id and job.state in ('queued', 'running'):
+                return None
+        job = DownloadJob(self._next_job_id, provider_id, anime_id, label, progressive)
+        self._next_job_id += 1
+        self.jobs.append(job)
+        self.job_added.emit(job)
+        if progressive:
+            # 지금 보려는 에피소드는 대기 중인 작업들보다 먼저 받는다.
+            first_queued = next(j for j in self.jobs if j.state == 'queued')
+            while first_queued is not job and self.move_job(job, -1):
+                pass
+        self._schedule()
+        return job
+
+    def move_job(self, job, delta):
+        # 대기 중인 작업끼리만 순서를 바꾼다. (진행 중/완료된 작업의 위치는 그대로)
+        if job.state != 'queued':
+            return False
+        queued = [j for j in self.jobs if j.state == 'queued']
+        index = queued.index(job)
+        new_index = max(0, min(len(queued) - 1, index + delta))
+        if new_index == index:
+            return False
+        queued.insert(new_index, queued.pop(index))
+        queued_iter = iter(queued)
+        self.jobs = [next(queued_iter) if j.state == 'queued' else j for j in self.jobs]
+        self.queue_reordered.emit()
+        return True
+
+    def running_count(self):
+        # 이 프로세스에서 실행 중인 작업 수 (데몬이 맡은 작업은 세지 않는다)
+        return sum(1 for job in self.jobs if job.state == 'running' and job.remote_id is None)
+
+    def _schedule(self):
+        for job in self.jobs:
+            if self.running_count() >= self.max_running:
+                break
+            if job.state == 'queued' and job.remote_id is None and not job.submitting:
+                self._start(job)
+
+    def _start(self, job):
+        print(f"[DEBUG] 다운로드 작업 #{job.job_id} 시작: {job.label}")
+        job.state = 'running'
+        job.worker = VideoWorker(job.job_id, job.provider_id, job.anime_id, self.resolve_slots, self.transfer_slots, self.quality_policy, job.progressive)
+
+        job.worker.progress_update.connect(self.on_progress_update)
+        job.worker.sub_progress_update.connect(self.on_sub_progress_update)
+        job.worker.finished.connect(self.on_job_finished)
+        job.worker.error.connect(self.on_job_error)
+        job.worker.playback_ready.connect(self.on_playback_ready)
+        job.worker.trace_finished.connect(self.on_trace_finished)
+
+        if self.engine is not None and not job.progressive:
+            job.worker.start_async(self.engine)
+            self.job_changed.emit(job)
+            return
+
+        job.thread = QThread()
+        job.worker.moveToThread(job.thread)
+        # 스레드 및 워커 정리
+        job.worker.finished.connect(job.thread.quit)
+        job.worker.error.connect(job.thread.quit)
+        job.thread.finished.connect(job.worker.deleteLater)
+        job.thread.finished.connect(job.thread.deleteLater)
+
+        job.thread.started.connect(job.worker.run)
+        job.thread.start()
+        self.job_changed.emit(job)
+
+    def on_progress_update(self, job_id, current, total, message):
+        job = self.job(job_id)
+        if job:
+            self.job_progress.emit(job, current, total, message)
+
+    def on_sub_progress_update(self, job_id, current, total, label):
+        job = self.job(job_id)
+        if job:
+            self.job_sub_progress.emit(job, current, total, label)
+
+    def on_playback_ready(self, job_id, path):
+        job = self.job(job_id)
+        if job:
+            self.job_playback_ready.emit(job, path)
+
+    def on_trace_finished(self, job_id, summary):
+        # finished / error 보다 먼저 오므로, 이어지는 job_changed 에서 함께 표시된다.
+        job = self.job(job_id)
+        if job:
+            job.trace_summary = summary
+
+    def on_job_finished(self, job_id, result):
+        job = self.job(job_id)
+        if not job:
+            return
+        job.download_path = result.get('download_path')
+        job.work_dir = result.get('work_dir')
+        job.state = 'done' if job.download_path else 'failed'
+        self._release(job)
+
+    def on_job_error(self, job_id, error_message):
+        job = self.job(job_id)
+        if not job:
+            return
+        job.state = 'failed'
+        job.error_message = error_message
+        self._release(job)
+
+    def _release(self, job):
+        # job.thread/worker 참조는 남겨둔다. (스레드가 완전히 끝나기 전에 파이썬 객체가 사라지면 안 됨)
+        self.job_changed.emit(job)
+        self._schedule()
+
+class DaemonWorker(QObject):
+    """RemoteDownloadScheduler 의 데몬 요청(목록/추가/순서 변경)을 전용 스레드에서 차례로 보낸다.
+
+    요청마다 TCP 왕복이 있으므로, 데몬이 느리거나 멈춰도 UI 스레드는 기다리지 않고 결과만 시그널로 받는다.
+    """
+    jobs_received = pyqtSignal(object)
+    # (보낸 DownloadJob 목록, 데몬이 돌려준 작업 목록)
+    submitted = pyqtSignal(object, object)
+    # (실패한 명령, 보낸 DownloadJob 목록 또는 None, 오류 메시지)
+    failed = pyqtSignal(str, object, str)
+
+    def __init__(self, client):
+        super().__init__()
+        self.client = client
+
+    def poll(self):
+        try:
+            remote_jobs = self.client.jobs()
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit('list', None, str(e))
+            return
+        self.jobs_received.emit(remote_jobs)
+
+    def submit(self, jobs, items):
+        try:
+            remote_jobs = self.client.submit(items)
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit('submit', jobs, str(e))
+            return
+        self.submitted.emit(jobs, remote_jobs)
+
+    def move(self, remote_id, delta):
+        try:
+            self.client.move(remote_id, delta)
+        except (OSError, ValueError, KeyError) as e:
+            self.failed.emit('move', None, str(e))
+
+class RemoteDownloadScheduler(DownloadScheduler):
+    """일반 다운로드는 다운로드 데몬(daemon.py)에 맡기는 작업 큐. GUI 를 닫아도 데몬이 계속 받는다.
+
+    데몬의 작업 목록을 주기적으로 가져와 DownloadJob 으로 비춰 보여주므로, 화면 쪽은 DownloadScheduler 와 똑같이 쓰면 된다.
+    데몬 요청은 DaemonWorker 스레드에서 보내고, 새 작업은 목록에 먼저 보여준 뒤 한 번에 모아 넘긴다.
+    받으면서 보기(progressive) 작업은 이 프로세스의 플레이어가 조각을 읽어야 하므로 기존처럼 직접 받는다.
+    데몬이 꺼져 있으면 DownloadScheduler 처럼 이 창에서 받다가, 목록 요청이 성공하는 순간부터 새 작업을 데몬에 넘긴다.
+    """
+    status_changed = pyqtSignal(str)
+    poll_requested = pyqtSignal()
+    submit_requested = pyqtSignal(object, object)
+    move_requested = pyqtSignal(int, int)
+
+    POLL_INTERVAL_MS = 1000
+
+    def __init__(self, client, resolve_limit=1, transfer_limit=2, engine=None, parent=None):
+        super().__init__(resolve_limit, transfer_limit, engine, parent)
+        self.client = client
+        # 데몬 작업 번호 -> DownloadJob
+        self.remote_jobs = {}
+        # 데몬이 떠 있는지는 UI 스레드에서 묻지 않고, 첫 목록 요청(DaemonWorker 스레드)의 결과로 정한다.
+        # 그 전까지(또는 데몬이 꺼져 있으면) 새 작업은 이 창에서 직접 받는다.
+        self.connected = False
+        self._was_connected = False
+        # 데몬에 아직 넘기지 않은 새 작업 (같은 이벤트 처리 안에서 넣은 작업은 한 번의 요청으로 보낸다)
+        self._pending_submit = []
+        self._poll_in_flight = False
+
+        self.worker_thread = QThread()
+        self.worker = DaemonWorker(client)
+        self.worker.moveToThread(self.worker_thread)
+        self.poll_requested.connect(self.worker.poll)
+        self.submit_requested.connect(self.worker.submit)
+        self.move_requested.connect(self.worker.move)
+        self.worker.jobs_received.connect(self.on_jobs_received)
+        self.worker.submitted.connect(self.on_submitted)
+        self.worker.failed.connect(self.on_request_failed)
+        self.worker_thread.finished.connect(self.worker.deleteLater)
+        self.worker_thread.start()
+        QApplication.instance().aboutToQuit.connect(self.shutdown)
+
+        self.poll_timer = QTimer(self)
+        self.poll_timer.timeout.connect(self.poll)
+        self.poll_timer.start(self.POLL_INTERVAL_MS)
+        # 목록 화면이 시그널을 연결한 뒤에 데몬에 남아 있던 작업을 가져오도록 한 번 미룬다.
+        QTimer.singleShot(0, self.poll)
+
+    def shutdown(self):
+        self.poll_timer.stop()
+        self.worker_thread.quit()
+        # 보내던 요청이 끝날 때까지 (DaemonClient 제한 시간만큼) 기다린다.
+        self.worker_thread.wait((self.client.timeout + 1) * 1000)
+
+    def enqueue(self, provider_id, anime_id, label, progressive=False):
+        if progressive or not self.connected:
+            # 데몬이 꺼져 있으면 이 프로세스에서 직접 받는다.
+            return super().enqueue(provider_id, anime_id, label, progressive)
+        for job in self.jobs:
+            if job.provider_id == provider_id and job.state in ('queued', 'running'):
+                return None
+        job = DownloadJob(self._next_job_id, provider_id, anime_id, label)
+        job.submitting = True
+        self._next_job_id += 1
+        self.jobs.append(job)
+        self.job_added.emit(job)
+        if not self._pending_submit:
+            QTimer.singleShot(0, self._flush_submit)
+        self._pending_submit.append((job, {'provider_id': provider_id, 'anime_id': anime_id, 'label': label,
+                                           'quality_policy': self.quality_policy}))
+        return job
+
+    def _flush_submit(self):
+        pending, self._pending_submit = self._pending_submit, []
+        if pending:
+            self.submit_requested.emit([job for job, _ in pending], [item for _, item in pending])
+
+    def on_submitted(self, jobs, remote_jobs):
+        removed = False
+        for job, remote in zip(jobs, remote_jobs):
+            job.submitting = False
+            if remote['id'] in self.remote_jobs:
+                # 다른 클라이언트가 먼저 넣어 이미 비추고 있는 작업이면 방금 만든 행은 지운다.
+                self.jobs.remove(job)
+                removed = True
+                continue
+            job.remote_id = remote['id']
+            self.remote_jobs[remote['id']] = job
+            self._mirror(remote)
+        if removed:
+            self.queue_reordered.emit()
+
+    def move_job(self, job, delta):
+        moved = super().move_job(job, delta)
+        if moved and job.remote_id is not None:
+            self.move_requested.emit(job.remote_id, delta)
+        return moved
+
+    def _mirror(self, remote):
+        job = self.remote_jobs.get(remote['id'])
+        added = job is None
+        if added:
+            job = DownloadJob(self._next_job_id, remote['provider_id'], remote['anime_id'], remote['label'])
+            job.remote_id = remote['id']
+            self._next_job_id += 1
+            self.remote_jobs[remote['id']] = job
+            self.jobs.append(job)
+            self.job_added.emit(job)
+
+        state = 'running' if remote['state'] in ACTIVE_STATES else remote['state']
+        changed = state != job.state
+        job.state = state
+        job.download_path = remote.get('path')
+        job.error_message = remote.get('error')
+        job.trace_summary = remote.get('trace_summary')
+        if changed or added:
+            self.job_changed.emit(job)
+        if state == 'running':
+            if remote.get('progress'):
+                self.job_progress.emit(job, *remote['progress'])
+            if remote.get('sub_progress') and remote['sub_progress'][2]:
+                self.job_sub_progress.emit(job, *remote['sub_progress'])
+        return job
+
+    def poll(self):
+        # 앞의 요청이 아직 끝나지 않았으면(데몬이 느림) 쌓아 두지 않고 건너뛴다.
+        if self._poll_in_flight:
+            return
+        self._poll_in_flight = True
+        self.poll_requested.emit()
+
+    def on_jobs_received(self, remote_jobs):
+        self._poll_in_flight = False
+        self._set_connected(True)
+        for remote in remote_jobs:
+            self._mirror(remote)
+
+    def on_request_failed(self, command, jobs, error):
+        if command == 'list':
+            self._poll_in_flight = False
+        self._set_connected(False, error)
+        if command == 'submit':
+            # 넘기지 못한 작업은 이 프로세스에서 직접 받는다.
+            for job in jobs:
+                job.submitting = False
+            self._schedule()
+
+    def _set_connected(self, connected, error=None):
+        if connected == self.connected:
+            return
+        self.connected = connected
+        if connected:
+            if self._was_connected:
+                self.status_changed.emit("다운로드 데몬에 다시 연결되었습니다.")
+            else:
+                self.status_changed.emit("다운로드 데몬에 연결되었습니다. 새 작업은 데몬이 받습니다.")
+            self._was_connected = True
+        else:
+            print(f"[DEBUG] 다운로드 데몬 연결 실패: {error}")
+            self.status_changed.emit("다운로드 데몬에 연결할 수 없습니다. 새 작업은 이 창에서 직접 받습니다.")
+
+class EpisodePrefetcher(QObject):
+    """다음 화 미리 받기 (선택 기능, 기본 꺼짐).
+
+    재생을 시작했거나 다운로드가 끝난 에피소드의 다음 화를 뒤에서 미리 해석하고 앞쪽 조각을 작업 폴더에 받아둔다.
+    나중에 그 화를 받으면 캐시된 스트림 정보와 이어받기로 바로 시작된다.
+    한 번에 하나만 진행하며, 사용자가 다른 작품으로 이동하거나 그 화를 직접 받기 시작하면 취소한다.
+    """
+    status_changed = pyqtSignal(str)
+
+    # 미리 받을 조각 수 (0 이면 에피소드 전체), 작업 폴더 용량 예산, 전송 속도 상한(바이트/초)
+    SEGMENT_LIMIT = 30
+    MAX_BYTES = 500 * 1024 * 1024
+    BANDWIDTH = 2 * 1024 * 1024
+
+    def __init__(self, resolve_slots=None, parent=None):
+        super().__init__(parent)
+        self.enabled = False
+        self.resolve_slots = resolve_slots
+        # 진행 중인 미리 받기: (provider_id, anime_id, 표시 이름)
+        self.current = None
+        self.cancel_event = None
+        # 실행 중인 스레드/워커 참조 (스레드가 끝나기 전에 파이썬 객체가 사라지면 안 됨)
+        self._running = []
+
+    def prefetch(self, request):
+        if not self.enabled:
+            return
+        provider_id, anime_id, label = request
+        if self.current and self.current[0] == provider_id:
+            return
+        self.cancel()
+        self.current = request
+        self.cancel_event = threading.Event()
+        thread = QThread()
+        worker = PrefetchWorker(provider_id, anime_id, label, self.cancel_event, self.SEGMENT_LIMIT, self.MAX_BYTES, self.BANDWIDTH, self.resolve_slots)
+        worker.moveToThread(thread)
+        thread.started.connect(worker.run)
+        worker.finished.connect(self.on_finished)
+        worker.finished.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._running.remove((thread, worker)))
+        self._running.append((thread, worker))
+        thread.start()
+        self.status_changed.emit(f"다음 화 미리 받는 중: {label}")
+
+    def cancel(self, provider_id=None):
+        # provider_id 가 주어지면 그 에피소드를 미리 받는 중일 때만 취소한다.
+        if self.current is None or (provider_id and self.current[0] != provider_id):
+            return
+        print(f"[DEBUG] 다음 화 미리 받기 취소 요청: {self.current[2]}")
+        self.cancel_event.set()
+        self.current = None
+
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        if not enabled:
+            self.cancel()
+
+    def on_finished(self, provider_id, message):
+        if self.current and self.current[0] == provider_id:
+            self.current = None
+        self.status_changed.emit(message)
 
 # --- Custom Widgets ---
-class ProgressDialog(QDialog):
-    def __init__(self, parent=None):
+class JobProgressWidget(QWidget):
+    # 다운로드 목록의 한 줄: 작업 이름 + 전체/세부 진행률
+    def __init__(self, title, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("다운로드 진행률")
-        self.setMinimumWidth(400)
-        
         layout = QVBoxLayout(self)
-        
+        layout.setContentsMargins(5, 5, 5, 5)
+
+        self.title_label = QLabel(title)
+        self.title_label.setStyleSheet("font-weight: bold;")
         self.main_progress_label = QLabel("전체 진행률: 대기 중...")
         self.main_progress_bar = QProgressBar()
         self.sub_progress_label = QLabel("세부 진행률:")
         self.sub_progress_bar = QProgressBar()
-        
+        self.trace_label = QLabel("단계별 소요 시간: -")
+        self.trace_label.setStyleSheet("color: gray;")
+        self.trace_label.setWordWrap(True)
+
+        layout.addWidget(self.title_label)
         layout.addWidget(self.main_progress_label)
         layout.addWidget(self.main_progress_bar)
         layout.addWidget(self.sub_progress_label)
         layout.addWidget(self.sub_progress_bar)
-
-        # 사용자가 창을 닫지 못하도록 설정 (선택 사항)
-        self.setModal(True)
+        layout.addWidget(self.trace_label)
 
     def update_main_progress(self, current, total, message):
         self.main_progress_bar.setRange(0, total)
@@ -143,14 +608,122 @@ class ProgressDialog(QDialog):
         self.sub_progress_label.setText("완료" if success else "실패")
         self.main_progress_bar.setValue(self.main_progress_bar.maximum())
         self.sub_progress_bar.setValue(self.sub_progress_bar.maximum())
-        # 완료 후 자동으로 닫히게 하려면 self.accept() 호출
-        # self.accept()
+
+    def set_trace_summary(self, summary):
+        self.trace_label.setText(f"단계별 소요 시간: {summary or '-'}")
+
+    def snapshot(self):
+        return {
+            'main_label': self.main_progress_label.text(),
+            'sub_label': self.sub_progress_label.text(),
+            'trace_label': self.trace_label.text(),
+            'main': (self.main_progress_bar.maximum(), self.main_progress_bar.value()),
+            'sub': (self.sub_progress_bar.maximum(), self.sub_progress_bar.value()),
+        }
+
+    def restore(self, state):
+        self.main_progress_label.setText(state['main_label'])
+        self.sub_progress_label.setText(state['sub_label'])
+        self.trace_label.setText(state['trace_label'])
+        self.main_progress_bar.setRange(0, state['main'][0])
+        self.main_progress_bar.setValue(state['main'][1])
+        self.sub_progress_bar.setRange(0, state['sub'][0])
+        self.sub_progress_bar.setValue(state['sub'][1])
+
+class DownloadQueueWidget(QWidget):
+    def __init__(self, scheduler, prefetcher=None):
+        super().__init__()
+        self.scheduler = scheduler
+        self.rows = {}
+        layout = QVBoxLayout(self)
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(QLabel("다운로드 목록"), 1)
+        self.quality_combo = QComboBox()
+        for policy, label in POLICY_LABELS.items():
+            self.quality_combo.addItem(label, policy)
+        self.quality_combo.currentIndexChanged.connect(self.on_quality_policy_changed)
+        top_layout.addWidget(QLabel("화질:"))
+        top_layout.addWidget(self.quality_combo)
+        if prefetcher is not None:
+            self.prefetch_checkbox = QCheckBox("다음 화 미리 받기")
+            self.prefetch_checkbox.setChecked(prefetcher.enabled)
+            self.prefetch_checkbox.toggled.connect(prefetcher.set_enabled)
+            top_layout.addWidget(self.prefetch_checkbox)
+        self.up_button = QPushButton("▲ 먼저 받기")
+        self.up_button.clicked.connect(lambda: self.move_selected(-1))
+        self.down_button = QPushButton("▼ 나중에 받기")
+        self.down_button.clicked.connect(lambda: self.move_selected(1))
+        top_layout.addWidget(self.up_button)
+        top_layout.addWidget(self.down_button)
+        layout.addLayout(top_layout)
+        self.jobs_list = QListWidget()
+        layout.addWidget(self.jobs_list)
+
+        scheduler.job_added.connect(self.add_job)
+        scheduler.job_changed.connect(self.on_job_changed)
+        scheduler.job_progress.connect(lambda job, current, total, message: self.rows[job.job_id].update_main_progress(current, total, message))
+        scheduler.job_sub_progress.connect(lambda job, current, total, label: self.rows[job.job_id].update_sub_progress(current, total, label))
+        scheduler.queue_reordered.connect(self.rebuild)
+
+    def _add_row(self, job):
+        item = QListWidgetItem()
+        item.setData(Qt.ItemDataRole.UserRole, job.job_id)
+        row = JobProgressWidget(job.label)
+        item.setSizeHint(row.sizeHint())
+        self.jobs_list.addItem(item)
+        self.jobs_list.setItemWidget(item, row)
+        self.rows[job.job_id] = row
+        return row
+
+    def add_job(self, job):
+        self._add_row(job)
+
+    def on_job_changed(self, job):
+        row = self.rows.get(job.job_id)
+        if not row:
+            return
+        if job.state == 'running':
+            row.main_progress_label.setText("전체 진행률: 시작 중...")
+        elif job.state == 'done':
+            row.set_finished_status(f"다운로드 완료! '{job.download_path}'", success=True)
+        elif job.state == 'failed':
+            row.set_finished_status(f"오류 발생: {job.error_message}" if job.error_message else "다운로드 실패.", success=False)
+        if job.state in ('done', 'failed') and job.trace_summary:
+            row.set_trace_summary(job.trace_summary)
+
+    def rebuild(self):
+        # 우선순위가 바뀌면 목록을 스케줄러 순서대로 다시 그린다. (행 위젯은 목록과 함께 지워지므로 상태를 먼저 옮겨 담는다)
+        selected_id = self.selected_job_id()
+        states = {job_id: row.snapshot() for job_id, row in self.rows.items()}
+        self.rows = {}
+        self.jobs_list.clear()
+        for job in self.scheduler.jobs:
+            row = self._add_row(job)
+            if job.job_id in states:
+                row.restore(states[job.job_id])
+            if job.job_id == selected_id:
+                self.jobs_list.setCurrentRow(self.jobs_list.count() - 1)
+
+    def on_quality_policy_changed(self, index):
+        # 이미 시작된 작업은 그대로 두고, 이후에 시작하는 작업부터 적용된다.
+        self.scheduler.quality_policy = self.quality_combo.itemData(index)
+
+    def selected_job_id(self):
+        item = self.jobs_list.currentItem()
+        return item.data(Qt.ItemDataRole.UserRole) if item else None
+
+    def move_selected(self, delta):
+        job = self.scheduler.job(self.selected_job_id())
+        if job:
+            self.scheduler.move_job(job, delta)
 
 class SearchPageWidget(QWidget):
     anime_selected = pyqtSignal(str)
-    def __init__(self, status_bar_callback):
+    def __init__(self, status_bar_callback, bridge=None):
         super().__init__()
         self.status_bar_callback = status_bar_callback
+        # bridge(qt_adapter.AsyncBridge)가 있으면 검색을 비동기 엔진에서 실행한다.
+        self.bridge = bridge
         layout = QVBoxLayout(self)
         search_layout = QHBoxLayout()
         self.search_input = QLineEdit()
@@ -165,6 +738,7 @@ class SearchPageWidget(QWidget):
         self.results_list.setIconSize(QSize(80, 120))
         self.results_list.itemDoubleClicked.connect(self.on_item_double_clicked)
         layout.addWidget(self.results_list)
+        self.results_generation = 0
 
     def on_item_double_clicked(self, item):
         anime_data = item.data(Qt.ItemDataRole.UserRole)
@@ -178,7 +752,10 @@ class SearchPageWidget(QWidget):
             return
         self.status_bar_callback(f"'{keyword}' 검색 중...")
         self.search_button.setEnabled(False)
-        self.results_list.clear()
+        self.clear_results()
+        if self.bridge is not None:
+            self.bridge.run(self.bridge.engine.search(AniLifeScraper(), keyword), self.update_results, self.search_error)
+            return
         self.thread = QThread()
         self.worker = SearchWorker(keyword)
         self.worker.moveToThread(self.thread)
@@ -190,8 +767,13 @@ class SearchPageWidget(QWidget):
         self.thread.finished.connect(self.thread.deleteLater)
         self.thread.start()
 
-    def update_results(self, results):
+    def clear_results(self):
+        # 목록을 비우면 이전 항목들은 삭제되므로, 늦게 도착한 썸네일이 적용되지 않도록 세대 번호를 올린다.
+        self.results_generation += 1
         self.results_list.clear()
+
+    def update_results(self, results):
+        self.clear_results()
         if not results:
             self.status_bar_callback("검색 결과가 없습니다.")
         else:
@@ -212,20 +794,12 @@ class SearchPageWidget(QWidget):
         self.search_button.setEnabled(True)
 
     def download_thumbnail(self, item, url):
-        thread = QThread()
-        downloader = ThumbnailDownloader(item, url)
-        downloader.moveToThread(thread)
-        item.thread = thread
-        item.downloader = downloader
-        thread.started.connect(downloader.run)
-        downloader.finished.connect(self.set_thumbnail)
-        downloader.finished.connect(thread.quit)
-        downloader.finished.connect(downloader.deleteLater)
-        thread.finished.connect(thread.deleteLater)
-        thread.start()
+        # 캐시에 있으면 즉시, 없으면 공용 이미지 풀에서 받아 아이콘 크기로 줄인 뒤 적용된다.
+        generation = self.results_generation
+        get_image_loader().load(url, self.results_list.iconSize(), lambda pixmap: self.set_thumbnail(item, pixmap, generation))
 
-    def set_thumbnail(self, item, pixmap):
-        if not pixmap.isNull():
+    def set_thumbnail(self, item, pixmap, generation):
+        if generation == self.results_generation and not pixmap.isNull():
             item.setIcon(QIcon(pixmap))
 
     def search_error(self, error_message):
@@ -234,10 +808,18 @@ class SearchPageWidget(QWidget):
 
 class AnimeDetailWidget(QWidget):
     back_requested = pyqtSignal()
-    episode_selected = pyqtSignal(str, str)
+    # [(provider_id, anime_id, 표시 이름), ...]
+    episodes_download_requested = pyqtSignal(list)
+    # (provider_id, anime_id, 표시 이름) - 받으면서 바로 보기
+    episode_watch_requested = pyqtSignal(tuple)
+    # (provider_id, anime_id, 표시 이름) - 다운로드 없이 스트리밍 재생
+    episode_stream_requested = pyqtSignal(tuple)
+    # 에피소드 항목의 원래 표시 이름 (받은 화 표시 없이)
+    EPISODE_TEXT_ROLE = Qt.ItemDataRole.UserRole + 1
     def __init__(self):
         super().__init__()
         self.current_anime_id = None
+        self.poster_url = None
         main_layout = QHBoxLayout(self)
         main_layout.setContentsMargins(20, 20, 20, 20)
         self.poster_label = QLabel("포스터 로딩 중...")
@@ -268,22 +850,71 @@ class AnimeDetailWidget(QWidget):
         self.summary_label.setReadOnly(True)
         self.summary_label.setStyleSheet("background-color: #1e2228; border: none; padding: 5px;")
         details_layout.addWidget(self.summary_label, 1)
-        details_layout.addWidget(QLabel("에피소드"))
+        episodes_header = QHBoxLayout()
+        episodes_header.addWidget(QLabel("에피소드"), 1)
+        self.download_selected_button = QPushButton("선택한 에피소드 다운로드")
+        self.download_selected_button.clicked.connect(self.on_download_selected_clicked)
+        episodes_header.addWidget(self.download_selected_button)
+        self.watch_button = QPushButton("▶ 받으면서 보기")
+        self.watch_button.clicked.connect(self.on_watch_clicked)
+        episodes_header.addWidget(self.watch_button)
+        self.stream_button = QPushButton("☁ 스트리밍 재생")
+        self.stream_button.clicked.connect(self.on_stream_clicked)
+        episodes_header.addWidget(self.stream_button)
+        details_layout.addLayout(episodes_header)
         self.episodes_list = QListWidget()
+        # Ctrl/Shift 로 여러 에피소드를 한 번에 선택할 수 있도록 설정
+        self.episodes_list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         self.episodes_list.itemDoubleClicked.connect(self.on_episode_double_clicked)
         details_layout.addWidget(self.episodes_list, 2)
         main_layout.addLayout(details_layout, 1)
 
     def on_episode_double_clicked(self, item):
         print(f"[DEBUG] 에피소드 아이템 더블클릭: {item.text()}")
-        provider_id = item.data(Qt.ItemDataRole.UserRole)
-        if provider_id and self.current_anime_id:
-            # 다운로드 시작 시, 리스트를 비활성화 하도록 MainWindow에 요청
-            self.episodes_list.setEnabled(False)
-            print(f"[DEBUG] Provider ID '{provider_id}'와 Anime ID '{self.current_anime_id}'로 episode_selected 시그널 발생")
-            self.episode_selected.emit(provider_id, self.current_anime_id)
-        else:
-            print(f"[DEBUG] Provider ID({provider_id}) 또는 Anime ID({self.current_anime_id})를 찾을 수 없음")
+        self.request_downloads([item])
+
+    def on_download_selected_clicked(self):
+        # 목록에 보이는 순서(회차 순)대로 큐에 넣는다.
+        items = sorted(self.episodes_list.selectedItems(), key=self.episodes_list.row)
+        self.request_downloads(items)
+
+    def on_watch_clicked(self):
+        item = self.episodes_list.currentItem()
+        if not item or not self.current_anime_id or not item.data(Qt.ItemDataRole.UserRole):
+            return
+        print(f"[DEBUG] 받으면서 보기 요청: {item.text()}")
+        self.episode_watch_requested.emit(self.episode_request(item))
+
+    def on_stream_clicked(self):
+        item = self.episodes_list.currentItem()
+        if not item or not self.current_anime_id or not item.data(Qt.ItemDataRole.UserRole):
+            return
+        print(f"[DEBUG] 스트리밍 재생 요청: {item.text()}")
+        self.episode_stream_requested.emit(self.episode_request(item))
+
+    def episode_request(self, item):
+        return (item.data(Qt.ItemDataRole.UserRole), self.current_anime_id, f"{self.title_label.text()} {item.data(self.EPISODE_TEXT_ROLE)}")
+
+    def next_episode_request(self, provider_id):
+        # 목록에서 provider_id 바로 다음 에피소드 (없거나 다른 작품을 보고 있으면 None)
+        for row in range(self.episodes_list.count() - 1):
+            if self.episodes_list.item(row).data(Qt.ItemDataRole.UserRole) == provider_id:
+                next_item = self.episodes_list.item(row + 1)
+                if next_item.data(Qt.ItemDataRole.UserRole):
+                    return self.episode_request(next_item)
+        return None
+
+    def request_downloads(self, items):
+        if not self.current_anime_id:
+            print(f"[DEBUG] Anime ID({self.current_anime_id})를 찾을 수 없음")
+            return
+        requests_list = []
+        for item in items:
+            if item.data(Qt.ItemDataRole.UserRole):
+                requests_list.append(self.episode_request(item))
+        if requests_list:
+            print(f"[DEBUG] 에피소드 {len(requests_list)}개 다운로드 요청 (Anime ID: {self.current_anime_id})")
+            self.episodes_download_requested.emit(requests_list)
 
     def update_details(self, data, anime_id=None):
         self.current_anime_id = anime_id
@@ -299,25 +930,40 @@ class AnimeDetailWidget(QWidget):
             item_text = f"{episode.get('num', '')}화 - {episode.get('title', '제목 없음')}"
             item = QListWidgetItem(item_text.strip())
             item.setData(Qt.ItemDataRole.UserRole, episode['provider_id'])
+            item.setData(self.EPISODE_TEXT_ROLE, item_text.strip())
             self.episodes_list.addItem(item)
+        self.mark_downloaded()
         poster_url = data.get('poster_url')
         if poster_url:
             self.download_poster(poster_url)
         else:
+            self.poster_url = None
             self.poster_label.setText("이미지 없음")
 
+    def mark_downloaded(self):
+        # 라이브러리에 있는 화는 ✔ 로 표시한다. (SQLite 조회 + 파일 stat 만 하므로 바로 끝난다)
+        if not self.current_anime_id or not self.episodes_list.count():
+            return
+        try:
+            downloaded = get_library().downloaded(self.current_anime_id)
+        except Exception as e:
+            print(f"[DEBUG] 라이브러리 조회 실패: {e}")
+            return
+        for row in range(self.episodes_list.count()):
+            item = self.episodes_list.item(row)
+            entry = downloaded.get(item.data(Qt.ItemDataRole.UserRole))
+            text = item.data(self.EPISODE_TEXT_ROLE)
+            item.setText(f"✔ {text}" if entry else text)
+            item.setToolTip(f"받은 파일: {entry['path']}" if entry else "")
+
     def download_poster(self, url):
-        self.poster_thread = QThread()
-        self.poster_downloader = PosterDownloader(url)
-        self.poster_downloader.moveToThread(self.poster_thread)
-        self.poster_thread.started.connect(self.poster_downloader.run)
-        self.poster_downloader.finished.connect(self.set_poster)
-        self.poster_downloader.finished.connect(self.poster_thread.quit)
-        self.poster_downloader.finished.connect(self.poster_downloader.deleteLater)
-        self.poster_thread.finished.connect(self.poster_thread.deleteLater)
-        self.poster_thread.start()
-
-    def set_poster(self, pixmap):
+        self.poster_url = url
+        get_image_loader().load(url, self.poster_label.size(), lambda pixmap: self.set_poster(url, pixmap))
+
+    def set_poster(self, url, pixmap):
+        # 그 사이 다른 작품으로 넘어갔다면 늦게 도착한 포스터는 무시한다.
+        if url != self.poster_url:
+            return
         if not pixmap.isNull():
             self.poster_label.setPixmap(pixmap)
         else:
@@ -377,14 +1023,32 @@ class MainWindow(QMainWindow):
         self.content_area = QStackedWidget()
         self.content_area.setObjectName("ContentArea")
         main_layout.addWidget(self.content_area, 1)
-        self.search_page = SearchPageWidget(self.set_status_message)
+        # aiohttp 가 있으면 검색/상세 정보/다운로드를 비동기 엔진 하나에서 처리한다. (없으면 작업마다 QThread)
+        self.async_engine = get_async_engine() if aiohttp is not None else None
+        self.async_bridge = AsyncBridge(self.async_engine, self) if self.async_engine else None
+        self.detail_future = None
+        self.search_page = SearchPageWidget(self.set_status_message, self.async_bridge)
         self.search_page.anime_selected.connect(self.show_anime_details)
         self.detail_page = AnimeDetailWidget()
         self.detail_page.back_requested.connect(self.show_search_page)
-        self.detail_page.episode_selected.connect(self.play_video)
+        self.detail_page.episodes_download_requested.connect(self.enqueue_downloads)
+        self.detail_page.episode_watch_requested.connect(self.watch_episode)
+        self.detail_page.episode_stream_requested.connect(self.stream_episode)
+        # 다운로드 데몬(python daemon.py serve)이 떠 있으면 다운로드는 데몬에 맡긴다. (창을 닫아도 계속 받음)
+        # 데몬 확인은 스케줄러의 DaemonWorker 스레드가 하므로, 데몬이 느리거나 멈춰 있어도 창은 바로 뜬다.
+        self.download_scheduler = RemoteDownloadScheduler(DaemonClient(), engine=self.async_engine, parent=self)
+        self.download_scheduler.status_changed.connect(self.set_status_message)
+        self.download_scheduler.job_changed.connect(self.on_download_job_changed)
+        self.download_scheduler.job_playback_ready.connect(self.on_playback_ready)
+        self.prefetcher = EpisodePrefetcher(self.download_scheduler.resolve_slots, parent=self)
+        self.prefetcher.status_changed.connect(self.set_status_message)
+        self.downloads_page = DownloadQueueWidget(self.download_scheduler, self.prefetcher)
         self.video_player = None
+        # 플레이어가 재생 중인 progressive 작업 번호
+        self.playing_job_id = None
         self.pages = {
             "search": self.search_page,
+            "downloads": self.downloads_page,
             "daily": self.create_placeholder_page("요일별 애니"),
             "quarter": self.create_placeholder_page("분기별 애니"),
             "top20": self.create_placeholder_page("TOP 20"),
@@ -392,6 +1056,7 @@ class MainWindow(QMainWindow):
         }
         self.content_area.addWidget(self.search_page)
         self.content_area.addWidget(self.detail_page)
+        self.content_area.addWidget(self.downloads_page)
         for name in ["daily", "quarter", "top20", "genre"]:
              self.content_area.addWidget(self.pages[name])
         self.nav_button_group.buttonClicked.connect(self.switch_page)
@@ -417,7 +1082,7 @@ class MainWindow(QMainWindow):
         self.nav_buttons = {
             "search": QPushButton("🔍 검색"), "daily": QPushButton("📅 요일별"),
             "quarter": QPushButton("🌸 분기별"), "top20": QPushButton("🏆 TOP 20"),
-            "genre": QPushButton("🎭 장르"),
+            "genre": QPushButton("🎭 장르"), "downloads": QPushButton("⬇ 다운로드"),
         }
         self.nav_button_group = QButtonGroup(self)
         self.nav_button_group.setExclusive(True)
@@ -434,12 +1099,23 @@ class MainWindow(QMainWindow):
         page_name = button.objectName()
         if page_name in self.pages:
             self.content_area.setCurrentWidget(self.pages[page_name])
+            if page_name != "downloads":
+                # 보던 작품을 떠나면 다음 화 미리 받기는 의미가 없다.
+                self.prefetcher.cancel()
             self.set_status_message(f"{button.text().strip()} 페이지로 이동했습니다.")
 
     def show_anime_details(self, anime_id):
+        if anime_id != self.detail_page.current_anime_id:
+            self.prefetcher.cancel()
         self.set_status_message(f"애니메이션 정보 로딩 중...")
         self.detail_page.update_details({}, anime_id) 
         self.content_area.setCurrentWidget(self.detail_page)
+        if self.async_bridge is not None:
+            # 이전 애니메이션의 상세 정보가 늦게 도착해 화면을 덮어쓰지 않도록 취소한다.
+            if self.detail_future is not None:
+                self.detail_future.cancel()
+            self.detail_future = self.async_bridge.run(self.async_engine.get_anime_details(AniLifeScraper(), anime_id), self.on_details_loaded, self.on_details_error)
+            return
         self.detail_thread = QThread()
         self.detail_worker = DetailWorker(anime_id)
         self.detail_worker.moveToThread(self.detail_thread)
@@ -464,49 +1140,128 @@ class MainWindow(QMainWindow):
         self.show_search_page()
 
     def show_search_page(self):
+        self.prefetcher.cancel()
         self.content_area.setCurrentWidget(self.search_page)
         self.set_status_message("검색 페이지로 돌아왔습니다.")
 
-    def play_video(self, provider_id, anime_id):
-        print(f"[DEBUG] play_video 슬롯 실행됨. Provider ID: {provider_id}, Anime ID: {anime_id}")
-        
-        self.progress_dialog = ProgressDialog(self)
-        
-        self.video_thread = QThread()
-        self.video_worker = VideoWorker(provider_id, anime_id)
-        self.video_worker.moveToThread(self.video_thread)
-
-        # Worker의 시그널을 ProgressDialog의 슬롯에 연결
-        self.video_worker.progress_update.connect(self.progress_dialog.update_main_progress)
-        self.video_worker.sub_progress_update.connect(self.progress_dialog.update_sub_progress)
-        self.video_worker.finished.connect(self.on_download_finished)
-        self.video_worker.error.connect(self.on_download_error)
-        
-        # 스레드 및 워커 정리
-        self.video_worker.finished.connect(self.video_thread.quit)
-        self.video_worker.error.connect(self.video_thread.quit)
-        self.video_worker.finished.connect(self.video_worker.deleteLater)
-        self.video_thread.finished.connect(self.video_thread.deleteLater)
-
-        self.video_thread.started.connect(self.video_worker.run)
-        self.video_thread.start()
-        
-        self.progress_dialog.show()
-
-    def on_download_finished(self, result):
-        download_path = result.get('download_path')
-        message = f"다운로드 완료! '{download_path}'" if download_path else "다운로드 실패."
-        self.set_status_message(message)
-        self.progress_dialog.set_finished_status(message, success=bool(download_path))
-        self.detail_page.episodes_list.setEnabled(True)
-        # self.progress_dialog.accept() # 완료 후 자동으로 닫기
-
-    def on_download_error(self, error_message):
-        message = f"오류 발생: {error_message}"
-        self.set_status_message(message)
-        self.progress_dialog.set_finished_status(message, success=False)
-        self.detail_page.episodes_list.setEnabled(True)
-        # self.progress_dialog.accept() # 완료 후 자동으로 닫기
+    def enqueue_downloads(self, requests_list):
+        added = 0
+        for provider_id, anime_id, label in requests_list:
+            print(f"[DEBUG] 다운로드 큐에 추가. Provider ID: {provider_id}, Anime ID: {anime_id}")
+            # 미리 받던 에피소드면 미리 받기를 멈추고 본 다운로드가 이어받는다.
+            self.prefetcher.cancel(provider_id)
+            if self.download_scheduler.enqueue(provider_id, anime_id, label):
+                added += 1
+        self.set_status_message(f"{added}개의 에피소드를 다운로드 목록에 추가했습니다.")
+
+    def watch_episode(self, request):
+        provider_id, anime_id, label = request
+        entry = get_library().lookup(provider_id, deep=False)
+        if entry:
+            # 이미 받은 화는 받을 것 없이 파일로 바로 재생한다.
+            player = self.open_video_player(label)
+            self.playing_job_id = None
+            player.play_video(entry['path'])
+            self.set_status_message(f"'{label}' 재생 시작 (받아둔 파일)")
+            self.prefetch_next_episode(provider_id)
+            return
+        self.prefetcher.cancel(provider_id)
+        job = self.download_scheduler.enqueue(provider_id, anime_id, label, progressive=True)
+        if job:
+            self.set_status_message(f"'{label}' 앞부분을 받는 중입니다. 준비되면 바로 재생합니다.")
+        else:
+            self.set_status_message(f"'{label}'은(는) 이미 다운로드 목록에 있습니다.")
+
+    def open_video_player(self, title):
+        if self.video_player is None:
+            self.video_player = VideoPlayer(self)
+            self.video_player.setAttribute(Qt.WidgetAttribute.WA_DeleteOnClose)
+            self.video_player.closed.connect(self.on_video_player_closed)
+        self.video_player.setWindowTitle(title)
+        self.video_player.show()
+        return self.video_player
+
+    def on_playback_ready(self, job, path):
+        # 앞쪽 조각이 준비되면 받는 중인 EVENT 플레이리스트로 재생을 시작한다. (나머지는 계속 받는 중)
+        player = self.open_video_player(job.label)
+        self.playing_job_id = job.job_id
+        player.play_video(path)
+        self.set_status_message(f"'{job.label}' 재생 시작 (나머지는 계속 받는 중)")
+        self.prefetch_next_episode(job.provider_id)
+
+    def prefetch_next_episode(self, provider_id):
+        # 보고 있거나 다 받은 에피소드의 다음 화를 미리 받는다. (이미 목록에 있는 화는 건너뜀)
+        request = self.detail_page.next_episode_request(provider_id)
+        if not request:
+            return
+        for job in self.download_scheduler.jobs:
+            if job.provider_id == request[0] and job.state != 'failed':
+                return
+        self.prefetcher.prefetch(request)
+
+    def stream_episode(self, request):
+        provider_id, anime_id, label = request
+        self.set_status_message(f"'{label}' 스트림 정보를 확인하는 중...")
+        self.stream_thread = QThread()
+        self.stream_worker = StreamWorker(provider_id, anime_id)
+        self.stream_worker.moveToThread(self.stream_thread)
+        self.stream_thread.started.connect(self.stream_worker.run)
+        self.stream_worker.finished.connect(lambda stream_info: self.on_stream_resolved(request, stream_info))
+        self.stream_worker.error.connect(lambda message: self.set_status_message(f"오류 발생: {message}"))
+        self.stream_worker.finished.connect(self.stream_thread.quit)
+        self.stream_worker.error.connect(self.stream_thread.quit)
+        self.stream_thread.finished.connect(self.stream_worker.deleteLater)
+        self.stream_thread.finished.connect(self.stream_thread.deleteLater)
+        self.stream_thread.start()
+
+    def on_stream_resolved(self, request, stream_info):
+        provider_id, anime_id, label = request
+
+        def resolve():
+            # 프록시 스레드에서 불린다: 만료된 캐시를 버리고 브라우저로 다시 해석한다. (get_video_info 의 403 처리와 같음)
+            scraper = AniLifeScraper()
+            scraper.stream_cache.invalidate(provider_id)
+            return scraper.get_stream_info(provider_id, anime_id)
+
+        player = self.open_video_player(label)
+        self.playing_job_id = None
+        try:
+            player.play_stream(stream_info, resolve)
+            self.set_status_message(f"'{label}' 스트리밍 재생 시작")
+        except Exception as e:
+            self.set_status_message(f"스트리밍 재생 실패: {e}")
+            return
+        self.prefetch_next_episode(provider_id)
+
+    def on_video_player_closed(self):
+        job = self.download_scheduler.job(self.playing_job_id)
+        self.video_player = None
+        self.playing_job_id = None
+        # 다운로드가 이미 끝났다면 남겨둔 작업 폴더를 이제 정리한다.
+        if job and job.state in ('done', 'failed'):
+            self.cleanup_work_dir(job)
+
+    def cleanup_work_dir(self, job):
+        # 플레이어가 아직 파일을 쥐고 있으면(Windows) 지워지지 않을 수 있으므로, 실제로 사라졌을 때만 잊는다.
+        if job.work_dir:
+            shutil.rmtree(job.work_dir, ignore_errors=True)
+            if not os.path.exists(job.work_dir):
+                job.work_dir = None
+
+    def on_download_job_changed(self, job):
+        if job.state == 'done':
+            self.set_status_message(f"다운로드 완료! '{job.download_path}'")
+        elif job.state == 'failed':
+            self.set_status_message(f"오류 발생: {job.error_message}" if job.error_message else "다운로드 실패.")
+        if job.progressive and job.state == 'done':
+            if self.video_player is not None and self.playing_job_id == job.job_id:
+                # 완성된 mp4로 같은 위치에서 이어서 재생하고, 조각 파일은 더 이상 필요 없으므로 정리한다.
+                self.video_player.switch_to_file(job.download_path)
+            self.cleanup_work_dir(job)
+        if job.state == 'done':
+            if job.anime_id == self.detail_page.current_anime_id:
+                self.detail_page.mark_downloaded()
+            self.prefetch_next_episode(job.provider_id)
 
     def set_status_message(self, message):
         self.status_bar.showMessage(message)
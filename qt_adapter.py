@@ -0,0 +1,45 @@
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+def forward(signal, qt_signal, *prefix):
+    """events.Signal 을 pyqtSignal 로 이어준다. prefix 인자(예: 작업 번호)를 앞에 붙여 다시 보낸다.
+
+    코어 쪽 emit 은 작업자 스레드에서 일어나지만, pyqtSignal 은 받는 객체의 스레드(UI)로 알아서 넘겨준다.
+    """
+    signal.connect(lambda *args: qt_signal.emit(*prefix, *args))
+
+
+def forward_all(source, target, names, *prefix):
+    # 같은 이름의 시그널끼리 한꺼번에 잇는다. (source: 코어 객체, target: QObject)
+    for name in names:
+        forward(getattr(source, name), getattr(target, name), *prefix)
+
+
+class AsyncBridge(QObject):
+    """비동기 엔진(async_engine.AsyncEngine)에서 돌린 코루틴의 결과를 UI 스레드의 콜백으로 넘겨준다.
+
+        bridge.run(engine.search(scraper, keyword), on_result=self.update_results, on_error=self.search_error)
+    """
+    _done = pyqtSignal(object, object, object)
+
+    def __init__(self, engine, parent=None):
+        super().__init__(parent)
+        self.engine = engine
+        self._done.connect(self._deliver)
+
+    def run(self, coro, on_result=None, on_error=None):
+        # 반환값: concurrent.futures.Future (cancel() 하면 코루틴도 취소되고 콜백은 불리지 않는다)
+        future = self.engine.submit(coro)
+        future.add_done_callback(lambda f: self._done.emit(f, on_result, on_error))
+        return future
+
+    def _deliver(self, future, on_result, on_error):
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            print(f"[DEBUG] 비동기 작업 오류: {error}")
+            if on_error is not None:
+                on_error(str(error))
+        elif on_result is not None:
+            on_result(future.result())
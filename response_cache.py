@@ -0,0 +1,101 @@
+import json
+import os
+import threading
+import time
+
+import file_lock
+
+
+class ResponseCache:
+    """검색 결과 / 상세 정보처럼 HTML 을 파싱한 결과를 저장하는 캐시.
+
+    - 저장 후 fresh_ttl 초 동안은 네트워크 요청 없이 바로 돌려준다. (뒤로가기 등 빠른 재방문)
+    - 서버가 ETag/Last-Modified 를 준 항목은 그 뒤로 조건부 요청(If-None-Match/If-Modified-Since)으로 재검증한다.
+    - 검증 헤더가 없는 항목은 fallback_ttl 초가 지나면 다시 받아온다.
+    내용은 JSON 파일로 저장되어 프로그램을 다시 켜도 유지된다.
+    """
+
+    def __init__(self, path=os.path.join("cache", "responses.json"), fresh_ttl=60, fallback_ttl=5 * 60, max_entries=500):
+        self.path = path
+        self.fresh_ttl = fresh_ttl
+        self.fallback_ttl = fallback_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        # 이 프로세스에서 바꾼 항목. 저장할 때 디스크 쪽과 saved_at 으로 비교해 합친다.
+        self._dirty = set()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        # GUI/데몬/CLI 가 같은 파일을 쓰므로, 파일 잠금을 잡고 디스크 내용을 다시 읽어 합친 뒤 교체한다.
+        with file_lock.locked(self.path):
+            merged = self._load()
+            for key in self._dirty:
+                entry = self._entries[key]
+                current = merged.get(key)
+                if current is None or current['saved_at'] <= entry['saved_at']:
+                    merged[key] = entry
+            # 오래된 항목부터 정리해서 파일이 끝없이 커지지 않게 한다.
+            if len(merged) > self.max_entries:
+                oldest = sorted(merged, key=lambda key: merged[key]['saved_at'])
+                for key in oldest[:len(merged) - self.max_entries]:
+                    del merged[key]
+            tmp_path = file_lock.temp_path(self.path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        self._entries = merged
+        self._dirty.clear()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return dict(entry) if entry else None
+
+    def is_fresh(self, entry):
+        age = time.time() - entry['saved_at']
+        if entry.get('etag') or entry.get('last_modified'):
+            return age <= self.fresh_ttl
+        return age <= self.fallback_ttl
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def put(self, key, data, etag=None, last_modified=None):
+        with self._lock:
+            self._entries[key] = {'saved_at': time.time(), 'etag': etag, 'last_modified': last_modified, 'data': data}
+            self._dirty.add(key)
+            self._save()
+
+    def touch(self, key):
+        # 304 Not Modified: 내용은 그대로 두고 신선도만 갱신
+        with self._lock:
+            if key in self._entries:
+                self._entries[key]['saved_at'] = time.time()
+                self._dirty.add(key)
+                self._save()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    # 프로세스 전체에서 공유하는 응답 캐시
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = ResponseCache()
+        return _shared_cache
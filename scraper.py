@@ -1,150 +1,612 @@
 import requests
-from bs4 import BeautifulSoup
 import json
 import re
 import base64
 import subprocess
 import os
-from tqdm import tqdm
+import shutil
+import threading
+import time
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
 from urllib.parse import urljoin
 
-from PyQt6.QtCore import QObject, pyqtSignal
-
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service as ChromeService
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 import webbrowser
 
-class AniLifeScraper(QObject):
-    # 시그널 정의
+from driver_pool import get_driver_pool, USER_AGENT
+from stream_cache import get_stream_cache
+from response_cache import get_response_cache
+from html_parser import get_html_parser
+from throughput import get_throughput_meter
+from library import get_library
+from segment_crypto import KeyCache, SegmentDecryptor, segment_iv
+from segment_store import SegmentStore
+from tracing import Tracer, get_trace_sink
+from events import Signal
+import http_client
+import hls
+
+# 콘솔 창 숨김 플래그는 Windows 에만 있다. (다른 OS 에서는 0)
+CREATE_NO_WINDOW = getattr(subprocess, 'CREATE_NO_WINDOW', 0)
+
+
+def find_ffmpeg():
+    # 환경 변수 FFMPEG_PATH > 현재 폴더의 ffmpeg(.exe) > PATH 에서 찾은 ffmpeg 순서
+    if os.environ.get('FFMPEG_PATH'):
+        return os.environ['FFMPEG_PATH']
+    for name in ('ffmpeg.exe', 'ffmpeg'):
+        if os.path.isfile(name):
+            return os.path.abspath(name)
+    return shutil.which('ffmpeg') or 'ffmpeg'
+
+
+class FfmpegProgress:
+    # FFMPEG 의 -progress pipe:1 출력(key=value 줄)을 해석해 실제 병합 진행률과 처리 속도(실시간 대비 배속, MB/s)를 계산한다.
+    def __init__(self, total_duration):
+        self.started = time.monotonic()
+        self.total = max(int(total_duration), 1)
+        self.out_time = 0.0
+        self.total_size = 0
+
+    def feed(self, line):
+        # progress= 줄이면 (현재, 전체, 메시지) 를 돌려준다. 그 밖의 FFMPEG 로그는 예전처럼 그대로 출력한다.
+        line = line.strip()
+        key, sep, value = line.partition('=')
+        if not sep or not re.fullmatch(r'[a-z0-9_]+', key):
+            if line:
+                print(f"[FFMPEG] {line}")
+            return None
+        if key == 'out_time_us' and value.isdigit():
+            self.out_time = int(value) / 1_000_000
+        elif key == 'total_size' and value.isdigit():
+            self.total_size = int(value)
+        elif key == 'progress':
+            elapsed = max(time.monotonic() - self.started, 1e-6)
+            speed = self.out_time / elapsed
+            throughput = self.total_size / elapsed / (1024 * 1024)
+            return min(int(self.out_time), self.total), self.total, f"영상 합치는 중 ({speed:.1f}x 실시간, {throughput:.1f}MB/s)"
+        return None
+
+
+class DownloadCancelled(Exception):
+    # cancel_event 가 설정되어 조각 다운로드를 중단함
+    pass
+
+
+class FetchError(Exception):
+    # 검색/상세 정보 요청 자체가 실패함 (DNS, 타임아웃, 5xx 등). 결과가 비어 있는 것과 구분하기 위함
+    pass
+
+
+class AniLifeScraper:
+    # 시그널 정의 (events.Signal: Qt 없이 동작. UI 에서는 qt_adapter.forward 로 pyqtSignal 에 이어 쓴다)
     # progress_update: (현재 단계, 전체 단계, 메시지)
-    progress_update = pyqtSignal(int, int, str)
+    progress_update = Signal(int, int, str)
     # sub_progress_update: (현재 값, 전체 값, 레이블) - 다운로드, FFMPEG 등 세부 진행률
-    sub_progress_update = pyqtSignal(int, int, str)
+    sub_progress_update = Signal(int, int, str)
     # finished: (결과 딕셔너리)
-    finished = pyqtSignal(dict)
+    finished = Signal(dict)
     # error: (에러 메시지)
-    error = pyqtSignal(str)
+    error = Signal(str)
+    # playback_ready: (받는 중인 로컬 EVENT 플레이리스트 경로) - progressive 모드에서 앞쪽 조각이 준비되면 한 번
+    playback_ready = Signal(str)
+    # trace_finished: (단계별 소요 시간 요약) - 작업이 끝날 때마다 (성공/실패 모두) finished / error 보다 먼저 한 번
+    trace_finished = Signal(str)
+    # stage_changed: ('resolving' | 'downloading' | 'muxing') - 작업이 다음 단계로 넘어갈 때 (다운로드 데몬의 작업 상태 기록용)
+    stage_changed = Signal(str)
 
     BASE_URL = "https://anilife.live"
+    # 비디오 조각을 동시에 받을 최대 작업자 수 (CDN 왕복 지연을 가리기 위함)
+    SEGMENT_WORKERS = 8
+    # 조각을 디스크로 흘려 쓸 때 사용하는 청크 크기 (조각 크기와 상관없이 메모리 사용량을 일정하게 유지)
+    SEGMENT_CHUNK_SIZE = 256 * 1024
+    # 에피소드별 작업 폴더가 만들어지는 상위 폴더와, 완료된 조각 목록을 기록하는 매니페스트 파일 이름
+    TEMP_ROOT = "temp_download"
+    MANIFEST_NAME = "manifest.json"
+    # 매니페스트 형식 버전 (2: 조각을 복호화된 평문 TS 로 저장)
+    MANIFEST_VERSION = 2
+    FFMPEG_PATH = find_ffmpeg()
+    # 받으면서 보기(progressive) 모드에서 계속 늘어나는 로컬 플레이리스트 이름
+    LIVE_PLAYLIST_NAME = "playlist_live.m3u8"
+    # 조각 하나가 최근 p95 지연 시간(단, 최소 이 초)을 넘기면 같은 조각을 한 번 더 요청해 먼저 끝난 쪽을 쓴다.
+    HEDGE_MIN_DELAY = 1.0
 
-    def __init__(self):
-        super().__init__()
-        self.session = requests.Session()
-        self.session.headers.update({
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        })
+    def __init__(self, segment_workers=None, resume=True, stream_cache=None, resolve_slots=None, transfer_slots=None, pipelined=False, response_cache=None, parser_backend='auto', quality_policy='highest', throughput_meter=None, progressive=False, progressive_segments=3, library=None, segment_store=False):
+        self.segment_workers = max(1, segment_workers or self.SEGMENT_WORKERS)
+        # 헤지 요청용 스레드 풀 (_hedge_pool). 처음 헤지할 때 만들고, 다운로드/미리 받기가 끝나면 닫는다.
+        self._hedge_executor = None
+        self._hedge_executor_lock = threading.Lock()
+        # resume=True 이면 이전 시도에서 받아둔 조각을 검증 후 재사용한다.
+        self.resume = resume
+        # provider_id 별로 해석된 스트림 정보를 재사용하는 캐시 (기본값: 프로세스 공유 캐시)
+        self.stream_cache = stream_cache or get_stream_cache()
+        # 여러 에피소드를 동시에 받을 때 브라우저 해석 / 조각 전송 단계의 동시 실행 수를 제한하는 세마포어
+        self.resolve_slots = resolve_slots or nullcontext()
+        self.transfer_slots = transfer_slots or nullcontext()
+        # progressive=True 이면 순서대로 도착한 조각까지를 EVENT 플레이리스트로 계속 갱신하고,
+        # 앞쪽 조각 progressive_segments 개가 준비되면 playback_ready 를 보내 받는 도중에 재생할 수 있게 한다.
+        # 플레이어가 조각 파일을 읽어야 하므로 작업 폴더는 남겨두고(정리는 플레이어 쪽에서), 파이프라인 모드는 쓰지 않는다.
+        self.progressive = progressive
+        self.progressive_segments = max(1, progressive_segments)
+        # pipelined=True 이면 조각을 받는 동시에 순서대로 FFMPEG에 흘려보내 다운로드와 병합을 겹친다.
+        self.pipelined = pipelined and not progressive
+        # segment_store=True 이면 조각을 파일 하나(SegmentStore)에 모아 쓰고 FFMPEG 에는 파이프로 넘긴다.
+        # (조각 파일 수백 개의 생성/이름 변경/삭제가 느린 NAS 등에서 유리. progressive / 파이프라인 모드에서는 쓰지 않는다)
+        self.segment_store = segment_store and not progressive and not self.pipelined
+        # 검색 결과 / 상세 정보 파싱 결과 캐시 (기본값: 프로세스 공유 캐시)
+        self.response_cache = response_cache or get_response_cache()
+        # HTML 파서 백엔드 ('auto' 이면 설치된 것 중 가장 빠른 것: selectolax > lxml > html.parser)
+        self.html_parser = get_html_parser(parser_backend)
+        # 화질 선택 정책 ('highest', 'lowest', 'within:<분>' - hls.POLICY_LABELS 참고)
+        hls.parse_policy(quality_policy)
+        self.quality_policy = quality_policy
+        # 실제 다운로드 처리량 기록 (화질 선택 정책에서 예상 소요 시간을 계산할 때 사용)
+        self.throughput_meter = throughput_meter or get_throughput_meter()
+        # 다 받은 에피소드 목록 (이미 받은 화는 브라우저를 띄우기 전에 바로 끝낸다)
+        self.library = library or get_library()
+        # AES-128 키는 URI 별로 한 번만 받는다.
+        self.key_cache = KeyCache()
+        # cancel_event(threading.Event)가 설정되면 받던 조각을 중단한다. bandwidth_limiter 가 있으면 전송 속도를 제한한다.
+        self.cancel_event = None
+        self.bandwidth_limiter = None
+        # 단계별 소요 시간 기록. 작업(get_video_info 등)마다 새로 만들어 logs/trace.jsonl 에 남긴다.
+        self.tracer = Tracer()
 
-    def _make_request(self, url, params=None, headers=None):
-        request_headers = self.session.headers.copy()
+    def _make_request(self, url, params=None, headers=None, raise_errors=False):
+        # 프로세스 전체에서 공유하는 커넥션 풀을 사용 (세션은 호출한 스레드 전용)
+        session = http_client.get_session()
+        request_headers = session.headers.copy()
         if headers:
             request_headers.update(headers)
         try:
-            response = self.session.get(url, params=params, headers=request_headers, timeout=10)
+            response = http_client.get(url, params=params, headers=request_headers, timeout=10)
             response.raise_for_status()
             return response
         except requests.RequestException as e:
             print(f"Error during request to {url}: {e}")
+            if raise_errors:
+                raise FetchError(f"요청 실패: {e}") from e
             return None
 
-    def search(self, keyword):
+    def _cached_fetch(self, cache_key, url, parse, params=None, empty=None, raise_errors=False):
+        # 캐시가 신선하면 바로 돌려주고, 아니면 조건부 요청으로 재검증한다. (304 이면 파싱도 생략)
+        # raise_errors=True 이면 요청이 실패하고 예전 결과도 없을 때 빈 결과 대신 FetchError 를 올린다. (CLI 종료 코드용)
+        entry = self.response_cache.get(cache_key)
+        if entry and self.response_cache.is_fresh(entry):
+            return entry['data']
+        try:
+            response = self._make_request(url, params=params, headers=self.response_cache.conditional_headers(entry), raise_errors=True)
+        except FetchError:
+            # 요청이 실패해도 예전에 받아둔 결과가 있으면 그것이라도 보여준다.
+            if entry:
+                return entry['data']
+            if raise_errors:
+                raise
+            return empty
+        if response.status_code == 304 and entry:
+            self.response_cache.touch(cache_key)
+            return entry['data']
+        data = parse(response.text)
+        if data:
+            self.response_cache.put(cache_key, data, response.headers.get('ETag'), response.headers.get('Last-Modified'))
+        return data
+
+    def search(self, keyword, raise_errors=False):
         search_url = f"{self.BASE_URL}/search"
-        response = self._make_request(search_url, params={'keyword': keyword})
-        if not response: return []
-        soup = BeautifulSoup(response.text, 'html.parser')
-        search_items = soup.select('.listupd .bs')
-        results = []
-        for item in search_items:
-            a_tag = item.select_one('.bsx > a')
-            img_tag = item.select_one('.bsx > a img')
-            title_tag = item.select_one('.bsx > a .tt')
-            if a_tag and img_tag and title_tag:
-                href = a_tag.get('href', '')
-                if '/detail/id/' in href:
-                    anime_id = href.split('/detail/id/')[-1]
-                    title = title_tag.find('h2').get_text(strip=True) if title_tag.find('h2') else title_tag.get_text(strip=True)
-                    thumbnail_url = img_tag.get('src', '')
-                    results.append({'id': anime_id, 'title': title, 'thumbnail_url': thumbnail_url})
-        return results
-
-    def get_anime_details(self, anime_id):
+        return self._cached_fetch(f"search:{keyword}", search_url, self._parse_search_results, params={'keyword': keyword}, empty=[],
+                                  raise_errors=raise_errors)
+
+    def _parse_search_results(self, html):
+        return self.html_parser.parse_search_results(html)
+
+    def get_anime_details(self, anime_id, raise_errors=False):
         details_url = f"{self.BASE_URL}/detail/id/{anime_id}"
-        response = self._make_request(details_url)
-        if not response: return {}
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title_tag = soup.select_one('.infox .entry-title')
-        title = title_tag.get_text(strip=True) if title_tag else 'N/A'
-        summary_tag = soup.select_one('.synp .entry-content p')
-        summary = summary_tag.get_text(strip=True) if summary_tag else '줄거리 정보 없음'
-        poster_tag = soup.select_one('.thumbook .thumb img')
-        poster_url = poster_tag['src'] if poster_tag else ''
-        episodes = []
-        episode_items = soup.select('.eplister ul li')
-        for item in episode_items:
-            a_tag = item.select_one('a')
-            if a_tag:
-                href = a_tag.get('href', '')
-                if '/ani/provider/' in href:
-                    provider_id = href.split('/ani/provider/')[-1]
-                    ep_num_tag = a_tag.select_one('.epl-num')
-                    ep_num = ep_num_tag.get_text(strip=True) if ep_num_tag else ''
-                    ep_title_tag = a_tag.select_one('.epl-title')
-                    ep_title = ep_title_tag.get_text(strip=True) if ep_title_tag else '제목 없음'
-                    episodes.append({'num': ep_num, 'title': ep_title, 'provider_id': provider_id})
-        extra_info = {}
-        info_spans = soup.select('.infox .info-content .spe span')
-        for span in info_spans:
-            key_tag = span.find('b')
-            if key_tag:
-                key = key_tag.get_text(strip=True).replace(':', '')
-                value = ' '.join(t.strip() for t in span.find_all(string=True, recursive=False) if t.strip())
-                if not value:
-                    value_tags = span.find_all('a')
-                    value = ', '.join(a.get_text(strip=True) for a in value_tags if a.get_text(strip=True))
-                extra_info[key] = value if value else "정보 없음"
-        genres = [a.get_text(strip=True) for a in soup.select('.genxed a')]
-        extra_info['장르'] = ', '.join(genres) if genres else "정보 없음"
-        return {'title': title, 'summary': summary, 'poster_url': poster_url, 'episodes': episodes, 'extra_info': extra_info}
+        return self._cached_fetch(f"detail:{anime_id}", details_url, self._parse_anime_details, empty={}, raise_errors=raise_errors)
 
-    def get_video_info(self, provider_id, anime_id):
-        """[FINAL ORDER] 최종 명령"""
-        print(f"--- [DEBUG] get_video_info 시작 (Provider ID: {provider_id}, Anime ID: {anime_id}) ---")
-        self.progress_update.emit(0, 15, f"작업 시작 (Provider: {provider_id})")
+    def _parse_anime_details(self, html):
+        return self.html_parser.parse_anime_details(html)
+
+    def _segment_decryptor(self, headers, segment):
+        # 암호화된 조각이면 복호화기를, 아니면 None 을 돌려준다.
+        if not segment.key:
+            return None
+        if segment.key.method != 'AES-128':
+            raise Exception(f"지원하지 않는 암호화 방식: {segment.key.method}")
+        key = self.key_cache.get(segment.key.uri, headers)
+        return SegmentDecryptor(key, segment_iv(segment))
+
+    def _stream_segment(self, headers, segment, cancel, open_sink):
+        # 조각 하나를 한 번 받아, open_sink(응답)가 돌려준 write 함수로 청크 단위로 흘려 쓴다.
+        # 응답을 청크 단위로 바로 쓰므로 조각 크기와 상관없이 메모리 사용량이 일정하다.
+        # 암호화된 조각(EXT-X-KEY)은 받는 대로 복호화해서 평문 TS 로 쓰므로, FFMPEG 는 키를 몰라도 된다.
+        # cancel(헤지 요청에서 진 쪽) 또는 cancel_event 가 설정되면 그만둔다.
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            # 재시도 차례가 돌아왔을 때도 취소되었으면 더 요청하지 않는다.
+            raise DownloadCancelled()
+        # 키는 CDN 헤더 그대로 받고, Range 는 조각 요청에만 붙인다. (키 요청에 조각의 바이트 범위가 섞이면 206/416 이나 잘린 키가 캐시된다)
+        decryptor = self._segment_decryptor(headers, segment)
+        range_header = segment.range_header()
+        if range_header:
+            # EXT-X-BYTERANGE 조각: 큰 파일에서 이 조각 부분만 받는다.
+            headers = dict(headers, Range=range_header)
+        sent = []
+        with http_client.get(segment.uri, headers=headers, stream=True, retries=0, on_sent=lambda: sent.append(time.monotonic())) as ts_response:
+            ts_response.raise_for_status()
+            write = open_sink(ts_response)
+            for chunk in ts_response.iter_content(chunk_size=self.SEGMENT_CHUNK_SIZE):
+                if cancel.is_set() or (self.cancel_event is not None and self.cancel_event.is_set()):
+                    raise DownloadCancelled()
+                if chunk:
+                    if self.bandwidth_limiter is not None:
+                        self.bandwidth_limiter.consume(len(chunk))
+                    write(decryptor.update(chunk) if decryptor else chunk)
+            if decryptor:
+                write(decryptor.finalize())
+        # 헤지 기준 지연 시간은 호스트의 동시 요청 칸을 얻어 실제로 요청을 보낸 때부터 잰다. (칸을 기다린 시간은 CDN 이 느린 것이 아니므로)
+        http_client.latency_tracker(segment.uri).record(time.monotonic() - sent[-1])
+
+    def _fetch_segment_part(self, headers, segment, local_ts_path, cancel):
+        # 조각 하나를 한 번 받아 임시 파일(.part)에 쓰고 그 경로를 돌려준다. (이름은 호출한 스레드별로 나눈다)
+        part_path = f"{local_ts_path}.{threading.get_ident()}.part"
+        files = []
+
+        def open_sink(response):
+            files.append(open(part_path, 'wb'))
+            return files[0].write
+
+        try:
+            self._stream_segment(headers, segment, cancel, open_sink)
+            files[0].close()
+            return part_path
+        except Exception:
+            for f in files:
+                f.close()
+            self._discard_part(part_path)
+            raise
+
+    def _fetch_segment_to_store(self, headers, segment, store, cancel):
+        # 조각 하나를 한 번 받아 저장소(SegmentStore)의 빈 자리에 쓴다. 반환값: (offset, length) - 색인 기록은 호출한 쪽에서
+        writers = []
+
+        def open_sink(response):
+            # 압축된 응답은 Content-Length 가 풀린 크기와 다르므로 모았다가 쓴다.
+            size = None if response.headers.get('Content-Encoding') else int(response.headers.get('Content-Length') or 0)
+            writers.append(store.writer(size or None))
+            return writers[0].write
+
+        try:
+            self._stream_segment(headers, segment, cancel, open_sink)
+        except Exception:
+            if writers and writers[0].offset is not None:
+                store.discard((writers[0].offset, writers[0].capacity))
+            raise
+        return writers[0].close()
+
+    @staticmethod
+    def _discard_part(part_path):
+        if os.path.exists(part_path):
+            os.remove(part_path)
+
+    def _hedge_pool(self):
+        # 조각 작업자마다 원래 시도와 헤지 시도 하나씩이므로 두 배로 잡는다.
+        # (작업마다 따로 두어, 여러 에피소드를 동시에 받아도 다른 작업의 시도 뒤에 줄을 서지 않게 한다)
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = ThreadPoolExecutor(max_workers=self.segment_workers * 2, thread_name_prefix='hedge')
+            return self._hedge_executor
+
+    def _close_hedge_pool(self):
+        # 진 쪽 시도는 cancel 을 보고 곧 끝나므로 기다리지 않는다. 다음 전송에서 필요하면 다시 만든다.
+        with self._hedge_executor_lock:
+            executor, self._hedge_executor = self._hedge_executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+
+    def _hedge_delay(self, tracker):
+        # 속도를 제한해서 받는 중(미리 받기)이거나 지연 시간 표본이 모자라면 헤지하지 않는다.
+        if self.bandwidth_limiter is not None:
+            return None
+        p95 = tracker.percentile(0.95)
+        return None if p95 is None else max(p95, self.HEDGE_MIN_DELAY)
+
+    def _download_segment(self, headers, segment, local_ts_path, store=None, index=None):
+        # 다 받은 임시 파일만 최종 이름으로 원자적으로 교체한다. 덕분에 중간에 끊긴 파일이 완성된 .ts 처럼 보이는 일이 없다.
+        # store(SegmentStore)가 주어지면 파일 대신 저장소에 쓰고, 다 쓴 뒤에 index 번 조각으로 색인에 기록한다.
+        # 같은 작업 폴더를 두 작업이 잠시 함께 쓰더라도(미리 받기 -> 본 다운로드) 서로의 임시 파일을 덮어쓰지 않는다.
+        # 5xx/타임아웃/끊긴 응답은 백오프 후 다시 받고, 유난히 느린 조각(p95 초과)은 헤지 요청을 하나 더 보낸다.
+        span = self.tracer.span("segment", sequence=segment.sequence)
+        tracker = http_client.latency_tracker(segment.uri)
+
+        if store is None:
+            fetch = lambda cancel: self._fetch_segment_part(headers, segment, local_ts_path, cancel)
+            discard = self._discard_part
+        else:
+            fetch = lambda cancel: self._fetch_segment_to_store(headers, segment, store, cancel)
+            discard = store.discard
+
+        def attempt(cancel):
+            return http_client.with_retries(
+                lambda: fetch(cancel),
+                on_retry=lambda attempt_number, error: span.add_retry(),
+                cancel_event=cancel,
+            )
+
+        delay = self._hedge_delay(tracker)
+        try:
+            # 헤지할 만큼 표본이 쌓였을 때만 헤지용 풀을 만든다.
+            result = http_client.hedged(attempt, delay, discard=discard, on_hedge=lambda: span.set(hedged=True),
+                                        executor=None if delay is None else self._hedge_pool())
+            if store is None:
+                os.replace(result, local_ts_path)
+                size = os.path.getsize(local_ts_path)
+            else:
+                store.commit(index, *result)
+                size = result[1]
+            span.add_bytes(size)
+            span.end()
+            return size
+        except Exception as e:
+            span.end(e)
+            raise
+
+    def _work_dir(self, anime_id, provider_id):
+        return os.path.join(self.TEMP_ROOT, f"{anime_id}_{provider_id}")
+
+    def _load_manifest(self, work_dir, segment_count):
+        # 매니페스트: {"version": 2, "segment_count": N, "segments": {"0": 바이트 수, ...}}
+        # 조각 수가 다르면 다른 플레이리스트이므로, 형식이 다르면 조각 내용이 다를 수 있으므로 이전 기록은 버린다.
+        manifest_path = os.path.join(work_dir, self.MANIFEST_NAME)
+        try:
+            with open(manifest_path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('segment_count') == segment_count and manifest.get('version') == self.MANIFEST_VERSION:
+                return manifest
+        except (OSError, ValueError):
+            pass
+        return {'version': self.MANIFEST_VERSION, 'segment_count': segment_count, 'segments': {}}
+
+    def _save_manifest(self, work_dir, manifest):
+        # 임시 파일에 쓴 뒤 교체하여, 저장 도중 죽어도 매니페스트가 깨지지 않도록 한다.
+        manifest_path = os.path.join(work_dir, self.MANIFEST_NAME)
+        tmp_path = f"{manifest_path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f)
+        os.replace(tmp_path, manifest_path)
+
+    def _verified_segments(self, work_dir, manifest):
+        # 매니페스트에 기록된 크기와 실제 파일 크기가 일치하는 조각만 완료된 것으로 본다.
+        verified = set()
+        for key, size in manifest['segments'].items():
+            path = os.path.join(work_dir, f"segment_{int(key):04d}.ts")
+            if os.path.exists(path) and os.path.getsize(path) == size:
+                verified.add(int(key))
+        return verified
+
+    def _record_throughput(self, nbytes, started):
+        # 이번에 새로 받은 양과 걸린 시간으로 처리량 측정값을 갱신한다.
+        self.throughput_meter.record(nbytes, time.monotonic() - started)
+
+    def _write_live_playlist(self, temp_dir, segments, ready, complete):
+        # 앞에서부터 빈틈없이 받은 조각(ready 개)까지만 담은 EVENT 플레이리스트. 다 받으면 ENDLIST 를 붙인다.
+        # 플레이어가 읽는 도중에 반쪽짜리 파일을 보지 않도록 임시 파일에 쓴 뒤 교체한다.
+        live_path = os.path.join(temp_dir, self.LIVE_PLAYLIST_NAME)
+        live_playlist = hls.MediaPlaylist(segments[:ready], 3, None, 0, 'EVENT', endlist=complete)
+        tmp_path = live_path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(live_playlist.dumps(lambda i, segment: f"segment_{i:04d}.ts", byteranges=False, keys=False))
+        os.replace(tmp_path, live_path)
+        return os.path.abspath(live_path)
+
+    def _download_segments(self, headers, segments, temp_dir):
+        # 조각들은 작업자 풀에서 병렬로 받고, 파일 이름은 원래 순서(segment_{i:04d})를 그대로 유지한다.
+        total = len(segments)
+        manifest = self._load_manifest(temp_dir, total)
+        verified = self._verified_segments(temp_dir, manifest)
+        manifest['segments'] = {str(i): manifest['segments'][str(i)] for i in verified}
+        done = len(verified)
+        if done:
+            print(f"[DEBUG] 9-1단계: 이전에 받은 조각 {done}/{total}개를 재사용합니다.")
+            self.sub_progress_update.emit(done, total, "다운로드")
+
+        # progressive 모드: 순서대로 이어진 조각 수(ready)가 늘어날 때마다 재생용 플레이리스트를 갱신한다.
+        live = {'ready': -1, 'announced': False}
+
+        def advance_live_playlist():
+            ready = max(live['ready'], 0)
+            while ready < total and str(ready) in manifest['segments']:
+                ready += 1
+            if ready == live['ready']:
+                return
+            live['ready'] = ready
+            live_path = self._write_live_playlist(temp_dir, segments, ready, ready == total)
+            if not live['announced'] and ready >= min(self.progressive_segments, total):
+                live['announced'] = True
+                print(f"[DEBUG] 9-2단계: 앞쪽 조각 {ready}개 준비 완료, 재생 가능 -> {live_path}")
+                self.playback_ready.emit(live_path)
+
+        if self.progressive:
+            advance_live_playlist()
+        started = time.monotonic()
+        received = 0
+        with ThreadPoolExecutor(max_workers=self.segment_workers) as executor:
+            futures = {
+                executor.submit(self._download_segment, headers, segment, os.path.join(temp_dir, f"segment_{i:04d}.ts")): i
+                for i, segment in enumerate(segments) if i not in verified
+            }
+            try:
+                # 완료 순서와 상관없이 끝나는 대로 진행률을 올리고 매니페스트에 기록한다.
+                for future in as_completed(futures):
+                    manifest['segments'][str(futures[future])] = future.result()
+                    received += manifest['segments'][str(futures[future])]
+                    self._save_manifest(temp_dir, manifest)
+                    done += 1
+                    self.sub_progress_update.emit(done, total, "다운로드")
+                    if self.progressive:
+                        advance_live_playlist()
+            except Exception:
+                # 하나라도 실패하면 아직 시작하지 않은 조각은 취소하고, 이미 받고 있던 조각은 끝까지 기다려
+                # 매니페스트에 남긴 뒤 예외를 그대로 올린다. (다음 시도에서 재사용)
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                for future, i in futures.items():
+                    if not future.cancelled() and future.exception() is None:
+                        manifest['segments'][str(i)] = future.result()
+                self._save_manifest(temp_dir, manifest)
+                raise
+        self._record_throughput(received, started)
+
+    def _download_segments_to_store(self, headers, segments, temp_dir, store):
+        # _download_segments 의 저장소판. 이어받기 기록은 매니페스트 대신 저장소 색인을 쓴다.
+        total = len(segments)
+        # 미리 받기 등으로 조각 파일이 이미 있으면 저장소로 옮겨 담는다.
+        manifest = self._load_manifest(temp_dir, total)
+        for i in sorted(self._verified_segments(temp_dir, manifest)):
+            path = os.path.join(temp_dir, f"segment_{i:04d}.ts")
+            if i not in store.entries:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                store.commit(i, *self._store_bytes(store, data))
+            os.remove(path)
+        if os.path.exists(os.path.join(temp_dir, self.MANIFEST_NAME)):
+            os.remove(os.path.join(temp_dir, self.MANIFEST_NAME))
+
+        done = len(store.entries)
+        if done:
+            print(f"[DEBUG] 9-1단계: 저장소에 있는 조각 {done}/{total}개를 재사용합니다.")
+            self.sub_progress_update.emit(done, total, "다운로드")
+        started = time.monotonic()
+        received = 0
+        with ThreadPoolExecutor(max_workers=self.segment_workers) as executor:
+            futures = [
+                executor.submit(self._download_segment, headers, segment, None, store, i)
+                for i, segment in enumerate(segments) if i not in store.entries
+            ]
+            try:
+                for future in as_completed(futures):
+                    received += future.result()
+                    done += 1
+                    self.sub_progress_update.emit(done, total, "다운로드")
+            except Exception:
+                # 이미 받은 조각은 색인에 남아 있으므로, 남은 조각만 취소하고 받던 것은 끝까지 기다린다.
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                raise
+        if store.wasted:
+            print(f"[DEBUG] 헤지/재시도로 버려진 자리: {store.wasted / (1024 * 1024):.1f}MB (빈 자리로 돌려 다시 씀)")
+        self._record_throughput(received, started)
+
+    @staticmethod
+    def _store_bytes(store, data):
+        writer = store.writer(len(data))
+        writer.write(data)
+        return writer.close()
+
+    def _prefetch_segments(self, headers, segments, temp_dir, segment_limit=None, max_bytes=None):
+        # 앞쪽 조각부터 순서대로 받아 매니페스트에 기록한다. 나중에 본 다운로드가 이어받기로 그대로 재사용한다.
+        # segment_limit 개를 다 받거나, 작업 폴더 용량이 max_bytes 를 넘으면 멈춘다. 받아둔 (바이트 수, 조각 수)를 돌려준다.
+        total = len(segments)
+        limit = total if segment_limit is None else min(segment_limit, total)
+        manifest = self._load_manifest(temp_dir, total)
+        verified = self._verified_segments(temp_dir, manifest)
+        manifest['segments'] = {str(i): manifest['segments'][str(i)] for i in verified}
+        stored = sum(manifest['segments'].values())
+        pending = [i for i in range(limit) if i not in verified]
+        if not pending or (max_bytes and stored >= max_bytes):
+            return stored, len(manifest['segments'])
+        self.sub_progress_update.emit(len(manifest['segments']), limit, "미리 받기")
+        with ThreadPoolExecutor(max_workers=self.segment_workers) as executor:
+            # 작업자 풀은 제출 순서대로 처리하므로 앞쪽 조각부터 채워진다.
+            futures = {
+                executor.submit(self._download_segment, headers, segments[i], os.path.join(temp_dir, f"segment_{i:04d}.ts")): i
+                for i in pending
+            }
+            try:
+                for future in as_completed(futures):
+                    size = future.result()
+                    manifest['segments'][str(futures[future])] = size
+                    stored += size
+                    self._save_manifest(temp_dir, manifest)
+                    self.sub_progress_update.emit(min(len(manifest['segments']), limit), limit, "미리 받기")
+                    if max_bytes and stored >= max_bytes:
+                        print(f"[DEBUG] 미리 받기: 용량 예산({max_bytes // (1024 * 1024)}MB) 도달, 중단")
+                        break
+            finally:
+                # 예산 도달/취소/실패 모두: 남은 조각은 취소하고, 받고 있던 조각까지 매니페스트에 남긴다.
+                for future in futures:
+                    future.cancel()
+                wait(futures)
+                for future, i in futures.items():
+                    if not future.cancelled() and future.exception() is None:
+                        manifest['segments'][str(i)] = future.result()
+                self._save_manifest(temp_dir, manifest)
+        return sum(manifest['segments'].values()), len(manifest['segments'])
+
+    def prefetch(self, provider_id, anime_id, segment_limit=None, max_bytes=None):
+        # 다음 화 미리 받기: 스트림 정보를 해석해 캐시에 넣고, 앞쪽 조각을 이어받기용 작업 폴더에 받아둔다.
+        # cancel_event 로 취소되면 DownloadCancelled 를 올린다. 반환값: (받아둔 바이트 수, 조각 수)
+        print(f"[DEBUG] 미리 받기 시작 (Provider ID: {provider_id}, 조각 {segment_limit or '전부'}, 예산 {max_bytes or '무제한'})")
+        job_span = self._begin_trace('prefetch', provider_id, anime_id)
+        try:
+            stream_info = self._resolve_stream(provider_id, anime_id)
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise DownloadCancelled()
+            playlist = hls.parse_playlist(stream_info['m3u8_content_fixed'])
+            temp_dir = self._work_dir(anime_id, provider_id)
+            os.makedirs(temp_dir, exist_ok=True)
+            stored, count = self._prefetch_segments(self._cdn_headers(stream_info), playlist.segments, temp_dir, segment_limit, max_bytes)
+        except Exception as e:
+            self._end_trace(job_span, e)
+            raise
+        finally:
+            self._close_hedge_pool()
+        self._end_trace(job_span)
+        return stored, count
+
+    def _resolve_stream(self, provider_id, anime_id):
+        # 1~8단계: 브라우저로 재생 정보를 알아낸다. 캐시에 아직 유효한 정보가 있으면 브라우저를 아예 띄우지 않는다.
+        self.stage_changed.emit('resolving')
+        cached = self.stream_cache.get(provider_id)
+        # 다른 화질 정책으로 고른 스트림이면 다시 고른다.
+        if cached and cached.get('quality_policy', 'highest') == self.quality_policy:
+            print(f"[DEBUG] 1~8단계: 캐시된 스트림 정보 사용 (Provider ID: {provider_id})")
+            self.progress_update.emit(12, 15, "캐시된 스트림 정보 사용...")
+            cached['from_cache'] = True
+            return cached
+
+        # 브라우저 해석 단계는 동시 실행 수가 제한되어 있으므로 차례를 기다린다.
+        wait_span = self.tracer.span("resolve_wait")
+        with self.resolve_slots:
+            wait_span.end()
+            return self._resolve_stream_with_browser(provider_id, anime_id)
+
+    def _resolve_stream_with_browser(self, provider_id, anime_id):
+        # selenium 은 브라우저 해석이 필요할 때만 불러온다. (검색/상세/캐시된 스트림만 쓰는 환경에서는 없어도 된다)
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
         driver = None
         try:
             # 1단계: Selenium WebDriver 초기화
             print("[DEBUG] 1단계: Selenium WebDriver 초기화...")
             self.progress_update.emit(1, 15, "Selenium WebDriver 초기화...")
-            options = Options()
-            options.add_argument("--headless")
-            options.add_argument("--log-level=3")
-            options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36')
-            
-            service = ChromeService(ChromeDriverManager().install())
-            driver = webdriver.Chrome(service=service, options=options)
+            self.tracer.stage("driver_init")
+            # 매번 새 브라우저를 띄우는 대신, 미리 설정된 드라이버를 풀에서 빌려온다.
+            driver = get_driver_pool().acquire()
 
-            # --- 봇 탐지 우회 (CDP) ---
-            driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {
-                'source': "Object.defineProperty(navigator, 'webdriver', {get: () => undefined})"
-            })
-
-            # --- [전략 회귀] JS를 처음부터 비활성화 ---
-            driver.execute_cdp_cmd("Emulation.setScriptExecutionDisabled", {"value": True})
-            
             # 1-1단계: 상세 페이지 방문
             details_url = f"{self.BASE_URL}/detail/id/{anime_id}"
             print(f"[DEBUG] 1단계: 상세 페이지 방문 시도 -> {details_url}")
             self.progress_update.emit(2, 15, "상세 페이지 방문 및 쿠키 획득...")
+            self.tracer.stage("detail_page")
             driver.get(details_url)
             print("[DEBUG] 1단계: 상세 페이지 방문 성공 (쿠키 획득 추정)")
 
             # 2단계: 리다이렉트된 페이지에서 실제 에피소드 링크 클릭
             print(f"[DEBUG] 2단계: Provider ID '{provider_id}'를 포함하는 링크 탐색 및 클릭 시도...")
             self.progress_update.emit(3, 15, f"에피소드 링크 탐색...")
+            self.tracer.stage("episode_link")
             wait = WebDriverWait(driver, 10)
             episode_link_xpath = f"//a[contains(@href, '{provider_id}')]"
             episode_link = wait.until(EC.element_to_be_clickable((By.XPATH, episode_link_xpath)))
@@ -159,6 +621,7 @@ class AniLifeScraper(QObject):
             # 3단계: Provider 페이지에서 JS를 실행하는 대신, URL을 추출
             print("[DEBUG] 3단계: Provider 페이지 소스에서 최종 URL 추출 시도...")
             self.progress_update.emit(5, 15, "최종 재생 페이지 URL 추출...")
+            self.tracer.stage("provider_page")
             provider_page_source = driver.page_source
             match = re.search(r"location\.href = \"(.*?/h/live\?p=.*?)\"", provider_page_source)
             if not match:
@@ -169,11 +632,13 @@ class AniLifeScraper(QObject):
             # 4단계: 최종 페이지로 이동 (JS 비활성화 상태)
             print(f"[DEBUG] 4단계: 최종 페이지 요청 (JS 비활성화) -> {live_page_url}")
             self.progress_update.emit(6, 15, "최종 재생 페이지로 이동...")
+            self.tracer.stage("live_page")
             driver.get(live_page_url)
 
             # 5단계: 최종 페이지에서 데이터 추출
             print("[DEBUG] 5단계: 최종 페이지에서 데이터 추출 시도...")
             self.progress_update.emit(7, 15, "비디오 데이터 추출...")
+            self.tracer.stage("decode")
             final_page_source = driver.page_source
             aldata_match = re.search(r"var\s+_aldata\s*=\s*'([^']*)'", final_page_source)
             if not aldata_match:
@@ -197,185 +662,517 @@ class AniLifeScraper(QObject):
             # 서버가 비표준 인코딩(euc-kr)을 사용하므로, 해당 인코딩으로 디코딩
             aldata_decoded = base64.b64decode(processed_aldata).decode('euc-kr')
             video_data = json.loads(aldata_decoded)
-            encoded_video_path = video_data.get('vid_url_1080') or video_data.get('vid_url_720')
-            if not encoded_video_path or encoded_video_path == "none":
+            # 화질별 주소 (높은 화질부터). 최종 경로는 Base64 인코딩이 아니라, 슬래시가 이스케이프 처리된 문자열임
+            sources = []
+            for quality in ('1080', '720'):
+                encoded_video_path = video_data.get(f'vid_url_{quality}')
+                if encoded_video_path and encoded_video_path != "none":
+                    sources.append((quality, "https://" + encoded_video_path.replace('\\/', '/')))
+            if not sources:
                 raise Exception("JSON 데이터에서 비디오 URL을 찾을 수 없음")
-            
-            # 최종 경로는 Base64 인코딩이 아니라, 슬래시가 이스케이프 처리된 문자열임
-            cleaned_video_path = encoded_video_path.replace('\\/', '/')
-            m3u8_url = "https://" + cleaned_video_path
-            print(f"[DEBUG] M3U8 URL 획득: {m3u8_url}")
+            print(f"[DEBUG] M3U8 URL 획득: {', '.join(f'{quality}p' for quality, _ in sources)}")
             self.progress_update.emit(9, 15, "M3U8 URL 획득...")
 
             # --- [NEW] FFMPEG를 위한 완전한 위장 정보 생성 ---
             print("[DEBUG] 7단계: FFMPEG용 위조 여권(쿠키) 생성...")
             self.progress_update.emit(10, 15, "FFMPEG용 인증 정보 생성...")
+            self.tracer.stage("variant_select", policy=self.quality_policy)
             cookies = driver.get_cookies()
             cookie_str = '; '.join([f"{c['name']}={c['value']}" for c in cookies])
-            
-            user_agent = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/108.0.0.0 Safari/537.36'
 
-            # FFMPEG에 전달할 모든 헤더를 하나의 문자열로 결합
-            headers = (
-                f"User-Agent: {user_agent}\r\n"
-                f"Referer: {live_page_url}\r\n"
-                f"Cookie: {cookie_str}\r\n"
-            )
-            
-            # 1차 응답(JSON)은 requests로 가져오기
-            s = requests.Session()
-            s.headers.update({'User-Agent': user_agent, 'Referer': live_page_url})
-            for cookie in cookies:
-                s.cookies.set(cookie['name'], cookie['value'])
-            
-            json_response = s.get(m3u8_url)
-            json_response.raise_for_status()
-            master_m3u8_url = json_response.json()[0]['url']
-            print(f"[DEBUG] 7-1단계: 최종 Master M3U8 URL 획득 -> {master_m3u8_url}")
+            # CDN 요청(및 FFMPEG)에 전달할 헤더
+            headers = {
+                'User-Agent': USER_AGENT,
+                'Referer': live_page_url,
+                'Cookie': cookie_str,
+            }
+            stream_info = {
+                'provider_id': provider_id,
+                'anime_id': anime_id,
+                'video_data': video_data,
+                'live_page_url': live_page_url,
+                'cookies': [{'name': c['name'], 'value': c['value']} for c in cookies],
+                'headers': headers,
+            }
+
+            # 1차 응답(JSON)에서 화질 후보를 모으고, 정책과 측정된 처리량으로 하나를 고른다.
+            cdn_headers = self._cdn_headers(stream_info)
+            candidates = self._variant_candidates(sources, cdn_headers)
             self.progress_update.emit(11, 15, "Master M3U8 URL 획득...")
 
             # --- [NEW] requests로 m3u8 내용 직접 가져오기 ---
             print("[DEBUG] 8단계: requests로 M3U8 내용 직접 강탈 시도...")
             self.progress_update.emit(12, 15, "M3U8 플레이리스트 다운로드...")
-            m3u8_content_response = s.get(master_m3u8_url)
-            m3u8_content_response.raise_for_status()
-            m3u8_content = m3u8_content_response.text
+            variant, playlist, m3u8_content = self._select_variant(candidates, cdn_headers)
+            master_m3u8_url = variant.uri
+            print(f"[DEBUG] 7-1단계: 최종 M3U8 URL 획득 ({variant.height}p, 정책 {self.quality_policy}) -> {master_m3u8_url}")
 
-            # m3u8 파일 내의 상대 경로를 절대 경로로 수정
-            base_url = '/'.join(master_m3u8_url.split('/')[:-1])
-            m3u8_content_fixed = re.sub(r'^(?!#)(?!https?://)(.*)', fr'{base_url}/\1', m3u8_content, flags=re.MULTILINE)
+            m3u8_content_fixed = playlist.dumps()
 
             playlist_path = "temp_playlist.m3u8"
             with open(playlist_path, 'w', encoding='utf-8') as f:
                 f.write(m3u8_content_fixed)
             print(f"[DEBUG] 8-1단계: M3U8 플레이리스트를 '{playlist_path}'에 저장 성공")
+            self.tracer.end_stage()
 
-            # --- [FINAL STRATEGY] 모든 부품을 로컬로 다운로드 후 확장자 변경 및 조립 ---
-            temp_dir = "temp_download"
-            # 작전 시작 전, 이전의 모든 임시 파일/폴더를 깨끗하게 청소한다.
-            if os.path.exists(temp_dir):
-                import shutil
-                shutil.rmtree(temp_dir)
-            os.makedirs(temp_dir, exist_ok=True)
+            stream_info.update({
+                'master_m3u8_url': master_m3u8_url,
+                'm3u8_content': m3u8_content,
+                'm3u8_content_fixed': m3u8_content_fixed,
+                'variant': {'name': variant.name, 'height': variant.height, 'bandwidth': variant.bitrate()},
+                'quality_policy': self.quality_policy,
+            })
+            self.stream_cache.put(provider_id, stream_info)
+            return stream_info
+        except Exception as e:
+            self.tracer.end_stage(e)
+            if driver:
+                print("--- 현재 페이지 소스 ---")
+                print(driver.page_source)
+                print("--- HTML 끝 ---")
+            raise
+        finally:
+            if driver:
+                print("[DEBUG] WebDriver 반납")
+                get_driver_pool().release(driver)
+
+    def _fetch_playlist(self, url, headers):
+        # m3u8 을 받아 (해석된 플레이리스트, 원본 텍스트) 로 돌려준다.
+        with self.tracer.span("playlist_fetch") as span:
+            response = http_client.get(url, headers=headers, timeout=10, on_retry=lambda attempt, error: span.add_retry())
+            response.raise_for_status()
+            span.add_bytes(len(response.content))
+            return hls.parse_playlist(response.text, url), response.text
+
+    def _variant_candidates(self, sources, headers):
+        # 화질별 주소가 돌려주는 JSON([{'url': ...}, ...])에서 플레이리스트 후보를 모은다.
+        # 'highest' 정책이면 예전처럼 가장 높은 화질의 주소만 조회한다.
+        if hls.parse_policy(self.quality_policy)[0] == 'highest':
+            sources = sources[:1]
+        candidates = []
+        for quality, url in sources:
+            json_response = http_client.get(url, headers=headers, timeout=10)
+            json_response.raise_for_status()
+            for entry in json_response.json():
+                candidates.append(hls.Variant(entry['url'], name=quality))
+        if not candidates:
+            raise Exception("M3U8 URL 응답에 플레이리스트 주소가 없음")
+        return candidates
+
+    def _estimate_bitrate(self, playlist, headers):
+        # 플레이리스트에 BANDWIDTH 가 없으면 조각 크기로 비트레이트를 추정한다. (바이트 범위가 있으면 정확한 값)
+        total_bytes = playlist.total_bytes()
+        if total_bytes is None and playlist.segments:
+            first = playlist.segments[0]
+            response = http_client.head(first.uri, headers=headers, timeout=10, allow_redirects=True)
+            length = int(response.headers.get('Content-Length') or 0) if response.ok else 0
+            if not length:
+                return None
+            total_bytes = length * len(playlist.segments)
+        if not total_bytes or not playlist.duration:
+            return None
+        return int(total_bytes * 8 / playlist.duration)
+
+    def _select_variant(self, candidates, headers):
+        # 마스터 플레이리스트는 화질 목록으로 펼치고, 정책에 맞는 화질의 미디어 플레이리스트를 돌려준다.
+        # 반환값: (Variant, MediaPlaylist, 원본 m3u8 텍스트)
+        policy_kind = hls.parse_policy(self.quality_policy)[0]
+        variants = []
+        fetched = {}
+        for candidate in candidates:
+            playlist, text = self._fetch_playlist(candidate.uri, headers)
+            if playlist.is_master:
+                for variant in playlist.variants:
+                    variant.name = variant.name or candidate.name
+                    variants.append(variant)
+            else:
+                variants.append(candidate)
+                fetched[candidate.uri] = (playlist, text)
+
+        if policy_kind == 'within':
+            # 예상 소요 시간을 계산하려면 모든 후보의 비트레이트와 영상 길이가 필요하다.
+            duration = None
+            for variant in variants:
+                if variant.uri not in fetched:
+                    fetched[variant.uri] = self._fetch_playlist(variant.uri, headers)
+                playlist = fetched[variant.uri][0]
+                duration = duration or playlist.duration
+                if not variant.bitrate():
+                    variant.bandwidth = self._estimate_bitrate(playlist, headers)
+            throughput = self.throughput_meter.estimate()
+            variant = hls.select_variant(variants, self.quality_policy, throughput, duration)
+            seconds = hls.estimate_seconds(variant, duration, throughput)
+            if seconds is not None:
+                print(f"[DEBUG] 처리량 {throughput / 1024 / 1024:.1f}MB/s 기준 {variant.height}p 예상 소요 {seconds / 60:.1f}분")
+        else:
+            variant = hls.select_variant(variants, self.quality_policy)
+
+        if variant.uri not in fetched:
+            fetched[variant.uri] = self._fetch_playlist(variant.uri, headers)
+        playlist, text = fetched[variant.uri]
+        if playlist.is_master:
+            raise Exception("미디어 플레이리스트 대신 마스터 플레이리스트가 돌아옴")
+        return variant, playlist, text
+
+    def _fix_playlist_urls(self, m3u8_content, master_m3u8_url):
+        # m3u8 파일 내의 상대 경로(조각, 키)를 절대 경로로 수정
+        return hls.parse_playlist(m3u8_content, master_m3u8_url).dumps()
+
+    def _cdn_headers(self, stream_info):
+        # 재생 페이지에서 얻은 쿠키와 헤더를 그대로 실은 CDN 요청 헤더.
+        # 세션 쿠키 대신 Cookie 헤더로 직접 보내므로, 공유 커넥션 풀을 써도 에피소드끼리 쿠키가 섞이지 않는다.
+        return dict(stream_info['headers'])
+
+    def _output_path(self, video_data, anime_id):
+        # 파일 경로 및 이름 규칙: downloaded/{anime_id}_{제목}/{화}.mp4
+        anime_title = video_data.get('ani_name', 'Unknown_Title')
+        anime_episode = video_data.get('ani_story', 'Unknown_Episode')
+
+        # 폴더명으로 사용할 수 없는 문자 제거 및 공백을 '_'로 변경
+        sanitized_title = re.sub(r'[\\/*?:"<>|]', '', anime_title).replace(' ', '_')
+
+        # 최종 저장 경로 생성
+        base_download_dir = "downloaded"
+        anime_dir = os.path.join(base_download_dir, f"{anime_id}_{sanitized_title}")
+        os.makedirs(anime_dir, exist_ok=True)
+
+        return os.path.join(anime_dir, f"{anime_episode}.mp4")
+
+    def _write_local_playlist(self, temp_dir, playlist):
+        # 로컬 파일만 참조하는 최종 플레이리스트 생성 (조각 시간 정보는 원본 그대로)
+        # 각 조각 파일은 자기 범위만, 이미 복호화된 상태로 담고 있으므로 BYTERANGE / KEY 태그는 쓰지 않는다.
+        final_playlist_path = os.path.join(temp_dir, "playlist_final.m3u8")
+        local_playlist = hls.MediaPlaylist(playlist.segments, 3, playlist.target_duration, 0, endlist=True)
+        with open(final_playlist_path, 'w', encoding='utf-8') as f:
+            f.write(local_playlist.dumps(lambda i, segment: f"segment_{i:04d}.ts", byteranges=False, keys=False))
+        return final_playlist_path
+
+    def _watch_ffmpeg_output(self, lines, total_duration, report=None):
+        # FFMPEG 출력 줄을 읽어 병합 진행률을 알린다. report 이벤트가 주어지면 설정된 뒤부터만 진행률을 보낸다.
+        progress = FfmpegProgress(total_duration)
+        for line in lines:
+            status = progress.feed(line)
+            if status and (report is None or report.is_set()):
+                self.sub_progress_update.emit(*status)
+
+    def _local_mux_command(self, output_filepath):
+        # temp_dir 안의 playlist_final.m3u8 을 mp4 로 합치는 FFMPEG 명령 (temp_dir 을 cwd 로 실행)
+        return [
+            self.FFMPEG_PATH,
+            # 라이브러리 기록이 무효가 된(깨진) 파일을 다시 받을 때 덮어쓴다.
+            '-y',
+            '-protocol_whitelist', 'file,pipe', # 로컬 파일만 허용하도록 명시
+            '-i', "playlist_final.m3u8",
+            '-c', 'copy',
+            # 기계가 읽을 수 있는 진행률을 표준 출력으로 내보낸다.
+            '-progress', 'pipe:1', '-nostats',
+            # cwd가 temp_dir이므로, 절대 경로로 지정해줘야 함
+            os.path.abspath(output_filepath)
+        ]
+
+    def _pipe_mux_command(self, output_filepath):
+        # 표준 입력으로 들어오는 mpegts 를 mp4 로 합치는 FFMPEG 명령
+        return [
+            self.FFMPEG_PATH,
+            '-y',
+            '-f', 'mpegts',
+            '-i', 'pipe:0',
+            '-c', 'copy',
+            '-progress', 'pipe:1', '-nostats',
+            os.path.abspath(output_filepath)
+        ]
+
+    def _mux_store(self, store, temp_dir, output_filepath, total_duration):
+        # 저장소의 조각을 순서대로 읽어 FFMPEG 표준 입력으로 흘려보낸다.
+        process = subprocess.Popen(self._pipe_mux_command(output_filepath), cwd=temp_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, creationflags=CREATE_NO_WINDOW)
+        self.sub_progress_update.emit(0, max(int(total_duration), 1), "영상 합치는 중...")
+        log_thread = threading.Thread(
+            target=self._watch_ffmpeg_output,
+            args=((line.decode('utf-8', errors='replace') for line in process.stdout), total_duration),
+            daemon=True,
+        )
+        log_thread.start()
+        try:
+            store.copy_to(process.stdin, self.SEGMENT_CHUNK_SIZE)
+        except BrokenPipeError:
+            # FFMPEG 가 먼저 끝났다. (종료 코드로 실패를 알린다)
+            pass
+        except Exception:
+            process.kill()
+            raise
+        finally:
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+        process.wait()
+        log_thread.join()
+        return process.returncode
+
+    def _mux_local_playlist(self, temp_dir, output_filepath, total_duration):
+        command = self._local_mux_command(output_filepath)
+        process = subprocess.Popen(command, cwd=temp_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, encoding='utf-8', creationflags=CREATE_NO_WINDOW)
+
+        self.sub_progress_update.emit(0, max(int(total_duration), 1), "영상 합치는 중...")
+        self._watch_ffmpeg_output(process.stdout, total_duration)
+
+        process.wait()
+        return process.returncode
+
+    def _download_and_mux_pipelined(self, headers, segments, temp_dir, output_filepath, total_duration):
+        # 조각이 도착하는 대로 순서를 맞춰 FFMPEG 표준 입력(mpegts)으로 흘려보낸다.
+        # 순서가 어긋나 먼저 도착한 조각만 잠시 디스크에 보관하므로, 임시 폴더는 재정렬 창(window) 크기만큼만 사용한다.
+        total = len(segments)
+        window = max(self.segment_workers * 2, 1)
+        command = self._pipe_mux_command(output_filepath)
+        process = subprocess.Popen(command, cwd=temp_dir, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, creationflags=CREATE_NO_WINDOW)
+
+        # 조각을 받는 동안에는 다운로드 진행률을 보여주고, 마지막 조각을 넘긴 뒤부터 FFMPEG 진행률로 전환한다.
+        report_mux_progress = threading.Event()
+        log_thread = threading.Thread(
+            target=self._watch_ffmpeg_output,
+            args=((line.decode('utf-8', errors='replace') for line in process.stdout), total_duration, report_mux_progress),
+            daemon=True,
+        )
+        log_thread.start()
+
+        def segment_path(i):
+            return os.path.join(temp_dir, f"segment_{i:04d}.ts")
+
+        in_flight = {}
+        finished = set()
+        next_submit = 0
+        next_feed = 0
+        started = time.monotonic()
+        received = 0
+        with ThreadPoolExecutor(max_workers=self.segment_workers) as executor:
+            try:
+                while next_feed < total:
+                    # 재정렬 창 안에서만 새 조각을 요청한다.
+                    while next_submit < total and next_submit < next_feed + window:
+                        future = executor.submit(self._download_segment, headers, segments[next_submit], segment_path(next_submit))
+                        in_flight[future] = next_submit
+                        next_submit += 1
+
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        received += future.result()
+                        finished.add(in_flight.pop(future))
+                        self.sub_progress_update.emit(len(finished), total, "다운로드 및 병합")
+
+                    # 다음 순서의 조각이 준비되어 있으면 이어서 FFMPEG에 넘기고 바로 지운다.
+                    while next_feed in finished:
+                        with open(segment_path(next_feed), 'rb') as f:
+                            shutil.copyfileobj(f, process.stdin, self.SEGMENT_CHUNK_SIZE)
+                        os.remove(segment_path(next_feed))
+                        finished.discard(next_feed)
+                        next_feed += 1
+                report_mux_progress.set()
+                self._record_throughput(received, started)
+            except Exception:
+                for future in in_flight:
+                    future.cancel()
+                process.kill()
+                raise
+            finally:
+                if process.stdin:
+                    try:
+                        process.stdin.close()
+                    except OSError:
+                        pass
+
+        process.wait()
+        log_thread.join()
+        return process.returncode
+
+    def _download_episode(self, stream_info, provider_id, anime_id):
+        # 9~15단계: 조각 다운로드, 로컬 플레이리스트 생성, FFMPEG 병합. 저장된 mp4의 절대 경로를 돌려준다.
+        video_data = stream_info['video_data']
+        # m3u8_content_fixed 는 모든 주소가 절대 경로로 바뀐 미디어 플레이리스트
+        playlist = hls.parse_playlist(stream_info['m3u8_content_fixed'])
+        if playlist.is_master:
+            raise Exception("다운로드할 미디어 플레이리스트가 아님 (마스터 플레이리스트)")
+        segments = playlist.segments
+        cdn_headers = self._cdn_headers(stream_info)
+
+        # --- [FINAL STRATEGY] 모든 부품을 로컬로 다운로드 후 확장자 변경 및 조립 ---
+        # 에피소드마다 고유한 작업 폴더를 사용한다. 이어받기 모드가 아니면 이전 시도의 흔적을 깨끗하게 청소한다.
+        # (파이프라인 모드는 조각을 FFMPEG에 넘기는 즉시 지우므로 이어받을 것이 없다.)
+        temp_dir = self._work_dir(anime_id, provider_id)
+        if (self.pipelined or not self.resume) and os.path.exists(temp_dir):
+            shutil.rmtree(temp_dir)
+        os.makedirs(temp_dir, exist_ok=True)
 
-            # 1. 모든 비디오 조각(.aaa) 다운로드
-            ts_urls = [line.strip() for line in m3u8_content_fixed.split('\n') if line.strip() and not line.startswith('#')]
-            print(f"[DEBUG] 9단계: 총 {len(ts_urls)}개의 비디오 조각 다운로드 시작...")
+        output_filepath = self._output_path(video_data, anime_id)
+        total_duration = playlist.duration
+        print(f"[DEBUG] 최종 저장 경로 설정 -> {output_filepath} (재생 시간 {total_duration:.0f}초)")
+
+        if self.pipelined:
+            # 다운로드와 병합을 겹쳐서 진행: 마지막 조각이 도착하면 곧바로 mp4가 완성된다.
+            print(f"[DEBUG] 9단계: 총 {len(segments)}개의 비디오 조각을 받으면서 FFMPEG로 바로 병합 (동시 작업자 {self.segment_workers}개)...")
+            self.progress_update.emit(13, 15, "비디오 조각 다운로드 및 병합 중 (FFMPEG)...")
+            self.stage_changed.emit('downloading')
+            with self.tracer.span("download_mux", segments=len(segments)):
+                returncode = self._download_and_mux_pipelined(cdn_headers, segments, temp_dir, output_filepath, total_duration)
+            self.progress_update.emit(15, 15, "영상 합치기 마무리...")
+        elif self.segment_store:
+            # 조각을 파일 하나에 모아 받은 뒤, 순서대로 FFMPEG 에 흘려보낸다. (조각 파일/로컬 플레이리스트 없음)
+            bandwidth = (stream_info.get('variant') or {}).get('bandwidth') or 0
+            store = SegmentStore(temp_dir, len(segments), int(bandwidth / 8 * total_duration))
+            try:
+                print(f"[DEBUG] 9단계: 총 {len(segments)}개의 비디오 조각을 저장소 파일에 다운로드 (동시 작업자 {self.segment_workers}개)...")
+                self.progress_update.emit(13, 15, f"비디오 조각 다운로드 중...")
+                self.stage_changed.emit('downloading')
+                with self.tracer.span("segments", segments=len(segments), workers=self.segment_workers, store=True):
+                    self._download_segments_to_store(cdn_headers, segments, temp_dir, store)
+                self.progress_update.emit(15, 15, "영상 합치는 중 (FFMPEG)...")
+                self.stage_changed.emit('muxing')
+                with self.tracer.span("ffmpeg") as span:
+                    returncode = self._mux_store(store, temp_dir, output_filepath, total_duration)
+                    span.set(returncode=returncode)
+            finally:
+                store.close()
+        else:
+            # 1. 모든 비디오 조각(.aaa)을 받아 곧바로 .ts 이름으로 저장
+            print(f"[DEBUG] 9단계: 총 {len(segments)}개의 비디오 조각 다운로드 시작 (동시 작업자 {self.segment_workers}개)...")
             self.progress_update.emit(13, 15, f"비디오 조각 다운로드 중...")
-            for i, ts_url in enumerate(ts_urls):
-                ts_response = s.get(ts_url, headers={'Referer': live_page_url})
-                ts_response.raise_for_status()
-                local_ts_path = os.path.join(temp_dir, f"segment_{i:04d}.aaa")
-                with open(local_ts_path, 'wb') as f:
-                    f.write(ts_response.content)
-                self.sub_progress_update.emit(i + 1, len(ts_urls), "다운로드")
+            self.stage_changed.emit('downloading')
+            with self.tracer.span("segments", segments=len(segments), workers=self.segment_workers):
+                self._download_segments(cdn_headers, segments, temp_dir)
             print(f"[DEBUG] 10단계: 모든 세그먼트 다운로드 완료.")
 
-            # 2. 다운로드된 .aaa 파일들의 확장자를 .ts로 변경
-            print(f"[DEBUG] 11단계: .aaa -> .ts 확장자 변경 작업 시작...")
-            for i in range(len(ts_urls)):
-                segment_filename = f"segment_{i:04d}.aaa"
-                ts_filename = f"segment_{i:04d}.ts"
-                old_path = os.path.join(temp_dir, segment_filename)
-                new_path = os.path.join(temp_dir, ts_filename)
-                if os.path.exists(old_path):
-                    os.rename(old_path, new_path)
-            print(f"[DEBUG] 12단계: 확장자 변경 완료.")
-
-            # 3. 로컬 파일만 참조하는 최종 플레이리스트 생성
-            final_playlist_path = os.path.join(temp_dir, "playlist_final.m3u8")
-            # 원본 m3u8에서 EXTINF 시간 정보 추출
-            extinf_lines = [line for line in m3u8_content.splitlines() if line.startswith('#EXTINF')]
-            
-            with open(final_playlist_path, 'w', encoding='utf-8') as f:
-                f.write("#EXTM3U\n")
-                f.write("#EXT-X-VERSION:3\n")
-                # 원본 m3u8에서 TARGETDURATION 값을 가져오거나 기본값 사용
-                target_duration_match = re.search(r'#EXT-X-TARGETDURATION:(\d+)', m3u8_content)
-                if target_duration_match:
-                    f.write(f"#EXT-X-TARGETDURATION:{target_duration_match.group(1)}\n")
-                else:
-                    f.write("#EXT-X-TARGETDURATION:10\n") # 기본값
-                f.write("#EXT-X-MEDIA-SEQUENCE:0\n")
-
-                for i in range(len(ts_urls)):
-                    # 원본에 EXTINF 정보가 있다면 사용, 없다면 기본값 사용
-                    if i < len(extinf_lines):
-                        f.write(extinf_lines[i] + "\n")
-                    else:
-                        f.write("#EXTINF:4.000000,\n") # 기본값
-                    f.write(f"segment_{i:04d}.ts\n")
-                
-                f.write("#EXT-X-ENDLIST\n")
+            # 2. 로컬 파일만 참조하는 최종 플레이리스트 생성
+            with self.tracer.span("playlist_write"):
+                final_playlist_path = self._write_local_playlist(temp_dir, playlist)
             print(f"[DEBUG] 13단계: 최종 로컬 플레이리스트 '{final_playlist_path}' 생성 완료.")
             self.progress_update.emit(14, 15, "로컬 플레이리스트 생성...")
 
-            # 4. 파일 경로 및 이름 규칙 설정
-            # video_data는 176번째 줄에서 이미 파싱되었으므로 재사용한다.
-            anime_title = video_data.get('ani_name', 'Unknown_Title')
-            anime_episode = video_data.get('ani_story', 'Unknown_Episode')
-
-            # 폴더명으로 사용할 수 없는 문자 제거 및 공백을 '_'로 변경
-            sanitized_title = re.sub(r'[\\/*?:"<>|]', '', anime_title).replace(' ', '_')
-
-            # 최종 저장 경로 생성
-            base_download_dir = "downloaded"
-            anime_dir = os.path.join(base_download_dir, f"{anime_id}_{sanitized_title}")
-            os.makedirs(anime_dir, exist_ok=True)
-            
-            output_filepath = os.path.join(anime_dir, f"{anime_episode}.mp4")
-            
-            print(f"[DEBUG] 14단계: 최종 저장 경로 설정 -> {output_filepath}")
-
-            # 5. FFmpeg로 비디오 병합
+            # 3. FFmpeg로 비디오 병합
             print("[DEBUG] 15단계: FFMPEG로 최종 조립 시작...")
             self.progress_update.emit(15, 15, "영상 합치는 중 (FFMPEG)...")
-            
-            ffmpeg_path = "ffmpeg.exe"
-            command = [
-                ffmpeg_path,
-                '-protocol_whitelist', 'file,pipe', # 로컬 파일만 허용하도록 명시
-                '-i', "playlist_final.m3u8",
-                '-c', 'copy',
-                # cwd가 temp_dir이므로, 절대 경로로 지정해줘야 함
-                os.path.abspath(output_filepath)
-            ]
-            # FFMPEG 진행률 표시는 일단 제거하고, 안정적인 버전으로 되돌림
-            process = subprocess.Popen(command, cwd=temp_dir, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, universal_newlines=True, encoding='utf-8', creationflags=subprocess.CREATE_NO_WINDOW)
-            
-            # FFMPEG 진행률을 0%에서 100%로 서서히 올리는 것처럼 보이게 처리 (임시)
-            self.sub_progress_update.emit(0, 100, "영상 합치는 중...")
-            
-            for line in process.stdout:
-                print(f"[FFMPEG] {line.strip()}")
+            self.stage_changed.emit('muxing')
+            with self.tracer.span("ffmpeg") as span:
+                returncode = self._mux_local_playlist(temp_dir, output_filepath, total_duration)
+                span.set(returncode=returncode)
 
-            process.wait()
-            self.sub_progress_update.emit(100, 100, "영상 합치기 완료")
+        if returncode != 0:
+            raise Exception(f"FFMPEG 조립 실패 (종료 코드: {returncode})")
+        self.sub_progress_update.emit(1, 1, "영상 합치기 완료")
 
-            if process.returncode == 0:
-                print(f"[DEBUG] 최종 성공: 영상이 '{output_filepath}'으로 저장되었습니다.")
-                # 임시 파일 정리
-                import shutil
+        print(f"[DEBUG] 최종 성공: 영상이 '{output_filepath}'으로 저장되었습니다.")
+        with self.tracer.span("library_record"):
+            self._record_library(provider_id, anime_id, video_data, output_filepath, total_duration)
+        # 임시 파일 정리 (progressive 모드에서는 플레이어가 아직 조각을 읽고 있을 수 있으므로 남겨둔다)
+        if not self.progressive:
+            with self.tracer.span("cleanup"):
                 shutil.rmtree(temp_dir)
-                self.finished.emit({'download_path': os.path.abspath(output_filepath)})
-                return {'download_path': os.path.abspath(output_filepath)}
-            else:
-                # stderr_output 변수가 없으므로 제거
-                raise Exception(f"FFMPEG 조립 실패 (종료 코드: {process.returncode})")
+        return os.path.abspath(output_filepath)
+
+    def _record_library(self, provider_id, anime_id, video_data, output_filepath, duration):
+        # 기록에 실패해도 다운로드 자체는 성공이므로 로그만 남긴다.
+        try:
+            self.library.record(provider_id, anime_id, video_data.get('ani_story', ''), output_filepath, video_data.get('ani_name'), duration)
+        except Exception as e:
+            print(f"[DEBUG] 라이브러리 기록 실패 (다운로드는 완료): {e}")
+
+    def _library_result(self, provider_id):
+        # 이미 받아둔 에피소드면 결과 dict 를, 아니면 None 을 돌려준다.
+        try:
+            entry = self.library.lookup(provider_id)
+        except Exception as e:
+            print(f"[DEBUG] 라이브러리 조회 실패: {e}")
+            return None
+        if entry is None:
+            return None
+        print(f"[DEBUG] 이미 받은 에피소드: {entry['path']} (다운로드 생략)")
+        self.progress_update.emit(15, 15, "이미 받은 에피소드입니다.")
+        self.sub_progress_update.emit(1, 1, "라이브러리")
+        if self.progressive:
+            self.playback_ready.emit(entry['path'])
+        return {'download_path': entry['path'], 'from_library': True}
+
+    def get_stream_info(self, provider_id, anime_id):
+        # 다운로드 없이 스트림 정보만 알아낸다. (스트리밍 재생용, 실패 시 error 시그널 후 None)
+        print(f"--- [DEBUG] get_stream_info 시작 (Provider ID: {provider_id}, Anime ID: {anime_id}) ---")
+        self.progress_update.emit(0, 15, f"스트림 정보 확인 (Provider: {provider_id})")
+        job_span = self._begin_trace('stream', provider_id, anime_id)
+        try:
+            stream_info = self._resolve_stream(provider_id, anime_id)
+            self._end_trace(job_span)
+            return stream_info
+        except Exception as e:
+            self._end_trace(job_span, e)
+            error_message = f"처리 중 오류 발생: {e}"
+            print(f"[DEBUG] {error_message}")
+            self.error.emit(error_message)
+            return None
+
+    def _begin_trace(self, kind, provider_id, anime_id):
+        # 작업마다 새 기록을 시작한다. 반환값은 작업 전체를 덮는 구간 (이름: kind)
+        self.tracer = Tracer(get_trace_sink(), job=kind, provider_id=provider_id, anime_id=anime_id)
+        return self.tracer.span(kind)
+
+    def _end_trace(self, job_span, error=None):
+        # 구간 기록을 logs/trace.jsonl 에 남기고, 요약을 trace_finished 로 알린다.
+        job_span.end(error)
+        try:
+            self.tracer.finish(error)
+        except OSError as e:
+            print(f"[DEBUG] 단계별 소요 시간 기록 실패: {e}")
+        summary = self.tracer.summary_text(first=job_span.name)
+        print(f"[DEBUG] 단계별 소요 시간: {summary}")
+        self.trace_finished.emit(summary)
+
+    def get_video_info(self, provider_id, anime_id):
+        """[FINAL ORDER] 최종 명령"""
+        print(f"--- [DEBUG] get_video_info 시작 (Provider ID: {provider_id}, Anime ID: {anime_id}) ---")
+        self.progress_update.emit(0, 15, f"작업 시작 (Provider: {provider_id})")
+        job_span = self._begin_trace('download', provider_id, anime_id)
+        try:
+            with self.tracer.span("library_lookup"):
+                result = self._library_result(provider_id)
+            if result:
+                self._end_trace(job_span)
+                self.finished.emit(result)
+                return result
+            stream_info = self._resolve_stream(provider_id, anime_id)
+            # 해석(브라우저)하는 동안이나 전송 차례를 기다리는 동안 취소됐으면 조각을 받지 않는다.
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                raise DownloadCancelled()
+            wait_span = self.tracer.span("transfer_wait")
+            with self.transfer_slots:
+                wait_span.end()
+                if self.cancel_event is not None and self.cancel_event.is_set():
+                    raise DownloadCancelled()
+                try:
+                    download_path = self._download_episode(stream_info, provider_id, anime_id)
+                except requests.HTTPError as e:
+                    # 토큰이 만료되어 CDN이 403을 돌려주면, 캐시를 버리고 브라우저로 한 번 더 해석한 뒤 이어받는다.
+                    if not stream_info.get('from_cache') or e.response is None or e.response.status_code != 403:
+                        raise
+                    print("[DEBUG] CDN 403 응답: 캐시된 스트림 정보를 폐기하고 다시 해석합니다.")
+                    job_span.add_retry()
+                    self.stream_cache.invalidate(provider_id)
+                    stream_info = self._resolve_stream(provider_id, anime_id)
+                    download_path = self._download_episode(stream_info, provider_id, anime_id)
+
+            result = {'download_path': download_path}
+            if self.progressive:
+                # 재생이 끝나면 정리할 수 있도록 남겨둔 작업 폴더를 알려준다.
+                result['work_dir'] = os.path.abspath(self._work_dir(anime_id, provider_id))
+            job_span.add_bytes(os.path.getsize(download_path))
+            self._end_trace(job_span)
+            self.finished.emit(result)
+            return result
 
         except Exception as e:
+            self._end_trace(job_span, e)
             error_message = f"처리 중 오류 발생: {e}"
             print(f"[DEBUG] {error_message}")
             self.error.emit(error_message)
-            if driver:
-                print("--- 현재 페이지 소스 ---")
-                print(driver.page_source)
-                print("--- HTML 끝 ---")
             return {}
         finally:
-            if driver:
-                print("[DEBUG] WebDriver 종료")
-                driver.quit()
+            self._close_hedge_pool()
 # For testing purposes
 if __name__ == '__main__':
     scraper = AniLifeScraper()
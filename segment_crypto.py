@@ -0,0 +1,89 @@
+import threading
+
+# AES 복호화는 pycryptodome(또는 pycryptodomex)이 설치되어 있을 때만 쓸 수 있다.
+try:
+    from Crypto.Cipher import AES
+except ImportError:
+    try:
+        from Cryptodome.Cipher import AES
+    except ImportError:
+        AES = None
+
+import http_client
+
+BLOCK_SIZE = 16
+
+
+def segment_iv(segment):
+    # IV 속성이 없으면 미디어 시퀀스 번호를 16바이트 빅엔디언으로 쓴다. (RFC 8216 5.2)
+    if segment.key.iv is not None:
+        return segment.key.iv
+    return segment.sequence.to_bytes(BLOCK_SIZE, 'big')
+
+
+class KeyCache:
+    """#EXT-X-KEY 의 키 파일을 URI 별로 한 번만 받아 보관한다.
+
+    여러 작업자 스레드가 같은 키를 동시에 요청해도 실제 요청은 한 번만 나간다.
+    """
+
+    def __init__(self):
+        self._keys = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, uri, headers=None):
+        with self._lock:
+            if uri in self._keys:
+                return self._keys[uri]
+            uri_lock = self._locks.setdefault(uri, threading.Lock())
+        with uri_lock:
+            with self._lock:
+                if uri in self._keys:
+                    return self._keys[uri]
+            response = http_client.get(uri, headers=headers, timeout=10)
+            response.raise_for_status()
+            key = response.content
+            if len(key) != BLOCK_SIZE:
+                raise ValueError(f"AES-128 키 길이가 올바르지 않습니다 ({len(key)}바이트): {uri}")
+            with self._lock:
+                self._keys[uri] = key
+            return key
+
+
+class SegmentDecryptor:
+    """AES-128-CBC 조각을 받는 대로 조금씩 복호화한다. 마지막 블록에서 PKCS7 패딩을 벗긴다."""
+
+    def __init__(self, key, iv):
+        if AES is None:
+            raise RuntimeError("암호화된 스트림을 받으려면 pycryptodome 이 필요합니다. (pip install pycryptodome)")
+        self._cipher = AES.new(key, AES.MODE_CBC, iv)
+        self._buffer = b''
+
+    def update(self, data):
+        # 패딩을 벗기려면 마지막 블록이 필요하므로, 온전한 블록 중 맨 끝 하나는 다음 호출까지 남겨둔다.
+        data = self._buffer + data
+        usable = (len(data) // BLOCK_SIZE) * BLOCK_SIZE
+        if usable == len(data):
+            usable -= BLOCK_SIZE
+        usable = max(usable, 0)
+        self._buffer = data[usable:]
+        return self._cipher.decrypt(data[:usable]) if usable else b''
+
+    def finalize(self):
+        if len(self._buffer) != BLOCK_SIZE:
+            raise ValueError("암호화된 조각의 길이가 AES 블록 크기의 배수가 아닙니다.")
+        block = self._cipher.decrypt(self._buffer)
+        self._buffer = b''
+        padding = block[-1]
+        if not 1 <= padding <= BLOCK_SIZE or block[-padding:] != bytes([padding]) * padding:
+            raise ValueError("AES 복호화 결과의 패딩이 올바르지 않습니다. (키 또는 IV 가 틀림)")
+        return block[:-padding]
+
+
+def encrypt_segment(data, key, iv):
+    # 벤치마크/로컬 CDN 용: PKCS7 패딩을 붙여 AES-128-CBC 로 암호화한다.
+    if AES is None:
+        raise RuntimeError("pycryptodome 이 필요합니다. (pip install pycryptodome)")
+    padding = BLOCK_SIZE - len(data) % BLOCK_SIZE
+    return AES.new(key, AES.MODE_CBC, iv).encrypt(data + bytes([padding]) * padding)
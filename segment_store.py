@@ -0,0 +1,225 @@
+import bisect
+import os
+import threading
+import zlib
+
+
+class StoreWriter:
+    """조각 하나를 저장소에 흘려 쓴다. 크기(Content-Length)를 알면 미리 자리를 잡고 바로 쓰고, 모르면 모았다가 한 번에 쓴다."""
+
+    def __init__(self, store, expected_size=None):
+        self.store = store
+        self.offset = store.reserve(expected_size) if expected_size else None
+        self.capacity = expected_size or 0
+        self.length = 0
+        self._buffer = None if expected_size else bytearray()
+
+    def write(self, data):
+        if self._buffer is not None:
+            self._buffer += data
+            return
+        if self.length + len(data) > self.capacity:
+            raise ValueError(f"조각이 예상 크기({self.capacity}바이트)보다 큽니다")
+        self.store.write_at(self.offset + self.length, data)
+        self.length += len(data)
+
+    def close(self):
+        # 반환값: (offset, length)
+        if self._buffer is not None:
+            self.offset = self.store.reserve(len(self._buffer))
+            self.store.write_at(self.offset, self._buffer)
+            self.length = len(self._buffer)
+            self._buffer = None
+        return self.offset, self.length
+
+
+class SegmentStore:
+    """에피소드 하나의 조각들을 파일 하나(segments.bin)에 모아 두는 저장소.
+
+    조각마다 .part 생성 -> .ts 이름 변경 -> 매니페스트 교체 -> 삭제를 반복하는 대신,
+    미리 늘려 둔 컨테이너 파일의 빈 자리에 도착한 순서대로 쓰고, 다 쓴 조각만 색인(segments.idx)에 한 줄씩 덧붙인다.
+    색인 한 줄: "<조각 번호> <offset> <length> <앞 세 값의 crc32>". 색인에 있는 조각만 완성된 것으로 보므로 중간에 끊겨도 이어받을 수 있다.
+    (줄바꿈으로 끝나지 않거나 crc32 가 맞지 않는 줄은 쓰다 끊긴 줄로 보고 버린다)
+    헤지 요청에서 진 쪽이나 실패한 시도가 잡았던 자리는 빈 자리 목록에 돌려 다음 조각이 다시 쓴다.
+    단, 크기가 맞는 빈 자리가 없으면 끝에 새로 잡으므로 작은 빈 자리는 남을 수 있다.
+    병합할 때는 copy_to() 로 조각 번호 순서대로 읽어 FFMPEG 표준 입력에 흘려보낸다.
+    """
+    CONTAINER_NAME = "segments.bin"
+    INDEX_NAME = "segments.idx"
+    INDEX_VERSION = 2
+    # 컨테이너가 모자라면 이만큼씩 한꺼번에 늘린다. (파일 크기 변경 횟수를 줄이기 위함)
+    GROW_BYTES = 64 * 1024 * 1024
+
+    def __init__(self, work_dir, segment_count, expected_bytes=0):
+        self.work_dir = work_dir
+        self.segment_count = segment_count
+        self.container_path = os.path.join(work_dir, self.CONTAINER_NAME)
+        self.index_path = os.path.join(work_dir, self.INDEX_NAME)
+        # 조각 번호 -> (offset, length)
+        self.entries = {}
+        # 다른 시도(헤지 요청에서 진 쪽, 실패한 재시도)가 잡았다가 버린 바이트 수 (빈 자리로 돌려 다시 쓴다)
+        self.wasted = 0
+        # 다시 쓸 수 있는 빈 자리 [(offset, 크기), ...] (offset 순, 이웃한 자리는 합친다)
+        self._free = []
+        # 쓰는 중인 자리: offset -> 잡은 크기
+        self._reserved = {}
+        self._lock = threading.Lock()
+        self._load_index()
+        self._fd = os.open(self.container_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+        self._allocated = os.fstat(self._fd).st_size
+        # 색인에 없는 자리(뒤쪽, 조각 사이의 틈)는 다시 쓴다.
+        self._end = 0
+        for offset, length in sorted(self.entries.values()):
+            if offset > self._end:
+                self._free.append((self._end, offset - self._end))
+            self._end = max(self._end, offset + length)
+        if expected_bytes > self._allocated:
+            self._grow(expected_bytes)
+        self._index = open(self.index_path, 'a', encoding='utf-8')
+        if self._index.tell() == 0:
+            self._index.write(f"v{self.INDEX_VERSION} {segment_count}\n")
+            self._index.flush()
+
+    def _load_index(self):
+        # 조각 수나 형식이 다르면 다른 에피소드(또는 이전 형식)의 기록이므로 처음부터 다시 쓴다.
+        try:
+            with open(self.index_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            data = b''
+        # 마지막 줄이 줄바꿈 없이 끝났으면 쓰다 만 줄이므로 버리고, 다음 줄이 거기에 이어 붙지 않도록 파일도 자른다.
+        complete = data[:data.rfind(b'\n') + 1]
+        lines = complete.decode('utf-8', errors='replace').splitlines()
+        if not lines or lines[0] != f"v{self.INDEX_VERSION} {self.segment_count}":
+            for path in (self.index_path, self.container_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return
+        if len(complete) < len(data):
+            with open(self.index_path, 'r+b') as f:
+                f.truncate(len(complete))
+        try:
+            container_size = os.path.getsize(self.container_path)
+        except OSError:
+            container_size = 0
+        for line in lines[1:]:
+            entry = self._parse_index_line(line)
+            if entry is None:
+                continue
+            index, offset, length = entry
+            if offset + length <= container_size:
+                self.entries[index] = (offset, length)
+
+    @staticmethod
+    def _index_line(index, offset, length):
+        body = f"{index} {offset} {length}"
+        return f"{body} {zlib.crc32(body.encode('ascii')):08x}\n"
+
+    @staticmethod
+    def _parse_index_line(line):
+        # 반환값: (조각 번호, offset, length), 깨진 줄이면 None
+        body, _, checksum = line.rpartition(' ')
+        try:
+            if int(checksum, 16) != zlib.crc32(body.encode('ascii')):
+                return None
+            index, offset, length = (int(part) for part in body.split())
+        except ValueError:
+            return None
+        return index, offset, length
+
+    def _grow(self, size):
+        os.ftruncate(self._fd, size)
+        self._allocated = size
+
+    def reserve(self, nbytes):
+        # 조각 하나가 쓸 자리를 잡는다. 들어갈 만한 빈 자리가 있으면 그곳을, 없으면 끝에 잡는다. 반환값: offset
+        with self._lock:
+            for i, (offset, size) in enumerate(self._free):
+                if size >= nbytes:
+                    if size > nbytes:
+                        self._free[i] = (offset + nbytes, size - nbytes)
+                    else:
+                        del self._free[i]
+                    break
+            else:
+                offset = self._end
+                self._end += nbytes
+                if self._end > self._allocated:
+                    self._grow(max(self._end, self._allocated + self.GROW_BYTES))
+            self._reserved[offset] = nbytes
+            return offset
+
+    def _release(self, offset, nbytes):
+        # 잠금 안에서 호출: 자리를 빈 자리 목록에 돌려준다. (이웃한 빈 자리와 합치고, 맨 끝이면 끝을 당긴다)
+        if nbytes <= 0:
+            return
+        i = bisect.bisect(self._free, (offset,))
+        if i < len(self._free) and self._free[i][0] == offset + nbytes:
+            nbytes += self._free.pop(i)[1]
+        if i > 0 and sum(self._free[i - 1]) == offset:
+            offset, size = self._free.pop(i - 1)
+            nbytes += size
+            i -= 1
+        if offset + nbytes == self._end:
+            self._end = offset
+        else:
+            self._free.insert(i, (offset, nbytes))
+
+    def write_at(self, offset, data):
+        # Windows 에는 os.pwrite 가 없으므로 잠금 안에서 위치를 옮겨 쓴다.
+        view = memoryview(data)
+        with self._lock:
+            os.lseek(self._fd, offset, os.SEEK_SET)
+            while view:
+                written = os.write(self._fd, view)
+                view = view[written:]
+
+    def writer(self, expected_size=None):
+        return StoreWriter(self, expected_size)
+
+    def commit(self, index, offset, length):
+        # 다 쓴 조각을 색인에 기록한다. 같은 조각이 두 번 오면(헤지 요청) 먼저 기록된 것을 쓴다.
+        # 예상보다 짧게 끝났으면 남은 자리는 빈 자리로 돌려준다.
+        with self._lock:
+            reserved = self._reserved.pop(offset, length)
+            if index in self.entries:
+                self.wasted += length
+                self._release(offset, reserved)
+                return False
+            self.entries[index] = (offset, length)
+            self._index.write(self._index_line(index, offset, length))
+            self._index.flush()
+            self._release(offset + length, reserved - length)
+            return True
+
+    def discard(self, result):
+        # 쓰고 나서 버려진 조각 (hedged 의 discard 콜백 형식: (offset, length)). 잡았던 자리 전체를 다시 쓴다.
+        offset, length = result
+        with self._lock:
+            self.wasted += length
+            self._release(offset, self._reserved.pop(offset, length))
+
+    def copy_to(self, out, chunk_size=1024 * 1024):
+        # 조각 번호 순서대로 읽어 out 에 쓴다. (모든 조각이 있어야 한다)
+        missing = [i for i in range(self.segment_count) if i not in self.entries]
+        if missing:
+            raise Exception(f"저장소에 없는 조각이 있습니다: {missing[:5]}")
+        for i in range(self.segment_count):
+            offset, remaining = self.entries[i]
+            while remaining:
+                with self._lock:
+                    os.lseek(self._fd, offset, os.SEEK_SET)
+                    chunk = os.read(self._fd, min(chunk_size, remaining))
+                if not chunk:
+                    raise Exception(f"저장소에서 조각 {i}을(를) 끝까지 읽지 못했습니다")
+                out.write(chunk)
+                offset += len(chunk)
+                remaining -= len(chunk)
+
+    def close(self):
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            if not self._index.closed:
+                self._index.close()
@@ -0,0 +1,93 @@
+import json
+import os
+import threading
+import time
+
+import file_lock
+
+
+class StreamInfoCache:
+    """provider_id 별로 해석된 스트림 정보(video_data, 마스터 m3u8 URL, 쿠키/헤더, 플레이리스트)를 저장하는 캐시.
+
+    CDN 토큰이 살아있는 동안(ttl 초)에는 재다운로드/재시도 시 브라우저를 띄우지 않고 바로 재사용한다.
+    내용은 JSON 파일로 저장되어 프로그램을 다시 켜도 유지된다.
+    """
+
+    def __init__(self, path=os.path.join("cache", "stream_info.json"), ttl=30 * 60):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = self._load()
+        # 이 프로세스에서 지운 항목 {provider_id: 지운 항목의 saved_at}. 저장할 때 다른 프로세스 파일에서도 지운다.
+        self._removed = {}
+        # 이 프로세스에서 새로 넣은 항목. 나머지는 디스크 쪽이 최신일 수 있으므로 다시 쓰지 않는다.
+        self._dirty = set()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        # GUI/데몬/CLI 가 같은 파일을 쓰므로, 파일 잠금을 잡고 디스크 내용을 다시 읽어 합친 뒤 교체한다.
+        # (임시 파일에 쓴 뒤 교체하여, 저장 도중 죽어도 캐시 파일이 깨지지 않도록 한다.)
+        with file_lock.locked(self.path):
+            merged = self._load()
+            for provider_id, saved_at in self._removed.items():
+                entry = merged.get(provider_id)
+                if entry and entry['saved_at'] <= saved_at:
+                    del merged[provider_id]
+            for provider_id in self._dirty:
+                entry = self._entries[provider_id]
+                current = merged.get(provider_id)
+                if current is None or current['saved_at'] <= entry['saved_at']:
+                    merged[provider_id] = entry
+            tmp_path = file_lock.temp_path(self.path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(merged, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        self._entries = merged
+        self._removed.clear()
+        self._dirty.clear()
+
+    def get(self, provider_id):
+        with self._lock:
+            entry = self._entries.get(provider_id)
+            if not entry:
+                return None
+            if time.time() - entry['saved_at'] > self.ttl:
+                # 만료된 항목은 바로 정리
+                self._removed[provider_id] = self._entries.pop(provider_id)['saved_at']
+                self._dirty.discard(provider_id)
+                self._save()
+                return None
+            return dict(entry['info'])
+
+    def put(self, provider_id, info):
+        with self._lock:
+            self._entries[provider_id] = {'saved_at': time.time(), 'info': info}
+            self._dirty.add(provider_id)
+            self._save()
+
+    def invalidate(self, provider_id):
+        with self._lock:
+            entry = self._entries.pop(provider_id, None)
+            if entry is not None:
+                self._removed[provider_id] = entry['saved_at']
+                self._dirty.discard(provider_id)
+                self._save()
+
+
+_shared_cache = None
+_shared_cache_lock = threading.Lock()
+
+
+def get_stream_cache():
+    # 프로세스 전체에서 공유하는 스트림 정보 캐시
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None:
+            _shared_cache = StreamInfoCache()
+        return _shared_cache
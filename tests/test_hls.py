@@ -0,0 +1,189 @@
+import threading
+
+import pytest
+
+import hls
+
+MASTER = """#EXTM3U
+#EXT-X-VERSION:3
+#EXT-X-STREAM-INF:BANDWIDTH=800000,RESOLUTION=640x360,CODECS="avc1.4d401e,mp4a.40.2"
+360/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=5000000,AVERAGE-BANDWIDTH=4000000,RESOLUTION=1920x1080,FRAME-RATE=23.976
+1080/index.m3u8
+#EXT-X-STREAM-INF:BANDWIDTH=2500000,NAME="720"
+720/index.m3u8
+"""
+
+MEDIA = """#EXTM3U
+#EXT-X-VERSION:4
+#EXT-X-TARGETDURATION:6
+#EXT-X-MEDIA-SEQUENCE:10
+#EXT-X-PLAYLIST-TYPE:VOD
+#EXT-X-KEY:METHOD=AES-128,URI="key.bin",IV=0x1
+#EXTINF:6.0,first
+#EXT-X-BYTERANGE:1000@0
+video.ts
+#EXTINF:5.5,
+#EXT-X-BYTERANGE:500
+video.ts
+#EXT-X-KEY:METHOD=NONE
+#EXT-X-DISCONTINUITY
+#EXTINF:4,
+https://other.example/clip.ts
+#EXT-X-ENDLIST
+"""
+
+
+def test_master_playlist_variants():
+    playlist = hls.parse_playlist(MASTER, 'https://cdn.example/show/master.m3u8')
+    assert playlist.is_master
+    low, high, named = playlist.variants
+    assert low.uri == 'https://cdn.example/show/360/index.m3u8'
+    assert low.resolution == (640, 360)
+    assert low.codecs == 'avc1.4d401e,mp4a.40.2'
+    assert high.bitrate() == 4000000
+    assert high.frame_rate == pytest.approx(23.976)
+    # 해상도가 없으면 이름에서 세로 해상도를 읽는다.
+    assert named.height == 720
+
+
+def test_media_playlist_segments():
+    playlist = hls.parse_playlist(MEDIA, 'https://cdn.example/show/1080/index.m3u8')
+    assert not playlist.is_master
+    assert playlist.media_sequence == 10
+    assert playlist.playlist_type == 'VOD'
+    assert playlist.endlist
+    assert playlist.duration == pytest.approx(15.5)
+    first, second, third = playlist.segments
+    assert [s.sequence for s in playlist.segments] == [10, 11, 12]
+    assert first.title == 'first'
+    assert first.uri == 'https://cdn.example/show/1080/video.ts'
+    assert first.key.uri == 'https://cdn.example/show/1080/key.bin'
+    assert first.key.iv == bytes(15) + b'\x01'
+    assert second.key is first.key
+    assert third.key is None
+    assert third.discontinuity
+    assert playlist.is_encrypted
+
+
+def test_byterange_offsets_and_range_header():
+    playlist = hls.parse_playlist(MEDIA, 'https://cdn.example/a/')
+    first, second, third = playlist.segments
+    assert first.byterange == (1000, 0)
+    # 오프셋이 없으면 같은 파일의 직전 범위 끝에서 이어진다.
+    assert second.byterange == (500, 1000)
+    assert first.range_header() == 'bytes=0-999'
+    assert second.range_header() == 'bytes=1000-1499'
+    assert third.range_header() is None
+    assert playlist.total_bytes() is None
+
+
+def test_dumps_round_trip():
+    playlist = hls.parse_playlist(MEDIA, 'https://cdn.example/a/')
+    again = hls.parse_playlist(playlist.dumps())
+    assert [(s.uri, s.byterange, s.duration) for s in again.segments] == [(s.uri, s.byterange, s.duration) for s in playlist.segments]
+    assert again.segments[0].key.iv == playlist.segments[0].key.iv
+    local = hls.parse_playlist(playlist.dumps(lambda i, segment: f"segment_{i:04d}.ts", byteranges=False, keys=False))
+    assert [s.uri for s in local.segments] == ['segment_0000.ts', 'segment_0001.ts', 'segment_0002.ts']
+    assert not local.is_encrypted
+
+
+def test_rejects_non_playlist_and_missing_extinf():
+    with pytest.raises(ValueError):
+        hls.parse_playlist("<html></html>")
+    with pytest.raises(ValueError):
+        hls.parse_playlist("#EXTM3U\nvideo.ts\n")
+
+
+@pytest.mark.parametrize('policy, expected', [
+    ('highest', ('highest', None)),
+    ('lowest', ('lowest', None)),
+    ('within:30', ('within', 1800.0)),
+    ('within:1.5', ('within', 90.0)),
+])
+def test_parse_policy(policy, expected):
+    assert hls.parse_policy(policy) == expected
+
+
+@pytest.mark.parametrize('policy', ['fastest', 'within:', 'within:soon', '', None])
+def test_parse_policy_rejects_unknown(policy):
+    with pytest.raises(ValueError):
+        hls.parse_policy(policy)
+
+
+def variants():
+    return hls.parse_playlist(MASTER, 'https://cdn.example/').variants
+
+
+def test_select_variant_highest_and_lowest():
+    assert hls.select_variant(variants(), 'highest').height == 1080
+    assert hls.select_variant(variants(), 'lowest').height == 360
+
+
+def test_select_variant_within_deadline():
+    # 10분짜리 영상, 초당 500KB: 1080(4Mbps) 은 10분, 720(2.5Mbps) 은 6.25분, 360 은 2분
+    duration = 600
+    throughput = 500000
+    assert hls.select_variant(variants(), 'within:10', throughput, duration).height == 1080
+    assert hls.select_variant(variants(), 'within:7', throughput, duration).height == 720
+    assert hls.select_variant(variants(), 'within:3', throughput, duration).height == 360
+    # 어느 것도 제한 시간 안에 안 끝나면 가장 빠른 화질
+    assert hls.select_variant(variants(), 'within:1', throughput, duration).height == 360
+
+
+def test_select_variant_without_throughput_keeps_highest():
+    assert hls.select_variant(variants(), 'within:1').height == 1080
+
+
+def test_select_variant_requires_variants():
+    with pytest.raises(ValueError):
+        hls.select_variant([], 'highest')
+
+
+def test_key_is_fetched_without_segment_range(monkeypatch, tmp_path):
+    # 바이트 범위 조각이 암호화되어 있어도 키 요청에는 Range 를 붙이지 않는다.
+    monkeypatch.chdir(tmp_path)  # 스크래퍼가 만드는 cache/ 폴더를 저장소 밖에 둔다.
+    scraper_module = pytest.importorskip('scraper')
+    segment_crypto = pytest.importorskip('segment_crypto')
+    if segment_crypto.AES is None:
+        pytest.skip("pycryptodome 없음")
+    segment = hls.parse_playlist(MEDIA, 'https://cdn.example/a/').segments[1]
+    key = bytes(range(16))
+    # 패딩 블록 하나만 들어 있는 조각 (복호화하면 빈 평문)
+    encrypted = segment_crypto.AES.new(key, segment_crypto.AES.MODE_CBC, segment.key.iv).encrypt(bytes([16]) * 16)
+    requests_seen = []
+
+    class FakeResponse:
+        headers = {}
+
+        def __init__(self, content):
+            self.content = content
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_content(self, chunk_size):
+            return iter([self.content])
+
+    def fake_get(url, headers=None, on_sent=None, **kwargs):
+        requests_seen.append((url, dict(headers)))
+        if on_sent is not None:
+            on_sent()
+        return FakeResponse(key if url == segment.key.uri else encrypted)
+
+    monkeypatch.setattr(scraper_module.http_client, 'get', fake_get)
+    scraper = scraper_module.AniLifeScraper()
+    written = []
+    scraper._stream_segment({'Referer': 'https://example/'}, segment, threading.Event(), lambda response: written.append)
+
+    assert requests_seen == [
+        ('https://cdn.example/a/key.bin', {'Referer': 'https://example/'}),
+        ('https://cdn.example/a/video.ts', {'Referer': 'https://example/', 'Range': 'bytes=1000-1499'}),
+    ]
+    assert b''.join(written) == b''
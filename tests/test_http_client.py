@@ -0,0 +1,129 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import http_client
+
+
+@pytest.fixture
+def executor():
+    pool = ThreadPoolExecutor(max_workers=4)
+    yield pool
+    pool.shutdown(wait=True)
+
+
+def scripted(*steps):
+    # 시도마다 (걸리는 초, 결과 또는 예외) 를 차례로 쓰는 fn(cancel)
+    calls = []
+    lock = threading.Lock()
+
+    def fn(cancel):
+        with lock:
+            n = len(calls)
+            calls.append(cancel)
+        seconds, outcome = steps[n]
+        cancel.wait(seconds)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    fn.calls = calls
+    return fn
+
+
+def test_no_delay_runs_once_in_caller_thread():
+    threads = []
+    result = http_client.hedged(lambda cancel: threads.append(threading.get_ident()) or 'ok', None)
+    assert result == 'ok'
+    assert threads == [threading.get_ident()]
+
+
+def test_fast_attempt_is_not_hedged(executor):
+    fn = scripted((0, 'first'))
+    hedges = []
+    assert http_client.hedged(fn, 1.0, on_hedge=lambda: hedges.append(True), executor=executor) == 'first'
+    assert len(fn.calls) == 1
+    assert hedges == []
+
+
+def test_hedge_wins_and_loser_is_cancelled(executor):
+    fn = scripted((5, 'slow'), (0, 'hedge'))
+    hedges = []
+    started = time.monotonic()
+    assert http_client.hedged(fn, 0.05, on_hedge=lambda: hedges.append(True), executor=executor) == 'hedge'
+    assert time.monotonic() - started < 2
+    assert hedges == [True]
+    # 진 쪽에는 그만두라는 신호가 간다.
+    assert fn.calls[0].is_set()
+    assert not fn.calls[1].is_set()
+
+
+def test_loser_success_is_discarded(executor):
+    release = threading.Event()
+    discarded = []
+    done = threading.Event()
+
+    def fn(cancel):
+        if not fn.started:
+            fn.started.append(True)
+            release.wait(5)
+            return 'late'
+        return 'hedge'
+    fn.started = []
+
+    def discard(result):
+        discarded.append(result)
+        done.set()
+
+    assert http_client.hedged(fn, 0.05, discard=discard, executor=executor) == 'hedge'
+    release.set()
+    assert done.wait(5)
+    assert discarded == ['late']
+
+
+def test_success_beats_earlier_failure(executor):
+    fn = scripted((0.1, ValueError("first")), (0, 'hedge'))
+    assert http_client.hedged(fn, 0.05, executor=executor) == 'hedge'
+
+
+def test_both_fail_raises_first_failure(executor):
+    # 원래 시도가 먼저 실패하고, 헤지 시도는 나중에 실패한다.
+    fn = scripted((0.1, ValueError("first")), (0.3, KeyError("second")))
+    with pytest.raises(ValueError, match="first"):
+        http_client.hedged(fn, 0.05, executor=executor)
+
+
+def test_both_fail_raises_hedge_failure_when_it_finishes_first(executor):
+    fn = scripted((0.3, ValueError("original")), (0, KeyError("hedge")))
+    with pytest.raises(KeyError, match="hedge"):
+        http_client.hedged(fn, 0.05, executor=executor)
+
+
+def test_failures_finishing_together_keep_completion_order(executor):
+    # 두 시도가 거의 동시에 끝나 wait() 가 한꺼번에 돌려줘도, 실제로 먼저 끝난 쪽의 예외를 올린다.
+    gate = threading.Event()
+    order = []
+
+    def fn(cancel):
+        if not order:
+            order.append('original')
+            gate.wait(5)
+            raise ValueError("original")
+        order.append('hedge')
+        gate.set()
+        time.sleep(0.05)
+        raise KeyError("hedge")
+
+    with pytest.raises(ValueError, match="original"):
+        http_client.hedged(fn, 0.05, executor=executor)
+
+
+def test_latency_tracker_percentile():
+    tracker = http_client.LatencyTracker(window=10, min_samples=5)
+    for seconds in (0.1, 0.2, 0.3, 0.4):
+        tracker.record(seconds)
+    assert tracker.percentile(0.95) is None
+    tracker.record(0.5)
+    assert tracker.percentile(0.95) == pytest.approx(0.5)
@@ -0,0 +1,155 @@
+import os
+
+from segment_store import SegmentStore
+
+
+def open_store(tmp_path, segment_count=4):
+    return SegmentStore(str(tmp_path), segment_count)
+
+
+def test_discarded_range_is_reused(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        first = store.reserve(100)
+        second = store.reserve(100)
+        store.write_at(second, b'b' * 100)
+        store.commit(1, second, 100)
+        # 헤지에서 진 쪽이 잡았던 자리는 다음 조각이 그대로 다시 쓴다.
+        store.discard((first, 100))
+        assert store.wasted == 100
+        assert store.reserve(60) == first
+        assert store.reserve(40) == first + 60
+    finally:
+        store.close()
+
+
+def test_release_at_end_pulls_back_end(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        offset = store.reserve(100)
+        store.discard((offset, 100))
+        assert store._free == []
+        assert store.reserve(10) == offset
+    finally:
+        store.close()
+
+
+def test_adjacent_free_ranges_merge(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        a, b, c, d = (store.reserve(10) for _ in range(4))
+        store.discard((a, 10))
+        store.discard((b, 10))
+        assert store._free == [(a, 20)]
+        assert store.reserve(20) == a
+        assert d == c + 10
+    finally:
+        store.close()
+
+
+def test_short_segment_returns_rest_of_reservation(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        writer = store.writer(100)
+        writer.write(b'x' * 70)
+        offset, length = writer.close()
+        following = store.reserve(100)
+        assert store.commit(0, offset, length)
+        # 예상보다 짧게 끝난 조각의 남은 30바이트는 빈 자리가 된다.
+        assert store._free == [(offset + 70, 30)]
+        assert following == offset + 100
+    finally:
+        store.close()
+
+
+def test_duplicate_commit_keeps_first_and_frees_second(tmp_path):
+    store = open_store(tmp_path)
+    try:
+        first = store.reserve(10)
+        second = store.reserve(10)
+        assert store.commit(0, first, 10)
+        assert not store.commit(0, second, 10)
+        assert store.entries[0] == (first, 10)
+        assert store.wasted == 10
+        assert store.reserve(10) == second
+    finally:
+        store.close()
+
+
+def write_committed(store, index, data):
+    writer = store.writer(len(data))
+    writer.write(data)
+    store.commit(index, *writer.close())
+
+
+def test_committed_segments_survive_reopen(tmp_path):
+    store = open_store(tmp_path, 2)
+    write_committed(store, 0, b'a' * 10)
+    write_committed(store, 1, b'b' * 5)
+    store.close()
+
+    store = open_store(tmp_path, 2)
+    try:
+        assert store.entries == {0: (0, 10), 1: (10, 5)}
+    finally:
+        store.close()
+
+
+def test_torn_index_tail_is_dropped_and_truncated(tmp_path):
+    store = open_store(tmp_path, 2)
+    write_committed(store, 0, b'a' * 10)
+    store.close()
+    index_path = os.path.join(str(tmp_path), SegmentStore.INDEX_NAME)
+    with open(index_path, 'a', encoding='utf-8') as f:
+        f.write("1 10 5")  # 줄바꿈 없이 끊긴 줄
+    size_before = os.path.getsize(index_path)
+
+    store = open_store(tmp_path, 2)
+    try:
+        assert store.entries == {0: (0, 10)}
+        # 다음 줄이 끊긴 줄에 이어 붙지 않도록 파일에서도 잘라냈다.
+        assert os.path.getsize(index_path) == size_before - len("1 10 5")
+        write_committed(store, 1, b'b' * 5)
+    finally:
+        store.close()
+
+    store = open_store(tmp_path, 2)
+    try:
+        assert set(store.entries) == {0, 1}
+    finally:
+        store.close()
+
+
+def test_index_line_with_bad_checksum_is_rejected(tmp_path):
+    store = open_store(tmp_path, 2)
+    write_committed(store, 0, b'a' * 10)
+    store.close()
+    index_path = os.path.join(str(tmp_path), SegmentStore.INDEX_NAME)
+    line = SegmentStore._index_line(1, 10, 5)
+    with open(index_path, 'a', encoding='utf-8') as f:
+        f.write(line.replace("1 10 5", "1 10 9"))
+
+    store = open_store(tmp_path, 2)
+    try:
+        assert store.entries == {0: (0, 10)}
+    finally:
+        store.close()
+
+
+def test_parse_index_line():
+    line = SegmentStore._index_line(3, 1024, 512)
+    assert SegmentStore._parse_index_line(line.rstrip('\n')) == (3, 1024, 512)
+    assert SegmentStore._parse_index_line("3 1024 512") is None
+    assert SegmentStore._parse_index_line("garbage") is None
+
+
+def test_index_from_other_segment_count_is_discarded(tmp_path):
+    store = open_store(tmp_path, 2)
+    write_committed(store, 0, b'a' * 10)
+    store.close()
+
+    store = open_store(tmp_path, 3)
+    try:
+        assert store.entries == {}
+    finally:
+        store.close()
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+import time
+
+import file_lock
+
+
+class ThroughputMeter:
+    """실제 조각 다운로드로 측정한 전체 처리량(바이트/초)의 지수 이동 평균.
+
+    화질 선택 정책('within:<분>')이 "이 화질이면 몇 분 걸릴지" 계산할 때 쓴다.
+    망 상태는 시간대마다 다르므로 max_age 초보다 오래된 측정값은 믿지 않는다.
+    내용은 JSON 파일로 저장되어 프로그램을 다시 켜도 유지된다.
+    """
+
+    def __init__(self, path=os.path.join("cache", "throughput.json"), alpha=0.3, max_age=3 * 60 * 60, min_bytes=4 * 1024 * 1024):
+        self.path = path
+        self.alpha = alpha
+        self.max_age = max_age
+        # 너무 적게 받은 측정은 잡음이 커서 버린다.
+        self.min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self._state = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        tmp_path = file_lock.temp_path(self.path)
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._state, f)
+        os.replace(tmp_path, self.path)
+
+    def record(self, nbytes, seconds):
+        if nbytes < self.min_bytes or seconds <= 0:
+            return
+        sample = nbytes / seconds
+        with self._lock, file_lock.locked(self.path):
+            # 다른 프로세스(GUI/데몬/CLI)가 그 사이에 더 최근 측정을 저장했으면 그 값 위에 이어서 평균낸다.
+            on_disk = self._load()
+            if on_disk.get('measured_at', 0) > self._state.get('measured_at', 0):
+                self._state = on_disk
+            previous = self.estimate_locked()
+            value = sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+            self._state = {'bytes_per_second': value, 'measured_at': time.time()}
+            self._save()
+
+    def estimate_locked(self):
+        if not self._state or time.time() - self._state.get('measured_at', 0) > self.max_age:
+            return None
+        return self._state.get('bytes_per_second')
+
+    def estimate(self):
+        # 최근 처리량(바이트/초). 최근 측정이 없으면 None.
+        with self._lock:
+            return self.estimate_locked()
+
+
+class BandwidthLimiter:
+    """여러 작업자 스레드가 함께 지키는 전송 속도 상한(바이트/초). 미리 받기처럼 뒤에서 조용히 받아야 하는 작업용."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self._next_free = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes):
+        # nbytes 를 보내도 되는 시각까지 기다린다. (스레드마다 차례로 시간 구간을 예약)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_free)
+            self._next_free = start + nbytes / self.bytes_per_second
+        delay = start - now
+        if delay > 0:
+            time.sleep(delay)
+
+
+_shared_meter = None
+_shared_meter_lock = threading.Lock()
+
+
+def get_throughput_meter():
+    # 프로세스 전체에서 공유하는 처리량 측정기
+    global _shared_meter
+    with _shared_meter_lock:
+        if _shared_meter is None:
+            _shared_meter = ThroughputMeter()
+        return _shared_meter
+
@@ -0,0 +1,171 @@
+import json
+import os
+import threading
+import time
+import uuid
+
+
+class Span:
+    """한 구간의 벽시계 시간, 바이트 수, 재시도 횟수. with 문으로 쓰거나 end() 로 직접 닫는다."""
+
+    def __init__(self, tracer, name, attrs):
+        self.tracer = tracer
+        self.name = name
+        self.attrs = attrs
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.duration = None
+        self.bytes = 0
+        self.retries = 0
+        self.error = None
+
+    def add_bytes(self, nbytes):
+        self.bytes += nbytes
+
+    def add_retry(self, count=1):
+        self.retries += count
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def end(self, error=None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.error = str(error) or type(error).__name__
+        self.tracer._add(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end(exc)
+        return False
+
+    def to_dict(self):
+        record = {
+            'name': self.name,
+            'start': round(self.started_at, 3),
+            'seconds': round(self.duration, 4),
+            'bytes': self.bytes,
+            'retries': self.retries,
+        }
+        if self.error:
+            record['error'] = self.error
+        if self.attrs:
+            record['attrs'] = self.attrs
+        return record
+
+
+class Tracer:
+    """작업 하나(에피소드 다운로드 등)의 구간 기록을 모은다.
+
+    - span(name): 병렬/중첩 구간 (조각 하나, FFMPEG 병합 등). 여러 스레드에서 동시에 써도 된다.
+    - stage(name): 순서대로 이어지는 단계. 새 단계를 시작하면 이전 단계가 자동으로 닫힌다.
+    - finish(): 열린 단계를 닫고 모든 구간을 sink(JSON lines 파일)에 기록한다.
+    """
+
+    def __init__(self, sink=None, **attrs):
+        self.trace_id = uuid.uuid4().hex[:12]
+        self.sink = sink
+        self.attrs = attrs
+        self.spans = []
+        self._stage = None
+        self._lock = threading.Lock()
+
+    def span(self, name, **attrs):
+        return Span(self, name, attrs)
+
+    def stage(self, name, **attrs):
+        self.end_stage()
+        self._stage = Span(self, name, attrs)
+        return self._stage
+
+    def end_stage(self, error=None):
+        stage, self._stage = self._stage, None
+        if stage is not None:
+            stage.end(error)
+
+    def _add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def summary(self):
+        # 이름별 합계: [{'name', 'count', 'seconds', 'bytes', 'retries', 'errors'}, ...] (오래 걸린 순)
+        totals = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            total = totals.setdefault(span.name, {'name': span.name, 'count': 0, 'seconds': 0.0, 'bytes': 0, 'retries': 0, 'errors': 0})
+            total['count'] += 1
+            total['seconds'] += span.duration
+            total['bytes'] += span.bytes
+            total['retries'] += span.retries
+            total['errors'] += 1 if span.error else 0
+        return sorted(totals.values(), key=lambda total: total['seconds'], reverse=True)
+
+    def summary_text(self, first=None, limit=6):
+        # UI 에 보여줄 한 줄 요약. 여러 개가 동시에 도는 구간(조각)은 합계 시간이므로 '합' 으로 표시한다.
+        # first 로 준 이름(보통 작업 전체 구간)을 맨 앞에 둔다.
+        totals = self.summary()
+        totals.sort(key=lambda total: total['name'] != first)
+        parts = []
+        for total in totals[:limit]:
+            text = f"{total['name']} {total['seconds']:.1f}초"
+            if total['count'] > 1:
+                text = f"{total['name']} x{total['count']} 합 {total['seconds']:.1f}초"
+            if total['bytes']:
+                text += f" {total['bytes'] / (1024 * 1024):.1f}MB"
+            if total['retries']:
+                text += f" 재시도 {total['retries']}"
+            parts.append(text)
+        return " | ".join(parts)
+
+    def finish(self, error=None):
+        self.end_stage(error)
+        if self.sink is not None:
+            with self._lock:
+                spans = list(self.spans)
+            self.sink.write(self.trace_id, self.attrs, spans)
+        return self.summary()
+
+
+class JsonlTraceSink:
+    """구간 기록을 한 줄에 하나씩 JSON 으로 덧붙여 쓴다. 파일이 max_bytes 를 넘으면 .1 로 밀어낸다."""
+
+    def __init__(self, path=os.path.join("logs", "trace.jsonl"), max_bytes=20 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def write(self, trace_id, attrs, spans):
+        lines = []
+        for span in spans:
+            record = {'trace_id': trace_id}
+            record.update(attrs)
+            record.update(span.to_dict())
+            lines.append(json.dumps(record, ensure_ascii=False))
+        if not lines:
+            return
+        with self._lock:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if os.path.exists(self.path) and os.path.getsize(self.path) > self.max_bytes:
+                os.replace(self.path, self.path + ".1")
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+
+
+_shared_sink = None
+_shared_sink_lock = threading.Lock()
+
+
+def get_trace_sink():
+    # 프로세스 전체에서 공유하는 기록 파일 (logs/trace.jsonl)
+    global _shared_sink
+    with _shared_sink_lock:
+        if _shared_sink is None:
+            _shared_sink = JsonlTraceSink()
+        return _shared_sink